@@ -1,13 +1,14 @@
 import os
 from dotenv import load_dotenv
 import logging
-from sqlalchemy import create_engine
+from contextlib import asynccontextmanager
+from sqlalchemy import create_engine, text
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from starlette.exceptions import HTTPException
-from app.routers import weather, market, auth, wilayah, forecast, crops, users
+from app.routers import weather, market, auth, wilayah, forecast, crops, users, export, jobs, predict
 import logging
 
 #load environment variables
@@ -33,11 +34,73 @@ if not DATABASE_URL:
 # create database engine
 engine = create_engine(DATABASE_URL, pool_pre_ping=True)
 
+# Environment variable untuk enable/disable auto-sync
+AUTO_SYNC_ENABLED = os.getenv("AUTO_SYNC_ENABLED", "true").lower() == "true"
+SYNC_INTERVAL_HOURS = int(os.getenv("SYNC_INTERVAL_HOURS", "24"))  # Default 24 jam
+
+# Lifespan - Scheduler + warm-up sync di background
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from app.scheduler import default_job_configs, register_dedup_windows, sync_market_data_job
+    from app.services.prophet_service import prophet_service
+    from app.services.warmup import warmup_tracker
+
+    # Jendela dedup didaftarkan terpisah dari scheduler: tanpa auto-sync pun warm-up
+    # sync tidak diulang oleh setiap worker yang start
+    try:
+        register_dedup_windows(default_job_configs(SYNC_INTERVAL_HOURS))
+    except ValueError as e:
+        print(f"⚠️ Konfigurasi job sync tidak valid: {e}")
+
+    # Lewat run_job agar warm-up di banyak worker tetap hanya dijalankan sekali
+    warmup_steps = [("prophet_workers", prophet_service.warm_up), ("market_sync", sync_market_data_job)]
+
+    # Enable scheduler untuk auto-sync harian
+    # Disable auto-sync if OpenWeather API key missing
+    if AUTO_SYNC_ENABLED and OPENWEATHER_API_KEY:
+        try:
+            from app.scheduler import start_scheduler_with_interval, sync_weather_data_job
+            # Sync pertama dijalankan oleh warm-up di background, bukan inline di startup
+            start_scheduler_with_interval(hours=SYNC_INTERVAL_HOURS, run_immediately=False)
+            warmup_steps.append(("weather_sync", sync_weather_data_job))
+            print(f"✅ Auto-sync scheduler enabled (default every {SYNC_INTERVAL_HOURS} hours, per-job override via MARKET_SYNC_*/WEATHER_SYNC_*)")
+        except Exception as e:
+            print(f"⚠️ Scheduler failed to start: {e}")
+            print("📝 Manual sync masih bisa dilakukan via POST /market/sync")
+    else:
+        print("ℹ️ Auto-sync disabled (no API key or disabled). Use POST /market/sync for manual sync")
+
+    warmup_tracker.start(warmup_steps)
+    app.state.ready = True
+    print("🚀 Backend siap menerima request (warm-up berjalan di background)")
+
+    yield
+
+    app.state.ready = False
+    from app.services.wilayah_service import wilayah_directory
+    await wilayah_directory.close()
+    from app.services.openweather_client import openweather_fetcher
+    openweather_fetcher.close()
+    from app.services.disdagkopukm_client import disdagkopukm_fetcher
+    disdagkopukm_fetcher.close()
+    from app.services.market_sync import realtime_cache
+    realtime_cache.shutdown()
+    from app.services.job_queue import job_manager
+    job_manager.shutdown()
+    try:
+        from app.services.price_forecasting import shutdown_forecast_executor
+        shutdown_forecast_executor()
+    except Exception:
+        pass
+    print("🛑 Backend stopped")
+
 app = FastAPI(
     title="Web Petani Wonosobo API",
     description="API untuk data cuaca, harga pasar, dan prediksi pertanian",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
+app.state.ready = False
 
 # Custom exception handler untuk validation errors
 @app.exception_handler(RequestValidationError)
@@ -89,41 +152,9 @@ app.include_router(crops.router)  # Router already has /crops prefix
 app.include_router(wilayah.router)  # Router already has /wilayah prefix
 app.include_router(forecast.router)  # Router already has /forecast prefix
 app.include_router(users.router)  # Router already has /users prefix
-# app.include_router(predict.router)  # Temporarily disabled 
-
-# Environment variable untuk enable/disable auto-sync
-import os
-AUTO_SYNC_ENABLED = os.getenv("AUTO_SYNC_ENABLED", "true").lower() == "true"
-SYNC_INTERVAL_HOURS = int(os.getenv("SYNC_INTERVAL_HOURS", "24"))  # Default 24 jam
-
-# Startup event - Auto-sync + Scheduler
-@app.on_event("startup")
-def startup_event():
-    # Manual sync once saat startup
-    from app.services.market_sync import fetch_and_save_market_data
-    try:
-        result = fetch_and_save_market_data()
-        print(f"✅ Initial sync completed: {result}")
-    except Exception as e:
-        print(f"⚠️ Initial sync failed: {e}")
-    
-    # Enable scheduler untuk auto-sync harian
-    # Disable auto-sync if OpenWeather API key missing
-    if AUTO_SYNC_ENABLED and OPENWEATHER_API_KEY:
-        try:
-            from app.scheduler import start_scheduler_with_interval
-            start_scheduler_with_interval(hours=SYNC_INTERVAL_HOURS)
-            print(f"✅ Auto-sync scheduler enabled (every {SYNC_INTERVAL_HOURS} hours)")
-        except Exception as e:
-            print(f"⚠️ Scheduler failed to start: {e}")
-            print("📝 Manual sync masih bisa dilakukan via POST /market/sync")
-    else:
-        print("ℹ️ Auto-sync disabled (no API key or disabled). Use POST /market/sync for manual sync")
-
-# Shutdown event
-@app.on_event("shutdown")
-def shutdown_event():
-    print("🛑 Backend stopped")
+app.include_router(export.router)  # Router already has /export prefix
+app.include_router(jobs.router)  # Router already has /jobs prefix
+app.include_router(predict.router)  # Router already has /predict prefix
 
 @app.get("/")
 def root():
@@ -141,7 +172,34 @@ def root():
 
 @app.get("/health")
 def health_check():
+    """Liveness: proses hidup, plus progres warm-up sync di background."""
+    from app.services.warmup import warmup_tracker
     return {
         "status": "healthy",
-        "service": "Web Petani Wonosobo API"
+        "service": "Web Petani Wonosobo API",
+        "ready": app.state.ready,
+        "warmup": warmup_tracker.status()
     }
+
+@app.get("/health/scheduler")
+def scheduler_status():
+    """Status scheduler: mode, job terjadwal, dan run terakhir tiap job dari semua worker."""
+    from app.scheduler import get_scheduler_status
+    return get_scheduler_status()
+
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness: startup selesai dan database bisa dijangkau (tidak menunggu warm-up)."""
+    checks = {"startup": app.state.ready, "database": False}
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        checks["database"] = True
+    except Exception as e:
+        logging.warning(f"⚠️ Readiness check database gagal: {e}")
+
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "checks": checks}
+    )
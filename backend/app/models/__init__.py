@@ -4,3 +4,6 @@ from app.models.gis_model import GISLayer
 from app.models.weather_model import WeatherData
 from app.models.log_model import LogActivity
 from app.models.notification_model import Notification
+from app.models.scheduler_model import SchedulerJobState
+from app.models.job_model import BackgroundJob
+from app.models.training_model import PriceModelState
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, Float, Text, TIMESTAMP, Index
+from app.db import Base
+
+
+class BackgroundJob(Base):
+    """Job background (sync, training, forecasting) beserta progres dan hasilnya."""
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        Index("ix_background_jobs_kind_created_at", "kind", "created_at"),
+    )
+
+    job_id = Column(String(36), primary_key=True)
+    kind = Column(String(50))
+    status = Column(String(20))  # queued / running / succeeded / failed
+    progress = Column(Float, default=0.0)  # 0.0 - 1.0
+    message = Column(Text)
+    params = Column(Text)  # JSON
+    result = Column(Text)  # JSON
+    error = Column(Text)
+    runner = Column(String(255))  # host:pid worker yang menjalankan
+    created_at = Column(TIMESTAMP)
+    started_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP)
+    duration_seconds = Column(Float)
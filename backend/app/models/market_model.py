@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float, Date, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, TIMESTAMP, ForeignKey, Index, UniqueConstraint, DDL, event
 from sqlalchemy.orm import relationship
 from app.db import Base
 
 class MarketPrice(Base):
     __tablename__ = "market_prices"
+    __table_args__ = (
+        # Satu harga per komoditas per pasar per hari, target ON CONFLICT untuk upsert sync
+        UniqueConstraint("commodity_name", "market_location", "date", name="uq_market_prices_commodity_location_date"),
+    )
 
     price_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"))
@@ -13,5 +17,21 @@ class MarketPrice(Base):
     market_location = Column(String(100))
     date = Column(Date)
     created_at = Column(TIMESTAMP)
+    updated_at = Column(TIMESTAMP)  # Diisi saat harga diubah (sync/edit manual), watermark refit model
 
     user = relationship("User", back_populates="market_prices")
+
+
+# Urutan /market/list (date desc, price_id desc)
+Index("ix_market_prices_date_price_id", MarketPrice.date.desc(), MarketPrice.price_id.desc())
+
+# Trigram index untuk pencarian commodity_name ILIKE '%x%'
+Index(
+    "ix_market_prices_commodity_name_trgm",
+    MarketPrice.commodity_name,
+    postgresql_using="gin",
+    postgresql_ops={"commodity_name": "gin_trgm_ops"},
+)
+
+# gin_trgm_ops butuh extension pg_trgm sebelum tabel dibuat via create_all
+event.listen(MarketPrice.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
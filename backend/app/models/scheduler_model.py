@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Float, Text, TIMESTAMP
+from app.db import Base
+
+
+class SchedulerJobState(Base):
+    """Status run terakhir per job scheduler, dibagi oleh semua worker."""
+    __tablename__ = "scheduler_job_state"
+
+    job_id = Column(String(100), primary_key=True)
+    last_started_at = Column(TIMESTAMP)
+    last_finished_at = Column(TIMESTAMP)
+    last_duration_seconds = Column(Float)
+    last_status = Column(String(20))  # success / failed
+    last_error = Column(Text)
+    last_result = Column(Text)  # JSON ringkas hasil job
+    last_runner = Column(String(255))  # host:pid worker yang menjalankan
+    run_count = Column(Integer, default=0)
+    # Interval adaptif bersama (mode coordinated): dibaca semua worker agar ikut backoff
+    adaptive_interval_seconds = Column(Float)
+    next_due_at = Column(TIMESTAMP)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, TIMESTAMP
+from app.db import Base
+
+
+class PriceModelState(Base):
+    """Watermark data training per seri (komoditas, pasar) untuk refit inkremental."""
+    __tablename__ = "price_model_state"
+
+    commodity_name = Column(String(100), primary_key=True)
+    market_location = Column(String(100), primary_key=True)
+    watermark = Column(TIMESTAMP)  # max(updated_at / created_at) market_prices saat terakhir di-fit
+    row_count = Column(Integer)  # Jumlah baris saat terakhir di-fit (menangkap baris tanpa created_at / terhapus)
+    model_path = Column(String(255))
+    trained_at = Column(TIMESTAMP)
+    fit_seconds = Column(Float)
+    warm_started = Column(Boolean, default=False)
+    last_error = Column(Text)
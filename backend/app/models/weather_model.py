@@ -1,9 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, Date, TIMESTAMP, Text, func
+from sqlalchemy import Column, Integer, String, Float, Date, TIMESTAMP, Text, Index, UniqueConstraint, func
 from app.db import Base
 
 
 class WeatherData(Base):
     __tablename__ = "weather_data"
+    __table_args__ = (
+        # Satu baris per kecamatan per hari, target ON CONFLICT untuk bulk upsert
+        UniqueConstraint("location_name", "date", name="uq_weather_data_location_date"),
+        # Query satu hari untuk semua kecamatan (interpolasi)
+        Index("ix_weather_data_date", "date"),
+    )
+
     weather_id = Column(Integer, primary_key=True, index=True)
     layer_id = Column(Integer)
     location_name = Column(String(100))
@@ -18,8 +25,15 @@ class WeatherData(Base):
 
 class WeatherPrediction(Base):
     __tablename__ = "weather_predictions"
+    __table_args__ = (
+        # Satu prediksi per lokasi per horizon per tanggal, target ON CONFLICT untuk upsert
+        UniqueConstraint("location_name", "horizon_days", "date", name="uq_weather_predictions_location_horizon_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    location_name = Column(String(100))
+    horizon_days = Column(Integer)
+    data_max_date = Column(Date)  # Tanggal weather_data terakhir saat prediksi dibuat (kunci cache)
     date = Column(Date)
     predicted_temp = Column(Float)
     lower_bound = Column(Float)
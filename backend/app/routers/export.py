@@ -0,0 +1,58 @@
+"""
+Router untuk export data historis harga pasar dan cuaca (streaming NDJSON/CSV)
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import List, Optional
+from app.services.data_export import EXPORT_FORMATS, stream_market_prices, stream_weather_data
+
+router = APIRouter(prefix="/export", tags=["Data Export"])
+
+
+def _streaming_response(chunks, fmt: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
+
+
+def _validate(fmt: str, start_date: Optional[date], end_date: Optional[date]):
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format harus salah satu dari {list(EXPORT_FORMATS)}")
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date tidak boleh setelah end_date")
+
+
+@router.get("/market")
+def export_market_prices(
+    format: str = Query("ndjson", description="Format output: ndjson atau csv"),
+    commodity: Optional[List[str]] = Query(None, description="Filter nama komoditas (boleh lebih dari satu)"),
+    location: Optional[str] = Query(None, description="Filter lokasi pasar"),
+    start_date: Optional[date] = Query(None, description="Tanggal mulai"),
+    end_date: Optional[date] = Query(None, description="Tanggal akhir"),
+):
+    """
+    Export seluruh histori harga pasar sebagai stream NDJSON/CSV.
+    Data dibaca per batch lewat server-side cursor sehingga memori tetap konstan.
+    """
+    _validate(format, start_date, end_date)
+    chunks = stream_market_prices(format, commodity, location, start_date, end_date)
+    return _streaming_response(chunks, format, "market_prices")
+
+
+@router.get("/weather")
+def export_weather_data(
+    format: str = Query("ndjson", description="Format output: ndjson atau csv"),
+    location: Optional[List[str]] = Query(None, description="Filter nama kecamatan (boleh lebih dari satu)"),
+    start_date: Optional[date] = Query(None, description="Tanggal mulai"),
+    end_date: Optional[date] = Query(None, description="Tanggal akhir"),
+):
+    """
+    Export seluruh histori data cuaca sebagai stream NDJSON/CSV.
+    """
+    _validate(format, start_date, end_date)
+    chunks = stream_weather_data(format, location, start_date, end_date)
+    return _streaming_response(chunks, format, "weather_data")
@@ -3,13 +3,28 @@ Router untuk forecasting harga komoditas
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.db import get_db
-from app.services.price_forecasting import PriceForecaster
+import json
+from app.db import SessionLocal, get_db
+from app.services.price_forecasting import FORECAST_MODELS, PriceForecaster, validate_model
+from app.routers.jobs import submit_background_job
+from app.services.model_registry import model_registry
+from app.services.prophet_service import prophet_service
+from app.services.model_selection import model_selector
 
 router = APIRouter(prefix="/forecast", tags=["Price Forecasting"])
 
+MODEL_QUERY_DESCRIPTION = f"Model forecasting: {', '.join(FORECAST_MODELS)}"
+
+
+def _check_model(model: str):
+    try:
+        validate_model(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 @router.get("/commodity/{commodity_name}")
 def forecast_commodity_price(
@@ -17,6 +32,7 @@ def forecast_commodity_price(
     days_forward: int = Query(30, ge=1, le=90, description="Jumlah hari prediksi (1-90)"),
     days_back: int = Query(90, ge=30, le=365, description="Jumlah hari data historis (30-365)"),
     use_synthetic: bool = Query(True, description="Gunakan data sintetis jika data tidak cukup"),
+    model: str = Query("prophet", description=MODEL_QUERY_DESCRIPTION),
     db: Session = Depends(get_db)
 ):
     """
@@ -27,17 +43,20 @@ def forecast_commodity_price(
         days_forward: Jumlah hari ke depan untuk prediksi
         days_back: Jumlah hari kebelakang untuk data historis
         use_synthetic: Gunakan data sintetis sebagai fallback jika data tidak cukup
+        model: prophet (default) atau model cepat holt_winters / seasonal_naive / ridge_weekly
         
     Returns:
         Forecast results dengan prediksi, statistik, dan rekomendasi waktu jual terbaik
     """
+    _check_model(model)
     try:
         forecaster = PriceForecaster(db)
         result = forecaster.forecast_prices(
             commodity_name=commodity_name,
             days_forward=days_forward,
             days_back=days_back,
-            use_synthetic_fallback=use_synthetic
+            use_synthetic_fallback=use_synthetic,
+            model=model
         )
         
         if not result.get("success", False):
@@ -55,37 +74,83 @@ def forecast_commodity_price(
         )
 
 
+def _batch_summary(commodity_names: List[str], results: List[dict]) -> dict:
+    successful = sum(1 for r in results if r.get("success", False))
+    return {
+        "total_requested": len(commodity_names),
+        "successful_forecasts": successful,
+        "failed_forecasts": len(commodity_names) - successful,
+        "results": results
+    }
+
+
+def _run_batch_forecast_job(ctx, commodity_names: List[str], days_forward: int, model: str) -> dict:
+    db = SessionLocal()
+    try:
+        results = PriceForecaster(db).batch_forecast(
+            commodity_names=commodity_names,
+            days_forward=days_forward,
+            progress_callback=lambda done, total: ctx.progress(done / total, f"{done}/{total} komoditas selesai"),
+            model=model
+        )
+        return _batch_summary(commodity_names, results)
+    finally:
+        db.close()
+
+
 @router.post("/batch")
 def batch_forecast(
     commodity_names: List[str],
     days_forward: int = Query(30, ge=1, le=90, description="Jumlah hari prediksi"),
+    stream: bool = Query(False, description="Kirim hasil sebagai NDJSON begitu tiap komoditas selesai"),
+    background: bool = Query(False, description="Jalankan sebagai job background, balas job_id (202)"),
+    model: str = Query("prophet", description=MODEL_QUERY_DESCRIPTION),
     db: Session = Depends(get_db)
 ):
     """
-    Melakukan forecasting untuk multiple komoditas sekaligus
+    Melakukan forecasting untuk multiple komoditas sekaligus.
+    Fit Prophet dijalankan paralel di process pool; model cepat menghitung semua komoditas
+    dalam satu batch matriks. Data historis diambil dalam satu query.
     
     Args:
         commodity_names: List nama komoditas
         days_forward: Jumlah hari prediksi
+        stream: Jika true, response berupa NDJSON (satu baris per komoditas, urutan selesai)
+        background: Jika true, forecasting dijalankan sebagai job; pantau via GET /jobs/{job_id}
+        model: prophet (default) atau model cepat holt_winters / seasonal_naive / ridge_weekly
         
     Returns:
         List of forecast results untuk setiap komoditas
     """
+    _check_model(model)
+    if background:
+        return submit_background_job(
+            "forecast_batch",
+            lambda ctx: _run_batch_forecast_job(ctx, commodity_names, days_forward, model),
+            {"commodity_names": commodity_names, "days_forward": days_forward, "model": model}
+        )
+
     try:
         forecaster = PriceForecaster(db)
+        
+        if stream:
+            results_iter = forecaster.iter_batch_forecast(
+                commodity_names=commodity_names,
+                days_forward=days_forward,
+                model=model
+            )
+            return StreamingResponse(
+                (json.dumps(result, default=str) + "\n" for result in results_iter),
+                media_type="application/x-ndjson"
+            )
+        
         results = forecaster.batch_forecast(
             commodity_names=commodity_names,
-            days_forward=days_forward
+            days_forward=days_forward,
+            model=model
         )
         
-        successful = sum(1 for r in results if r.get("success", False))
-        
-        return {
-            "total_requested": len(commodity_names),
-            "successful_forecasts": successful,
-            "failed_forecasts": len(commodity_names) - successful,
-            "results": results
-        }
+        return _batch_summary(commodity_names, results)
         
     except Exception as e:
         raise HTTPException(
@@ -119,6 +184,79 @@ def get_available_commodities(db: Session = Depends(get_db)):
         )
 
 
+@router.get("/models")
+def get_model_registry_stats():
+    """
+    Status registry model Prophet (jumlah file di disk dan statistik cache memori)
+    serta worker pool Prophet (jumlah fit, rata-rata waktu fit, fallback)
+    """
+    return {
+        "success": True,
+        "registry": model_registry.stats(),
+        "fitting": prophet_service.stats()
+    }
+
+
+def _run_backtest(db: Session, commodity_names: Optional[List[str]], days_back: int, refresh: bool, evaluate_all: bool) -> dict:
+    forecaster = PriceForecaster(db)
+    names = commodity_names or forecaster.get_available_commodities()
+    selections = forecaster.select_models(names, days_back=days_back, refresh=refresh, evaluate_all=evaluate_all)
+    return {
+        "success": True,
+        "total_requested": len(names),
+        "selected": len(selections),
+        "skipped": [name for name in names if name not in selections],
+        "selections": selections
+    }
+
+
+def _backtest_job(ctx, commodity_names: Optional[List[str]], days_back: int, refresh: bool, evaluate_all: bool) -> dict:
+    db = SessionLocal()
+    try:
+        return _run_backtest(db, commodity_names, days_back, refresh, evaluate_all)
+    finally:
+        db.close()
+
+
+@router.post("/backtest")
+def run_model_selection(
+    commodity_names: Optional[List[str]] = None,
+    days_back: int = Query(90, ge=30, le=730, description="Jumlah hari data historis untuk backtest"),
+    refresh: bool = Query(False, description="Backtest ulang walaupun data belum berubah"),
+    evaluate_all: bool = Query(False, description="Backtest Prophet juga walaupun model cepat sudah cukup akurat"),
+    background: bool = Query(False, description="Jalankan sebagai job background, balas job_id (202)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Rolling-origin backtest kandidat model per komoditas (default: semua komoditas).
+    Hasil (MAPE, RMSE, biaya fit, model terpilih) di-cache sampai data baru masuk
+    dan dipakai oleh forecast dengan model=auto.
+    """
+    if background:
+        return submit_background_job(
+            "forecast_backtest",
+            lambda ctx: _backtest_job(ctx, commodity_names, days_back, refresh, evaluate_all),
+            {"commodity_names": commodity_names, "days_back": days_back, "refresh": refresh, "evaluate_all": evaluate_all}
+        )
+
+    try:
+        return _run_backtest(db, commodity_names, days_back, refresh, evaluate_all)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error in backtest: {str(e)}")
+
+
+@router.get("/model-selection")
+def get_model_selection():
+    """
+    Model terpilih per komoditas dari backtest terakhir beserta metriknya
+    """
+    return {
+        "success": True,
+        "summary": model_selector.stats(),
+        "selections": model_selector.entries()
+    }
+
+
 @router.get("/quick-predict/{commodity_name}")
 def quick_price_prediction(
     commodity_name: str,
@@ -0,0 +1,49 @@
+"""
+Router untuk memantau job background (sync, training, forecasting)
+"""
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+from typing import Any, Callable, Dict, Optional
+from app.services.job_queue import JobContext, JobQueueFull, job_manager
+
+router = APIRouter(prefix="/jobs", tags=["Background Jobs"])
+
+
+def submit_background_job(kind: str, fn: Callable[[JobContext], Any], params: Optional[Dict] = None) -> JSONResponse:
+    """
+    Daftarkan job dan langsung balas 202 dengan job_id & URL status.
+    Dipakai endpoint lain yang mendukung parameter background=true.
+    """
+    try:
+        job_id = job_manager.submit(kind, fn, params)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "job_id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}"
+        }
+    )
+
+
+@router.get("")
+def list_jobs(
+    kind: Optional[str] = Query(None, description="Filter jenis job, misal weather_sync"),
+    limit: int = Query(50, ge=1, le=200)
+):
+    """Daftar job terbaru (semua worker)."""
+    return {"jobs": job_manager.list(kind=kind, limit=limit), "executor": job_manager.stats()}
+
+
+@router.get("/{job_id}")
+def get_job(job_id: str):
+    """Status, progres, durasi, dan hasil satu job."""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' tidak ditemukan")
+    return job
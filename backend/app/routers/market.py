@@ -1,90 +1,156 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi.exceptions import RequestValidationError
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime, date
 from typing import Optional
+import base64
+import json
 import logging
 from app.db import get_db
 from app.services.market_sync import (
-    fetch_and_save_market_data, 
-    get_realtime_market_prices,
-    fetch_realtime_komoditas,
-    fetch_realtime_produk_komoditas,
-    fetch_realtime_produk
+    fetch_and_save_market_data,
+    get_realtime_snapshot,
+    realtime_cache,
+    REALTIME_FRESH_TTL
 )
+from app.services.disdagkopukm_client import disdagkopukm_fetcher
+from app.routers.jobs import submit_background_job
+from app.services.market_history import get_commodity_summary
 from app.models.market_model import MarketPrice
 from app.schemas.market_schema import MarketPriceCreate
 
 router = APIRouter(prefix="/market", tags=["Market Data"])
 
+def _set_cache_headers(response: Response, status: str, age: float):
+    response.headers["X-Cache"] = status
+    response.headers["Age"] = str(int(age))
+    response.headers["Cache-Control"] = f"max-age={int(REALTIME_FRESH_TTL)}"
+
 @router.get("/realtime")
-def get_realtime_prices():
+def get_realtime_prices(response: Response):
     """
-    Mengambil data harga pasar real-time langsung dari API Disdagkopukm.
-    Data tidak disimpan ke database, langsung dari API.
+    Mengambil data harga pasar real-time dari API Disdagkopukm.
+    Data tidak disimpan ke database; dilayani dari snapshot stale-while-revalidate.
     """
     try:
-        result = get_realtime_market_prices()
-        return result
+        result, status, age = get_realtime_snapshot("prices")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Gagal mengambil data real-time: {e}")
+        raise HTTPException(status_code=503, detail=f"Gagal mengambil data real-time: {e}")
+    _set_cache_headers(response, status, age)
+    return result
 
 @router.get("/realtime/komoditas")
-def get_komoditas_realtime():
+def get_komoditas_realtime(response: Response):
     """
     Mengambil data komoditas real-time dari API.
     """
     try:
-        data = fetch_realtime_komoditas()
-        return {
-            "success": True,
-            "total": len(data),
-            "data": data,
-            "source": "https://disdagkopukm.wonosobokab.go.id/api/komoditas"
-        }
+        data, status, age = get_realtime_snapshot("komoditas")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Gagal mengambil data komoditas: {e}")
+        raise HTTPException(status_code=503, detail=f"Gagal mengambil data komoditas: {e}")
+    _set_cache_headers(response, status, age)
+    return {
+        "success": True,
+        "total": len(data),
+        "data": data,
+        "source": "https://disdagkopukm.wonosobokab.go.id/api/komoditas"
+    }
 
 @router.get("/realtime/produk-komoditas")
-def get_produk_komoditas_realtime():
+def get_produk_komoditas_realtime(response: Response):
     """
     Mengambil data produk komoditas real-time dari API.
     """
     try:
-        data = fetch_realtime_produk_komoditas()
-        return {
-            "success": True,
-            "total": len(data),
-            "data": data,
-            "source": "https://disdagkopukm.wonosobokab.go.id/api/produk-komoditas"
-        }
+        data, status, age = get_realtime_snapshot("produk-komoditas")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Gagal mengambil data produk-komoditas: {e}")
+        raise HTTPException(status_code=503, detail=f"Gagal mengambil data produk-komoditas: {e}")
+    _set_cache_headers(response, status, age)
+    return {
+        "success": True,
+        "total": len(data),
+        "data": data,
+        "source": "https://disdagkopukm.wonosobokab.go.id/api/produk-komoditas"
+    }
 
 @router.get("/realtime/produk")
-def get_produk_realtime():
+def get_produk_realtime(response: Response):
     """
     Mengambil data produk real-time dari API.
     """
     try:
-        data = fetch_realtime_produk()
-        return {
-            "success": True,
-            "total": len(data),
-            "data": data,
-            "source": "https://disdagkopukm.wonosobokab.go.id/api/produk"
-        }
+        data, status, age = get_realtime_snapshot("produk")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Gagal mengambil data produk: {e}")
+        raise HTTPException(status_code=503, detail=f"Gagal mengambil data produk: {e}")
+    _set_cache_headers(response, status, age)
+    return {
+        "success": True,
+        "total": len(data),
+        "data": data,
+        "source": "https://disdagkopukm.wonosobokab.go.id/api/produk"
+    }
+
+@router.get("/realtime/cache/stats")
+def realtime_cache_stats():
+    """Statistik snapshot cache realtime dan conditional GET ke Disdagkopukm."""
+    return {
+        "status": "success",
+        "snapshot": realtime_cache.stats(),
+        "upstream": disdagkopukm_fetcher.stats()
+    }
+
+def _market_sync_job(ctx) -> dict:
+    result = fetch_and_save_market_data()
+    # fetch_and_save_market_data mengembalikan {"error": ...} alih-alih raise; tandai job gagal
+    if isinstance(result, dict) and result.get("error"):
+        raise RuntimeError(result["error"])
+    return result
 
 @router.post("/sync")
-def sync_market_data():
+def sync_market_data(
+    background: bool = Query(False, description="Jalankan sebagai job background, balas job_id (202)")
+):
     """
     Mengambil data dari API Disdagkopukm dan menyimpannya ke database lokal.
     """
+    if background:
+        return submit_background_job("market_sync", _market_sync_job)
     result = fetch_and_save_market_data()
     return result
 
+# Batas ukuran halaman /market/list
+MARKET_LIST_DEFAULT_LIMIT = 100
+MARKET_LIST_MAX_LIMIT = 1000
+
+# Kolom yang diproyeksikan langsung (tanpa hidrasi objek ORM)
+MARKET_LIST_COLUMNS = (
+    MarketPrice.price_id,
+    MarketPrice.commodity_name,
+    MarketPrice.market_location,
+    MarketPrice.unit,
+    MarketPrice.price,
+    MarketPrice.date,
+    MarketPrice.created_at,
+)
+
+
+def _encode_cursor(last_date: date, price_id: int) -> str:
+    """Cursor opaque untuk posisi keyset (date desc, price_id desc)."""
+    payload = json.dumps({"d": last_date.isoformat(), "id": price_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return date.fromisoformat(payload["d"]), int(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor tidak valid")
+
+
 @router.get("/list")
 def get_market_prices(
     db: Session = Depends(get_db),
@@ -92,54 +158,91 @@ def get_market_prices(
     location: Optional[str] = Query(None, description="Filter berdasarkan lokasi pasar"),
     start_date: Optional[date] = Query(None, description="Filter tanggal mulai"),
     end_date: Optional[date] = Query(None, description="Filter tanggal akhir"),
-    limit: Optional[int] = Query(None, description="Jumlah data maksimal (kosongkan untuk ambil semua)")
+    limit: Optional[int] = Query(
+        None, ge=1, le=MARKET_LIST_MAX_LIMIT,
+        description=f"Jumlah data per halaman (default {MARKET_LIST_DEFAULT_LIMIT}, maks {MARKET_LIST_MAX_LIMIT})"
+    ),
+    cursor: Optional[str] = Query(None, description="Cursor halaman berikutnya (next_cursor dari response sebelumnya)"),
+    include_total: bool = Query(False, description="Hitung total baris yang cocok dengan filter (query COUNT tambahan)")
 ):
     """
-    Mengambil data harga dari database lokal dengan filter.
-    Jika limit=None atau tidak diisi, akan mengambil semua data.
+    Mengambil data harga dari database lokal dengan filter dan keyset pagination.
+    Data diurutkan (date desc, price_id desc); gunakan next_cursor untuk halaman berikutnya.
     """
     try:
-        query = db.query(MarketPrice)
+        page_size = limit or MARKET_LIST_DEFAULT_LIMIT
+        
+        filters = [MarketPrice.date.isnot(None)]
         
         if commodity:
-            query = query.filter(MarketPrice.commodity_name.ilike(f"%{commodity}%"))
+            filters.append(MarketPrice.commodity_name.ilike(f"%{commodity}%"))
         
         if location:
-            query = query.filter(MarketPrice.market_location.ilike(f"%{location}%"))
+            filters.append(MarketPrice.market_location.ilike(f"%{location}%"))
         
         if start_date:
-            query = query.filter(MarketPrice.date >= start_date)
+            filters.append(MarketPrice.date >= start_date)
         
         if end_date:
-            query = query.filter(MarketPrice.date <= end_date)
+            filters.append(MarketPrice.date <= end_date)
+        
+        stmt = select(*MARKET_LIST_COLUMNS).where(*filters)
+        if cursor:
+            cursor_date, cursor_id = _decode_cursor(cursor)
+            stmt = stmt.where(
+                tuple_(MarketPrice.date, MarketPrice.price_id) < tuple_(cursor_date, cursor_id)
+            )
+        stmt = stmt.order_by(MarketPrice.date.desc(), MarketPrice.price_id.desc()).limit(page_size + 1)
         
-        query = query.order_by(MarketPrice.date.desc())
+        rows = db.execute(stmt).all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
         
-        # Jika limit tidak diisi, ambil semua data
-        if limit is not None and limit > 0:
-            prices = query.limit(limit).all()
-        else:
-            prices = query.all()
+        total = None
+        if include_total:
+            total = db.execute(
+                select(func.count()).select_from(MarketPrice).where(*filters)
+            ).scalar()
         
         return {
             "success": True,
-            "total": len(prices),
+            "total": total,
+            "count": len(rows),
+            "has_more": has_more,
+            "next_cursor": _encode_cursor(rows[-1].date, rows[-1].price_id) if has_more else None,
             "data": [
                 {
-                    "price_id": p.price_id,
-                    "commodity_name": p.commodity_name,
-                    "market_location": p.market_location,
-                    "unit": p.unit,
-                    "price": p.price,
-                    "date": p.date.isoformat(),
-                    "created_at": p.created_at.isoformat() if p.created_at else None
+                    "price_id": r.price_id,
+                    "commodity_name": r.commodity_name,
+                    "market_location": r.market_location,
+                    "unit": r.unit,
+                    "price": r.price,
+                    "date": r.date.isoformat(),
+                    "created_at": r.created_at.isoformat() if r.created_at else None
                 }
-                for p in prices
+                for r in rows
             ]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gagal mengambil data: {e}")
 
+@router.get("/summary")
+def get_market_summary(db: Session = Depends(get_db)):
+    """
+    Ringkasan harga per komoditas untuk dashboard (dihitung di database dalam satu query).
+    """
+    try:
+        summary = get_commodity_summary(db)
+        return {
+            "success": True,
+            "total": len(summary),
+            "data": summary
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Gagal mengambil ringkasan: {e}")
+
 @router.post("/test-schema")
 def test_schema_validation(price_data: MarketPriceCreate):
     """
@@ -173,13 +276,34 @@ def add_market_price(price_data: MarketPriceCreate, db: Session = Depends(get_db
         if price_data.price <= 0:
             raise HTTPException(status_code=422, detail="price harus lebih besar dari 0")
         
+        price_date = datetime.strptime(price_data.date, '%Y-%m-%d').date() if price_data.date else datetime.now().date()
+        
+        # Unique (commodity_name, market_location, date): update harga jika sudah ada
+        existing = db.query(MarketPrice).filter(
+            MarketPrice.commodity_name == price_data.commodity_name.strip(),
+            MarketPrice.market_location == price_data.market_location.strip(),
+            MarketPrice.date == price_date
+        ).first()
+        
+        if existing:
+            existing.unit = price_data.unit.strip()
+            existing.price = float(price_data.price)
+            existing.updated_at = datetime.now()
+            db.commit()
+            logging.info(f"✅ Price data updated with ID: {existing.price_id}")
+            return {
+                "status": "success",
+                "message": "Data harga untuk tanggal tersebut sudah ada, harga diperbarui",
+                "data": existing.price_id
+            }
+        
         new_price = MarketPrice(
             user_id=price_data.user_id or 1,  # Default ke admin
             commodity_name=price_data.commodity_name.strip(),
             market_location=price_data.market_location.strip(),
             unit=price_data.unit.strip(),
             price=float(price_data.price),
-            date=datetime.strptime(price_data.date, '%Y-%m-%d').date() if price_data.date else datetime.now().date(),
+            date=price_date,
             created_at=datetime.now()
         )
         
@@ -223,12 +347,19 @@ def update_market_price(
         existing.unit = price_data.unit
         existing.price = price_data.price
         existing.date = price_data.date or existing.date
+        existing.updated_at = datetime.now()
         
         db.commit()
         db.refresh(existing)
         return {"message": "Data berhasil diupdate", "data": existing.price_id}
     except HTTPException:
         raise
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="Data harga untuk komoditas, pasar, dan tanggal tersebut sudah ada"
+        )
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Gagal update data: {e}")
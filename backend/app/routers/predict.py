@@ -1,5 +1,6 @@
-from fastapi import APIRouter
-from app.services.ai_market import predict_price, train_price_models
+from fastapi import APIRouter, Query
+from app.services.ai_market import predict_price, refit_price_models, train_price_models
+from app.routers.jobs import submit_background_job
 
 router = APIRouter(prefix="/predict", tags=["AI Prediction"])
 
@@ -11,9 +12,32 @@ def get_prediction(commodity_name: str, market_location: str, days_ahead: int =
     return predict_price(commodity_name, market_location, days_ahead)
 
 @router.post("/train")
-def train_models():
+def train_models(
+    background: bool = Query(False, description="Jalankan sebagai job background, balas job_id (202)")
+):
     """
     Endpoint untuk melatih ulang semua model harga dari data di database.
     """
+    if background:
+        return submit_background_job("train_price_models", lambda ctx: train_price_models())
     train_price_models()
     return {"message": "Model retraining selesai"}
+
+@router.post("/refit")
+def refit_models(
+    force: bool = Query(False, description="Refit semua seri walaupun datanya tidak berubah"),
+    background: bool = Query(False, description="Jalankan sebagai job background, balas job_id (202)")
+):
+    """
+    Refit inkremental: hanya model komoditas/pasar yang mendapat data baru sejak fit terakhir.
+    """
+    if background:
+        return submit_background_job(
+            "refit_price_models",
+            lambda ctx: refit_price_models(
+                force=force,
+                progress_callback=lambda done, total: ctx.progress(done / total, f"{done}/{total} seri selesai")
+            ),
+            {"force": force}
+        )
+    return refit_price_models(force=force)
@@ -4,25 +4,47 @@ from sqlalchemy import func
 from app.services.ai_weather import (
     predict_weather,
     predict_weather_by_coordinates,
+    predict_weather_districts,
     fetch_weather_data,
     fetch_weather_by_coordinates,
     save_weather_data,
-    DISTRICTS
+    get_weather_cache_stats,
+    DISTRICTS,
+    WEATHER_MODELS
 )
-from app.db import get_db
+from app.services.fast_forecast import FAST_MODELS
+from app.services.weather_interpolation import build_weather_cube
+from app.db import SessionLocal, get_db
+from app.routers.jobs import submit_background_job
 from app.schemas.weather_schema import WeatherPredictionResponse
 from app.models.weather_model import WeatherData
 import datetime, logging, traceback
 
 router = APIRouter(prefix="/weather", tags=["Weather"])
 
+
+def _validate_model(model: str, allowed=WEATHER_MODELS):
+    if model not in allowed:
+        raise HTTPException(status_code=400, detail=f"Model '{model}' tidak dikenal, pilih salah satu: {', '.join(allowed)}")
+
+
+def _prediction_to_dict(pred) -> dict:
+    return {
+        "date": pred.date.isoformat() if hasattr(pred.date, 'isoformat') else str(pred.date),
+        "predicted_temp": float(pred.predicted_temp) if pred.predicted_temp is not None else 0.0,
+        "lower_bound": float(pred.lower_bound) if pred.lower_bound is not None else 0.0,
+        "upper_bound": float(pred.upper_bound) if pred.upper_bound is not None else 0.0,
+        "source": pred.source or "Unknown"
+    }
+
 # === 1️⃣ PREDIKSI CUACA BERDASARKAN KOORDINAT ===
 @router.get("/predict/coordinates")
 def predict_weather_coordinates(
     lat: float = Query(..., description="Latitude koordinat lokasi"),
     lon: float = Query(..., description="Longitude koordinat lokasi"),
     location_name: str = Query(None, description="Nama lokasi (opsional)"),
-    days: int = Query(7, description="Jumlah hari prediksi (default: 7)"),
+    days: int = Query(7, ge=1, description="Jumlah hari prediksi (default: 7)"),
+    model: str = Query("prophet", description="prophet, holt_winters, seasonal_naive, atau ridge_weekly"),
     db: Session = Depends(get_db)
 ):
     """
@@ -30,6 +52,7 @@ def predict_weather_coordinates(
     Langsung menggunakan data dari OpenWeather API untuk koordinat yang diberikan.
     """
     try:
+        _validate_model(model)
         # Validasi koordinat
         if not (-90 <= lat <= 90):
             raise HTTPException(status_code=400, detail="Latitude harus antara -90 dan 90")
@@ -37,18 +60,10 @@ def predict_weather_coordinates(
             raise HTTPException(status_code=400, detail="Longitude harus antara -180 dan 180")
         
         # Generate prediksi
-        preds = predict_weather_by_coordinates(db, lat, lon, location_name, days)
+        preds = predict_weather_by_coordinates(db, lat, lon, location_name, days, model)
         
         # Konversi SQLAlchemy objects ke dictionary
-        predictions_data = []
-        for pred in preds:
-            predictions_data.append({
-                "date": pred.date.isoformat() if hasattr(pred.date, 'isoformat') else str(pred.date),
-                "predicted_temp": float(pred.predicted_temp) if pred.predicted_temp is not None else 0.0,
-                "lower_bound": float(pred.lower_bound) if pred.lower_bound is not None else 0.0,
-                "upper_bound": float(pred.upper_bound) if pred.upper_bound is not None else 0.0,
-                "source": pred.source or "Unknown"
-            })
+        predictions_data = [_prediction_to_dict(pred) for pred in preds]
         
         return {
             "status": "success", 
@@ -66,26 +81,19 @@ def predict_weather_coordinates(
 
 # === 1️⃣A PREDIKSI CUACA (LEGACY) ===
 @router.get("/predict")
-def get_predictions(days: int = 7, location: str = None, db: Session = Depends(get_db)):
+def get_predictions(days: int = Query(7, ge=1), location: str = None, model: str = "prophet", db: Session = Depends(get_db)):
     """
     Prediksi suhu per lokasi (jika diberikan) atau keseluruhan (default).
     """
+    _validate_model(model)
     try:
         if location:
-            preds = predict_weather(db, days_ahead=days, location=location)
+            preds = predict_weather(db, days_ahead=days, location=location, model=model)
         else:
-            preds = predict_weather(db, days_ahead=days)
+            preds = predict_weather(db, days_ahead=days, model=model)
         
         # Konversi SQLAlchemy objects ke dictionary
-        predictions_data = []
-        for pred in preds:
-            predictions_data.append({
-                "date": pred.date.isoformat() if hasattr(pred.date, 'isoformat') else str(pred.date),
-                "predicted_temp": float(pred.predicted_temp) if pred.predicted_temp is not None else 0.0,
-                "lower_bound": float(pred.lower_bound) if pred.lower_bound is not None else 0.0,
-                "upper_bound": float(pred.upper_bound) if pred.upper_bound is not None else 0.0,
-                "source": pred.source or "Unknown"
-            })
+        predictions_data = [_prediction_to_dict(pred) for pred in preds]
         
         return {"status": "success", "predictions": predictions_data}
     except Exception as e:
@@ -94,6 +102,31 @@ def get_predictions(days: int = 7, location: str = None, db: Session = Depends(g
         return {"status": "error", "message": str(e)}
 
 
+# === 1️⃣B PREDIKSI SEMUA KECAMATAN SEKALIGUS (MODEL CEPAT) ===
+@router.get("/predict/districts")
+def get_district_predictions(
+    days: int = Query(7, ge=1, le=60, description="Jumlah hari prediksi"),
+    model: str = Query("holt_winters", description="holt_winters, seasonal_naive, atau ridge_weekly"),
+    db: Session = Depends(get_db)
+):
+    """
+    Prediksi suhu seluruh kecamatan dalam satu batch model cepat (tanpa Prophet).
+    """
+    _validate_model(model, FAST_MODELS)
+    try:
+        predictions = predict_weather_districts(db, days_ahead=days, model=model)
+    except Exception as e:
+        logging.error(f"Error in get_district_predictions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "status": "success",
+        "model": model,
+        "predictions": {
+            location: [_prediction_to_dict(pred) for pred in preds]
+            for location, preds in predictions.items()
+        }
+    }
+
 # === 2️⃣ CUACA TERKINI (DIRECT OPENWEATHER, TANPA INTERPOLASI) ===
 @router.get("/current")
 def get_current_weather(
@@ -122,7 +155,7 @@ def get_current_weather(
 
             if record is None or force_refresh:
                 try:
-                    df = fetch_weather_by_coordinates(d["lat"], d["lon"], name)
+                    df = fetch_weather_by_coordinates(d["lat"], d["lon"], name, use_cache=not force_refresh)
                     # Simpan semua (current + forecast) agar berguna untuk prediksi
                     save_weather_data(db, df)
                     record = db.query(WeatherData).filter(
@@ -234,22 +267,41 @@ def get_current_weather_coordinates(
 
 
 # === 3️⃣ SINKRONISASI MANUAL DENGAN OPENWEATHER ===
-@router.post("/sync")
-def sync_weather_data(db: Session = Depends(get_db)):
-    """Sinkronisasi data cuaca dari OpenWeather API"""
+def _run_weather_sync(db: Session) -> dict:
+    df = fetch_weather_data()
+    if df.empty:
+        raise ValueError("Tidak ada data dari OpenWeather")
+
+    saved = save_weather_data(db, df)
+    logging.info(f"✅ Berhasil sinkron {len(df)} data dari OpenWeather.")
+    return {
+        "status": "success",
+        "message": f"Berhasil sinkron {len(df)} data dari OpenWeather",
+        "records": len(df),
+        "inserted": saved["inserted"],
+        "updated": saved["updated"],
+    }
+
+def _weather_sync_job(ctx) -> dict:
+    db = SessionLocal()
     try:
-        df = fetch_weather_data()
-        if df.empty:
-            raise HTTPException(status_code=404, detail="Tidak ada data dari OpenWeather")
+        return _run_weather_sync(db)
+    finally:
+        db.close()
 
-        save_weather_data(db, df)
-        logging.info(f"✅ Berhasil sinkron {len(df)} data dari OpenWeather.")
-        return {
-            "status": "success",
-            "message": f"Berhasil sinkron {len(df)} data dari OpenWeather",
-            "records": len(df),
-        }
+@router.post("/sync")
+def sync_weather_data(
+    background: bool = Query(False, description="Jalankan sebagai job background, balas job_id (202)"),
+    db: Session = Depends(get_db)
+):
+    """Sinkronisasi data cuaca dari OpenWeather API"""
+    if background:
+        return submit_background_job("weather_sync", _weather_sync_job)
 
+    try:
+        return _run_weather_sync(db)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logging.error(f"❌ Gagal sinkronisasi: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -290,3 +342,43 @@ def sync_weather_coordinates(
     except Exception as e:
         logging.error(f"❌ Gagal sinkronisasi koordinat: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# === 4️⃣ STATISTIK CACHE OPENWEATHER ===
+@router.get("/cache/stats")
+def weather_cache_stats():
+    """Statistik cache response OpenWeather per koordinat (hit/miss, ukuran, TTL)."""
+    return {"status": "success", "cache": get_weather_cache_stats()}
+
+
+# === 5️⃣ KUBUS CUACA RENTANG TANGGAL (OBSERVASI + INTERPOLASI IDW) ===
+WEATHER_CUBE_MAX_DAYS = 366
+
+@router.get("/interpolate/range")
+def get_weather_cube(
+    start_date: datetime.date = Query(..., description="Tanggal awal (YYYY-MM-DD)"),
+    end_date: datetime.date = Query(..., description="Tanggal akhir (YYYY-MM-DD)"),
+    locations: str = Query(None, description="Daftar kecamatan dipisah koma (default: semua)"),
+    k: int = Query(3, ge=1, le=10, description="Jumlah kecamatan terdekat untuk IDW"),
+    db: Session = Depends(get_db)
+):
+    """
+    Grid cuaca padat kecamatan × tanggal × variabel untuk satu rentang tanggal.
+    Setiap sel ditandai provenance: observed, interpolated, atau missing.
+    """
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date harus >= start_date")
+    if (end_date - start_date).days + 1 > WEATHER_CUBE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Rentang maksimal {WEATHER_CUBE_MAX_DAYS} hari")
+
+    location_list = [loc.strip() for loc in locations.split(",") if loc.strip()] if locations else None
+
+    try:
+        cube = build_weather_cube(db, start_date, end_date, location_list, k=k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"❌ Gagal membangun kubus cuaca: {traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"status": "success", **cube}
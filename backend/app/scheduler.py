@@ -1,58 +1,425 @@
 """
 Scheduler untuk auto-sync data harga pasar dari API Disdagkopukm
 Akan berjalan setiap 1 jam sekali untuk menjaga data tetap up-to-date
+
+Mode "coordinated" (default) aman untuk banyak worker/host: setiap run job
+mengambil PostgreSQL advisory lock per job, sehingga hanya satu worker yang
+menjalankannya. Status run terakhir (waktu, durasi, hasil) disimpan di tabel
+scheduler_job_state dan dibaca oleh get_scheduler_status.
 """
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import json
 import logging
+import os
+import socket
+import time
+import zlib
 from app.services.market_sync import fetch_and_save_market_data
-from app.db import SessionLocal
+from app.db import SessionLocal, engine
+from app.models.scheduler_model import SchedulerJobState
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# "coordinated": advisory lock lintas worker; "local": setiap worker menjalankan job sendiri
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "coordinated").lower()
+RUNNER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
 # Create scheduler instance
 scheduler = BackgroundScheduler()
 
-def sync_market_data_job():
-    """
-    Job untuk sinkronisasi data harga pasar
-    """
+# Jendela dedup per job: run yang sukses dalam jendela ini tidak diulang worker lain
+_dedup_seconds = {}
+
+def _lock_key(job_id: str) -> int:
+    """Key advisory lock yang stabil lintas proses untuk satu job."""
+    return zlib.crc32(f"scheduler:{job_id}".encode("utf-8"))
+
+_state_table_ready = False
+
+# Kolom yang ditambahkan setelah tabel pertama kali dibuat (tabel lama di-upgrade otomatis)
+_STATE_COLUMNS_SQL = [
+    "ALTER TABLE scheduler_job_state ADD COLUMN IF NOT EXISTS adaptive_interval_seconds DOUBLE PRECISION",
+    "ALTER TABLE scheduler_job_state ADD COLUMN IF NOT EXISTS next_due_at TIMESTAMP",
+]
+
+def _ensure_state_table():
+    global _state_table_ready
+    if not _state_table_ready:
+        SchedulerJobState.__table__.create(bind=engine, checkfirst=True)
+        with engine.begin() as conn:
+            for sql in _STATE_COLUMNS_SQL:
+                conn.execute(text(sql))
+        _state_table_ready = True
+
+def _recently_succeeded(job_id: str, window_seconds: float) -> bool:
+    if window_seconds <= 0:
+        return False
+    db = SessionLocal()
     try:
-        logger.info(f"🔄 Starting market data sync at {datetime.now()}")
-        result = fetch_and_save_market_data()
-        logger.info(f"✅ Market data sync completed: {result}")
+        state = db.get(SchedulerJobState, job_id)
+        return (
+            state is not None
+            and state.last_status == "success"
+            and state.last_finished_at is not None
+            and state.last_finished_at > datetime.now() - timedelta(seconds=window_seconds)
+        )
+    finally:
+        db.close()
+
+def _summarize_result(result):
+    if result is None:
+        return None
+    serialized = json.dumps(result, default=str)
+    if len(serialized) > 4000:
+        serialized = json.dumps({"truncated": True, "preview": serialized[:1000]})
+    return serialized
+
+def _record_run(job_id: str, started_at: datetime, duration: float, status: str, result=None, error: str = None):
+    """Upsert status run terakhir job ke scheduler_job_state."""
+    table = SchedulerJobState.__table__
+    values = {
+        "job_id": job_id,
+        "last_started_at": started_at,
+        "last_finished_at": datetime.now(),
+        "last_duration_seconds": round(duration, 3),
+        "last_status": status,
+        "last_error": error,
+        "last_result": _summarize_result(result),
+        "last_runner": RUNNER_ID,
+        "run_count": 1,
+    }
+    stmt = pg_insert(table).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.job_id],
+        set_={
+            **{col: stmt.excluded[col] for col in values if col not in ("job_id", "run_count")},
+            "run_count": table.c.run_count + 1,
+        },
+    )
+    db = SessionLocal()
+    try:
+        _ensure_state_table()
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"⚠️ Gagal menyimpan status job {job_id}: {e}")
+    finally:
+        db.close()
+
+def _execute(job_id: str, func):
+    started_at = datetime.now()
+    start = time.perf_counter()
+    try:
+        result = func()
     except Exception as e:
-        logger.error(f"❌ Market data sync failed: {e}")
+        duration = time.perf_counter() - start
+        logger.error(f"❌ Job {job_id} gagal setelah {duration:.1f}s: {e}")
         # Don't raise exception to prevent scheduler from stopping
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
+        _record_run(job_id, started_at, duration, "failed", error=str(e))
+        return {"status": "failed", "error": str(e), "duration_seconds": round(duration, 3)}
 
-def sync_weather_data_job():
+    duration = time.perf_counter() - start
+    _record_run(job_id, started_at, duration, "success", result=result)
+    return {"status": "success", "result": result, "duration_seconds": round(duration, 3)}
+
+def _not_due(job_id: str, tolerance_seconds: float) -> bool:
+    """Job adaptif belum jatuh tempo menurut next_due_at bersama (ditulis worker yang terakhir menjalankan)."""
+    db = SessionLocal()
+    try:
+        state = db.get(SchedulerJobState, job_id)
+        return (
+            state is not None
+            and state.next_due_at is not None
+            and datetime.now() < state.next_due_at - timedelta(seconds=tolerance_seconds)
+        )
+    finally:
+        db.close()
+
+def run_job(job_id: str, func, due_tolerance_seconds: Optional[float] = None):
     """
-    Job untuk sinkronisasi data cuaca dari OpenWeather API
+    Jalankan job dengan koordinasi antar worker (mode coordinated) dan catat hasilnya.
+
+    Args:
+        due_tolerance_seconds: Jika diisi (job adaptif), lewati run sebelum next_due_at bersama
+            dikurangi toleransi ini
+
+    Returns:
+        Dictionary status: success / failed / skipped (beserta alasannya)
     """
-    try:
-        logger.info(f"🌤️ Starting weather data sync (OpenWeather) at {datetime.now()}")
-        from app.services.ai_weather import fetch_weather_data, save_weather_data
-        
-        db = SessionLocal()
+    if SCHEDULER_MODE != "coordinated":
+        return _execute(job_id, func)
+
+    _ensure_state_table()
+    with engine.connect() as conn:
+        acquired = conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": _lock_key(job_id)}
+        ).scalar()
+        # Lock level session tetap dipegang; akhiri transaksi agar koneksi tidak idle-in-transaction
+        conn.commit()
+        if not acquired:
+            logger.info(f"⏭️ Job {job_id} sedang dijalankan worker lain, dilewati")
+            return {"status": "skipped", "reason": "locked"}
+
         try:
-            df = fetch_weather_data()
-            if not df.empty:
-                records_saved = save_weather_data(db, df)  # Fix: db first, then df
-                logger.info(f"✅ OpenWeather data sync completed: {records_saved} records saved")
-            else:
-                logger.warning("⚠️ No weather data received from OpenWeather")
+            if _recently_succeeded(job_id, _dedup_seconds.get(job_id, 0)):
+                logger.info(f"⏭️ Job {job_id} baru saja sukses di worker lain, dilewati")
+                return {"status": "skipped", "reason": "recently_ran"}
+            if due_tolerance_seconds is not None and _not_due(job_id, due_tolerance_seconds):
+                logger.info(f"⏭️ Job {job_id} belum jatuh tempo (interval adaptif bersama), dilewati")
+                return {"status": "skipped", "reason": "not_due"}
+            return _execute(job_id, func)
         finally:
-            db.close()
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _lock_key(job_id)})
+            conn.commit()
+
+def _sync_market_data():
+    logger.info(f"🔄 Starting market data sync at {datetime.now()}")
+    result = fetch_and_save_market_data()
+    if isinstance(result, dict) and result.get("error"):
+        raise RuntimeError(result["error"])
+    logger.info(f"✅ Market data sync completed: {result}")
+    return result
+
+def _sync_weather_data():
+    logger.info(f"🌤️ Starting weather data sync (OpenWeather) at {datetime.now()}")
+    from app.services.ai_weather import fetch_weather_data, save_weather_data, prune_weather_predictions
+
+    db = SessionLocal()
+    try:
+        df = fetch_weather_data()
+        if df.empty:
+            logger.warning("⚠️ No weather data received from OpenWeather")
+            return {"inserted": 0, "updated": 0, "rows": 0}
+        saved = save_weather_data(db, df)
+        saved["pruned_predictions"] = prune_weather_predictions(db)
+        logger.info(
+            f"✅ OpenWeather data sync completed: {saved['inserted']} inserted, "
+            f"{saved['updated']} updated"
+        )
+        return saved
+    finally:
+        db.close()
+
+# === Konfigurasi trigger per job ===
+def _env(prefix: str, name: str, default=None):
+    value = os.getenv(f"{prefix}_{name}")
+    return default if value is None or value.strip() == "" else value.strip()
+
+@dataclass
+class SyncJobConfig:
+    """
+    Trigger satu job sync: cron ATAU interval (opsional adaptif), plus jitter & misfire grace.
+    """
+    job_id: str
+    name: str
+    interval_seconds: float
+    cron: Optional[str] = None
+    jitter_seconds: int = 0
+    misfire_grace_seconds: int = 300
+    adaptive: bool = False
+    min_interval_seconds: Optional[float] = None
+    max_interval_seconds: Optional[float] = None
+    run_on_start: bool = True  # Ikut dijalankan saat start_scheduler(run_immediately=True)
+
+    @classmethod
+    def from_env(cls, prefix: str, job_id: str, name: str, default_hours: float,
+                 default_cron: Optional[str] = None) -> "SyncJobConfig":
+        """
+        Baca konfigurasi dari env, misal untuk prefix WEATHER_SYNC:
+        WEATHER_SYNC_CRON="*/30 * * * *", WEATHER_SYNC_INTERVAL_MINUTES, WEATHER_SYNC_JITTER_SECONDS,
+        WEATHER_SYNC_MISFIRE_GRACE_SECONDS, WEATHER_SYNC_ADAPTIVE, WEATHER_SYNC_MIN/MAX_INTERVAL_MINUTES
+        """
+        interval = float(_env(prefix, "INTERVAL_MINUTES", default_hours * 60)) * 60
+        cron = _env(prefix, "CRON", default_cron)
+        if cron:
+            try:
+                CronTrigger.from_crontab(cron)
+            except ValueError as e:
+                raise ValueError(f"{prefix}_CRON tidak valid ('{cron}'): {e}") from e
+        config = cls(
+            job_id=job_id,
+            name=name,
+            interval_seconds=interval,
+            cron=cron,
+            jitter_seconds=int(_env(prefix, "JITTER_SECONDS", 0)),
+            misfire_grace_seconds=int(_env(prefix, "MISFIRE_GRACE_SECONDS", 300)),
+            adaptive=_env(prefix, "ADAPTIVE", "false").lower() == "true",
+        )
+        config.min_interval_seconds = float(_env(prefix, "MIN_INTERVAL_MINUTES", interval / 4 / 60)) * 60
+        config.max_interval_seconds = float(_env(prefix, "MAX_INTERVAL_MINUTES", interval * 4 / 60)) * 60
+        return config
+
+    def build_trigger(self, interval_seconds: Optional[float] = None):
+        jitter = self.jitter_seconds or None
+        if self.cron:
+            trigger = CronTrigger.from_crontab(self.cron)
+            trigger.jitter = jitter
+            return trigger
+        return IntervalTrigger(seconds=interval_seconds or self.interval_seconds, jitter=jitter)
+
+    def dedup_seconds(self) -> float:
+        """Jendela dedup antar worker: lebih kecil dari jarak run terdekat, lebih besar dari jitter."""
+        if self.cron:
+            return max(300, self.jitter_seconds * 2)
+        shortest = self.min_interval_seconds if self.adaptive else self.interval_seconds
+        return max(60, shortest / 2)
+
+    def describe(self) -> str:
+        if self.cron:
+            return f"cron '{self.cron}'"
+        mode = " adaptive" if self.adaptive else ""
+        return f"every {self.interval_seconds / 60:g} min{mode}"
+
+_job_configs: Dict[str, SyncJobConfig] = {}
+_adaptive_intervals: Dict[str, float] = {}
+
+def _has_changes(result) -> bool:
+    """Hasil sync dianggap berubah jika ada baris inserted/updated (tak dikenali → dianggap berubah)."""
+    if isinstance(result, dict) and "inserted" in result and "updated" in result:
+        return (result["inserted"] or 0) + (result["updated"] or 0) > 0
+    return True
+
+def _shared_interval(job_id: str) -> Optional[float]:
+    """Interval adaptif yang disimpan di scheduler_job_state (hanya mode coordinated)."""
+    if SCHEDULER_MODE != "coordinated":
+        return None
+    db = SessionLocal()
+    try:
+        state = db.get(SchedulerJobState, job_id)
+        return state.adaptive_interval_seconds if state is not None else None
     except Exception as e:
-        logger.error(f"❌ OpenWeather data sync failed: {e}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.warning(f"⚠️ Gagal membaca interval adaptif {job_id}: {e}")
+        return None
+    finally:
+        db.close()
+
+def _save_shared_interval(job_id: str, interval: float):
+    """Simpan interval adaptif & next_due_at agar worker yang tidak menjalankan job ikut backoff."""
+    if SCHEDULER_MODE != "coordinated":
+        return
+    db = SessionLocal()
+    try:
+        db.query(SchedulerJobState).filter(SchedulerJobState.job_id == job_id).update({
+            "adaptive_interval_seconds": interval,
+            "next_due_at": datetime.now() + timedelta(seconds=interval),
+        })
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"⚠️ Gagal menyimpan interval adaptif {job_id}: {e}")
+    finally:
+        db.close()
+
+def _apply_interval(config: SyncJobConfig, interval: float):
+    if _adaptive_intervals.get(config.job_id, config.interval_seconds) == interval:
+        return
+    _adaptive_intervals[config.job_id] = interval
+    if scheduler.get_job(config.job_id):
+        scheduler.reschedule_job(config.job_id, trigger=config.build_trigger(interval))
+
+def _adapt_interval(config: SyncJobConfig, changed: bool):
+    """Percepat interval saat upstream berubah, perlambat (backoff) saat tidak ada perubahan."""
+    current = _shared_interval(config.job_id) or _adaptive_intervals.get(config.job_id, config.interval_seconds)
+    if changed:
+        new_interval = max(config.min_interval_seconds, current / 2)
+    else:
+        new_interval = min(config.max_interval_seconds, current * 2)
+    _save_shared_interval(config.job_id, new_interval)
+    if new_interval == _adaptive_intervals.get(config.job_id, config.interval_seconds):
+        return
+
+    _apply_interval(config, new_interval)
+    logger.info(
+        f"📐 Interval {config.job_id}: {current / 60:g} → {new_interval / 60:g} menit "
+        f"({'ada perubahan' if changed else 'tidak ada perubahan'})"
+    )
+
+def _run_and_adapt(job_id: str, func):
+    config = _job_configs.get(job_id)
+    if not (config and config.adaptive and not config.cron):
+        return run_job(job_id, func)
+
+    # Tick worker lain bisa bergeser sebesar jitter; beri toleransi agar run yang tepat waktu tidak dilewati
+    outcome = run_job(job_id, func, due_tolerance_seconds=config.jitter_seconds + 60)
+    if outcome.get("status") == "success":
+        _adapt_interval(config, _has_changes(outcome.get("result")))
+    else:
+        # Worker yang melewati run ikut memakai interval hasil adaptasi worker lain
+        shared = _shared_interval(job_id)
+        if shared:
+            _apply_interval(config, shared)
+    return outcome
+
+def sync_market_data_job():
+    """
+    Job untuk sinkronisasi data harga pasar
+    """
+    return _run_and_adapt("market_sync_job", _sync_market_data)
+
+def sync_weather_data_job():
+    """
+    Job untuk sinkronisasi data cuaca dari OpenWeather API
+    """
+    return _run_and_adapt("weather_sync_job", _sync_weather_data)
+
+def _refit_price_models():
+    logger.info(f"🧠 Starting incremental price model refit at {datetime.now()}")
+    from app.services.ai_market import refit_price_models
+    return refit_price_models()
+
+def refit_price_models_job():
+    """
+    Job refit inkremental model harga (hanya seri dengan data baru)
+    """
+    return run_job("price_refit_job", _refit_price_models)
+
+JOB_FUNCTIONS = {
+    "market_sync_job": sync_market_data_job,
+    "weather_sync_job": sync_weather_data_job,
+    "price_refit_job": refit_price_models_job,
+}
+
+PRICE_REFIT_ENABLED = os.getenv("PRICE_REFIT_ENABLED", "true").lower() == "true"
+PRICE_REFIT_DEFAULT_CRON = "30 1 * * *"  # Tiap malam, setelah sync harian
+
+def default_job_configs(hours=24) -> List[SyncJobConfig]:
+    """
+    Konfigurasi job dari env (prefix MARKET_SYNC_ dan WEATHER_SYNC_);
+    tanpa env, keduanya memakai interval `hours`. Refit model harga (prefix PRICE_REFIT_)
+    default berjalan tiap malam dan tidak ikut dijalankan saat startup.
+    """
+    configs = [
+        SyncJobConfig.from_env("MARKET_SYNC", "market_sync_job", "Sync Market Data from API", hours),
+        SyncJobConfig.from_env("WEATHER_SYNC", "weather_sync_job", "Sync Weather Data from OpenWeather", hours),
+    ]
+    if PRICE_REFIT_ENABLED:
+        refit = SyncJobConfig.from_env(
+            "PRICE_REFIT", "price_refit_job", "Incremental Price Model Refit", hours, PRICE_REFIT_DEFAULT_CRON
+        )
+        refit.run_on_start = False
+        configs.append(refit)
+    return configs
+
+def register_dedup_windows(configs: List[SyncJobConfig]):
+    """
+    Daftarkan jendela dedup per job tanpa men-start scheduler, agar sync warm-up saat
+    startup tetap hanya dijalankan satu worker walau auto-sync dinonaktifkan.
+    """
+    for config in configs:
+        _dedup_seconds[config.job_id] = config.dedup_seconds()
 
 def start_scheduler():
     """
@@ -60,41 +427,55 @@ def start_scheduler():
     """
     start_scheduler_with_interval(hours=1)
 
-def start_scheduler_with_interval(hours=24):
+def start_scheduler_with_interval(hours=24, run_immediately=True):
     """
     Memulai scheduler dengan interval custom
-    
+
     Args:
-        hours: Interval sync dalam jam (default: 24 jam / sekali sehari)
+        hours: Interval sync default dalam jam (default: 24 jam / sekali sehari),
+            bisa di-override per job lewat env MARKET_SYNC_* / WEATHER_SYNC_*
+        run_immediately: Jalankan sync sekali secara inline setelah scheduler start
+    """
+    start_scheduler_with_configs(default_job_configs(hours), run_immediately=run_immediately)
+
+def start_scheduler_with_configs(configs: List[SyncJobConfig], run_immediately=True):
+    """
+    Memulai scheduler dengan trigger terpisah per job
     """
     try:
-        # Add job untuk market data sync
-        scheduler.add_job(
-            func=sync_market_data_job,
-            trigger=IntervalTrigger(hours=hours),
-            id='market_sync_job',
-            name=f'Sync Market Data from API (every {hours}h)',
-            replace_existing=True
-        )
-        
-        # Add job untuk weather data sync (same interval)
-        scheduler.add_job(
-            func=sync_weather_data_job,
-            trigger=IntervalTrigger(hours=hours),
-            id='weather_sync_job',
-            name=f'Sync Weather Data from OpenWeather (every {hours}h)',
-            replace_existing=True
-        )
-        
+        _ensure_state_table()
+        # Worker lain yang tick-nya sedikit bergeser tidak mengulang run yang baru selesai
+        register_dedup_windows(configs)
+
+        for config in configs:
+            _job_configs[config.job_id] = config
+            _adaptive_intervals.pop(config.job_id, None)
+            shared = _shared_interval(config.job_id) if config.adaptive and not config.cron else None
+            if shared:
+                _adaptive_intervals[config.job_id] = shared
+
+            scheduler.add_job(
+                func=JOB_FUNCTIONS[config.job_id],
+                trigger=config.build_trigger(_adaptive_intervals.get(config.job_id)),
+                id=config.job_id,
+                name=f"{config.name} ({config.describe()})",
+                misfire_grace_time=config.misfire_grace_seconds,
+                coalesce=True,
+                max_instances=1,
+                replace_existing=True
+            )
+            logger.info(f"📅 {config.job_id}: {config.describe()}, jitter {config.jitter_seconds}s")
+
         # Start scheduler
         scheduler.start()
-        logger.info("✅ Scheduler started successfully")
-        logger.info(f"📅 Market & Weather data will sync every {hours} hour(s)")
-        
+        logger.info(f"✅ Scheduler started successfully (mode: {SCHEDULER_MODE}, runner: {RUNNER_ID})")
+
         # Run once immediately on startup
-        sync_market_data_job()
-        sync_weather_data_job()
-        
+        if run_immediately:
+            for config in configs:
+                if config.run_on_start:
+                    JOB_FUNCTIONS[config.job_id]()
+
     except Exception as e:
         logger.error(f"❌ Failed to start scheduler: {e}")
 
@@ -108,17 +489,52 @@ def stop_scheduler():
     except Exception as e:
         logger.error(f"❌ Failed to stop scheduler: {e}")
 
+def _load_job_states():
+    db = SessionLocal()
+    try:
+        return {state.job_id: state for state in db.query(SchedulerJobState).all()}
+    except Exception as e:
+        logger.warning(f"⚠️ Gagal membaca status job: {e}")
+        return {}
+    finally:
+        db.close()
+
+def _state_to_dict(state: SchedulerJobState):
+    if state is None:
+        return None
+    return {
+        "started_at": state.last_started_at.isoformat() if state.last_started_at else None,
+        "finished_at": state.last_finished_at.isoformat() if state.last_finished_at else None,
+        "duration_seconds": state.last_duration_seconds,
+        "status": state.last_status,
+        "error": state.last_error,
+        "result": json.loads(state.last_result) if state.last_result else None,
+        "runner": state.last_runner,
+        "run_count": state.run_count,
+        "next_due_at": state.next_due_at.isoformat() if state.next_due_at else None,
+    }
+
 def get_scheduler_status():
     """
-    Mendapatkan status scheduler
+    Mendapatkan status scheduler beserta run terakhir tiap job (dari semua worker)
     """
+    states = _load_job_states()
     return {
         "running": scheduler.running,
+        "mode": SCHEDULER_MODE,
+        "runner": RUNNER_ID,
         "jobs": [
             {
                 "id": job.id,
                 "name": job.name,
-                "next_run": job.next_run_time.isoformat() if job.next_run_time else None
+                "next_run": job.next_run_time.isoformat() if job.next_run_time else None,
+                "trigger": str(job.trigger),
+                "adaptive_interval_seconds": (
+                    states[job.id].adaptive_interval_seconds
+                    if job.id in states and states[job.id].adaptive_interval_seconds
+                    else _adaptive_intervals.get(job.id)
+                ),
+                "last_run": _state_to_dict(states.get(job.id))
             }
             for job in scheduler.get_jobs()
         ]
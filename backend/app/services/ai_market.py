@@ -1,78 +1,334 @@
 import os
+import time
 import joblib
+import numpy as np
 import pandas as pd
-from datetime import timedelta
-from prophet import Prophet
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+from sqlalchemy import func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
-from app.db import SessionLocal
+from app.db import SessionLocal, engine
 from app.models.market_model import MarketPrice
+from app.models.training_model import PriceModelState
+from app.services.prophet_service import prophet_service, warm_start_params
 
 # Folder untuk menyimpan model
 MODEL_DIR = os.path.join("app", "services", "models_storage")
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+PRICE_MODEL_PARAMS = {"daily_seasonality": False, "weekly_seasonality": True, "yearly_seasonality": True}
+MIN_TRAINING_ROWS = 3
+PRICE_REFIT_LOAD_CHUNK = int(os.getenv("PRICE_REFIT_LOAD_CHUNK", "200"))  # Jumlah seri per query load
+PRICE_TRAIN_STREAM_CHUNK = int(os.getenv("PRICE_TRAIN_STREAM_CHUNK", "5000"))  # Baris per fetch saat streaming
+
+# Key seri sama dengan train_price_models: nama di-strip, NULL dianggap string kosong
+COMMODITY_KEY = func.coalesce(func.trim(MarketPrice.commodity_name), "")
+MARKET_KEY = func.coalesce(func.trim(MarketPrice.market_location), "")
+# Waktu perubahan terakhir baris: updated_at (harga diubah) atau created_at (baris baru)
+CHANGED_AT = func.coalesce(MarketPrice.updated_at, MarketPrice.created_at)
+
+
+def model_path(commodity_name: str, market_location: str) -> str:
+    filename = f"{commodity_name}_{market_location}.pkl".replace(" ", "_").lower()
+    return os.path.join(MODEL_DIR, filename)
+
+
+def _save_model(model, filepath: str):
+    """Tulis atomic agar predict_price tidak membaca file yang setengah tertulis."""
+    tmp_path = f"{filepath}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, filepath)
+
+
+def iter_series(db: Session, keys: list = None):
+    """
+    Stream data harga per seri (komoditas, pasar) tanpa memuat seluruh tabel.
+
+    Kolom diambil sebagai tuple (bukan objek ORM) dengan server-side cursor per chunk
+    PRICE_TRAIN_STREAM_CHUNK baris, terurut per seri, sehingga satu seri selesai dirakit
+    sebelum seri berikutnya dibaca. Memori puncak dibatasi oleh seri terbesar.
+
+    Args:
+        db: Session khusus streaming (jangan di-commit selama iterasi berjalan)
+        keys: Batasi ke key (komoditas, pasar) tertentu; None = semua seri
+
+    Yields:
+        Tuple ((komoditas, pasar), DataFrame (ds, y), watermark waktu perubahan terakhir)
+    """
+    query = db.query(COMMODITY_KEY, MARKET_KEY, MarketPrice.date, MarketPrice.price, CHANGED_AT).filter(
+        MarketPrice.price.isnot(None),
+        MarketPrice.date.isnot(None)
+    )
+    if keys is not None:
+        if not keys:
+            return
+        query = query.filter(tuple_(COMMODITY_KEY, MARKET_KEY).in_(keys))
+    rows = query.order_by(COMMODITY_KEY, MARKET_KEY, MarketPrice.date).yield_per(PRICE_TRAIN_STREAM_CHUNK)
+
+    current, dates, prices, watermark = None, [], [], None
+    for commodity, market, day, price, changed_at in rows:
+        key = (commodity, market)
+        if key != current:
+            if current is not None:
+                yield current, _series_frame(dates, prices), watermark
+            current, dates, prices, watermark = key, [], [], None
+        dates.append(day)
+        prices.append(price)
+        if changed_at is not None and (watermark is None or changed_at > watermark):
+            watermark = changed_at
+    if current is not None:
+        yield current, _series_frame(dates, prices), watermark
+
+
+def _series_frame(dates: list, prices: list) -> pd.DataFrame:
+    return pd.DataFrame({"ds": pd.to_datetime(dates), "y": np.asarray(prices, dtype=float)})
+
 
 def train_price_models():
     """
     Melatih model Prophet untuk setiap kombinasi komoditas dan pasar.
     Model disimpan ke folder app/services/models_storage/.
+    Data dibaca per seri lewat iter_series, jadi tabel tidak pernah dimuat utuh ke memori.
     """
-    db: Session = SessionLocal()
-    data = db.query(MarketPrice).all()
+    stream_db: Session = SessionLocal()
+    db: Session = SessionLocal()  # Session terpisah untuk commit state (cursor streaming tetap terbuka)
+    trained = 0
 
-    if not data:
-        print("⚠️ Tidak ada data harga di database.")
-        db.close()
-        return
+    try:
+        # Loop untuk melatih tiap kombinasi komoditas & lokasi pasar
+        for (commodity, market), group, watermark in iter_series(stream_db):
+            trained += 1
+            if len(group) < MIN_TRAINING_ROWS:
+                print(f"⏩ Data {commodity}-{market} terlalu sedikit, dilewati.")
+                _record_state(db, (commodity, market), watermark, len(group), error="Data terlalu sedikit")
+                continue
 
-    # Konversi data ke DataFrame
-    df = pd.DataFrame([{
-        "commodity_name": d.commodity_name.strip() if d.commodity_name else "",
-        "market_location": d.market_location.strip() if d.market_location else "",
-        "ds": pd.to_datetime(d.date),
-        "y": float(d.price)
-    } for d in data if d.price is not None and d.date is not None])
+            try:
+                # Fit di worker prophet_service (tanpa budget: training harus menghasilkan model Prophet)
+                model, timings = prophet_service.fit(group, PRICE_MODEL_PARAMS)
 
-    if df.empty:
-        print("⚠️ Data harga kosong atau tidak valid.")
+                # Simpan model ke file
+                filepath = model_path(commodity, market)
+                _save_model(model, filepath)
+                _record_state(db, (commodity, market), watermark, len(group), filepath, timings["fit_seconds"])
+                print(f"✅ Model disimpan: {filepath} (fit {timings['fit_seconds']}s)")
+
+            except Exception as e:
+                print(f"❌ Gagal melatih model untuk {commodity}-{market}: {e}")
+    finally:
+        stream_db.close()
         db.close()
+
+    if not trained:
+        print("⚠️ Tidak ada data harga di database.")
         return
+    print("🎯 Semua model harga berhasil dilatih dan disimpan.")
+
+
+# === Refit inkremental (watermark per seri) ===
+_state_table_ready = False
+
+
+def _ensure_state_table():
+    global _state_table_ready
+    if not _state_table_ready:
+        PriceModelState.__table__.create(bind=engine, checkfirst=True)
+        _state_table_ready = True
+
 
-    # Loop untuk melatih tiap kombinasi komoditas & lokasi pasar
-    for (commodity, market), group in df.groupby(["commodity_name", "market_location"]):
-        if len(group) < 3:
-            print(f"⏩ Data {commodity}-{market} terlalu sedikit, dilewati.")
-            continue
+def _to_datetime(value):
+    return None if value is None or pd.isna(value) else pd.Timestamp(value).to_pydatetime()
 
+
+def _record_state(db: Session, key, watermark, row_count: int, filepath: str = None,
+                  fit_seconds: float = None, warm_started: bool = False, error: str = None):
+    """Upsert watermark seri setelah di-fit (atau dilewati) agar tidak diproses ulang tanpa data baru."""
+    _ensure_state_table()
+    table = PriceModelState.__table__
+    values = {
+        "commodity_name": key[0],
+        "market_location": key[1],
+        "watermark": watermark,
+        "row_count": row_count,
+        "model_path": filepath,
+        "trained_at": datetime.now(),
+        "fit_seconds": fit_seconds,
+        "warm_started": warm_started,
+        "last_error": error,
+    }
+    stmt = pg_insert(table).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.commodity_name, table.c.market_location],
+        set_={col: stmt.excluded[col] for col in values if col not in ("commodity_name", "market_location")},
+    )
+    try:
+        db.execute(stmt)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Gagal menyimpan state model {key[0]}-{key[1]}: {e}")
+
+
+def load_series_watermarks(db: Session) -> dict:
+    """
+    Watermark semua seri dalam satu query agregat.
+
+    Returns:
+        Dictionary (commodity, market) -> (waktu perubahan terakhir, jumlah baris)
+    """
+    rows = db.query(COMMODITY_KEY, MARKET_KEY, func.max(CHANGED_AT), func.count()).filter(
+        MarketPrice.price.isnot(None),
+        MarketPrice.date.isnot(None)
+    ).group_by(COMMODITY_KEY, MARKET_KEY).all()
+    return {(c, m): (watermark, count) for c, m, watermark, count in rows}
+
+
+def find_stale_series(db: Session, force: bool = False, watermarks: dict = None) -> list:
+    """
+    Seri yang perlu di-fit ulang: belum pernah di-fit, ada baris yang ditambah/diubah setelah
+    watermark, atau jumlah baris berubah.
+
+    Args:
+        watermarks: Hasil load_series_watermarks yang sudah diambil (agar tidak di-query ulang)
+
+    Returns:
+        List dict berisi key, watermark, row_count, previous_path
+    """
+    _ensure_state_table()
+    if watermarks is None:
+        watermarks = load_series_watermarks(db)
+    states = {(s.commodity_name, s.market_location): s for s in db.query(PriceModelState).all()}
+    stale = []
+    for key, (watermark, count) in watermarks.items():
+        state = states.get(key)
+        changed = (
+            force
+            or state is None
+            or state.row_count != count
+            or (watermark is not None and (state.watermark is None or watermark > state.watermark))
+        )
+        if changed:
+            stale.append({
+                "key": key,
+                "watermark": watermark,
+                "row_count": count,
+                "previous_path": state.model_path if state else None,
+            })
+    return stale
+
+
+def _fit_series(df: pd.DataFrame, previous_path: str = None):
+    """Fit satu seri, warm start dari model sebelumnya jika file-nya ada."""
+    init = None
+    if previous_path and os.path.exists(previous_path):
         try:
-            model = Prophet(daily_seasonality=False, weekly_seasonality=True, yearly_seasonality=True)
-            model.fit(group[["ds", "y"]])
+            init = warm_start_params(joblib.load(previous_path))
+        except Exception:
+            init = None
+    return prophet_service.fit(df, PRICE_MODEL_PARAMS, init=init)
 
-            # Simpan model ke file
-            filename = f"{commodity}_{market}.pkl".replace(" ", "_").lower()
-            filepath = os.path.join(MODEL_DIR, filename)
-            joblib.dump(model, filepath)
-            print(f"✅ Model disimpan: {filepath}")
 
-        except Exception as e:
-            print(f"❌ Gagal melatih model untuk {commodity}-{market}: {e}")
+def refit_price_models(force: bool = False, progress_callback=None) -> dict:
+    """
+    Refit inkremental: hanya seri (komoditas, pasar) yang mendapat data baru sejak fit terakhir.
+    Fit paralel di worker pool prophet_service dengan warm start dari model sebelumnya.
 
-    db.close()
-    print("🎯 Semua model harga berhasil dilatih dan disimpan.")
+    Args:
+        force: Refit semua seri walaupun datanya tidak berubah
+        progress_callback: Dipanggil (selesai, total) setiap satu seri selesai
+
+    Returns:
+        Ringkasan jumlah seri, yang di-refit, warm start, dilewati, gagal, dan waktu fit
+    """
+    start = time.perf_counter()
+    db: Session = SessionLocal()
+    stream_db: Session = SessionLocal()  # Cursor streaming terpisah dari session yang commit state
+    summary = {"series_total": 0, "stale": 0, "refitted": 0, "warm_started": 0,
+               "skipped_few_rows": 0, "failed": 0, "fit_seconds_total": 0.0}
+    try:
+        watermarks = load_series_watermarks(db)
+        summary["series_total"] = len(watermarks)
+        stale = find_stale_series(db, force=force, watermarks=watermarks)
+        summary["stale"] = len(stale)
+        if not stale:
+            print("✅ Semua model harga sudah up to date, tidak ada yang di-refit.")
+            return {**summary, "duration_seconds": round(time.perf_counter() - start, 3)}
+
+        stale_by_key = {item["key"]: item for item in stale}
+        keys = list(stale_by_key)
+        max_in_flight = prophet_service.max_workers * 2  # Batasi seri yang tertahan di memori
+        done = 0
+
+        def _advance():
+            nonlocal done
+            done += 1
+            if progress_callback:
+                progress_callback(done, len(stale))
+
+        def _collect(future, item):
+            commodity, market = item["key"]
+            try:
+                model, timings = future.result()
+                filepath = model_path(commodity, market)
+                _save_model(model, filepath)
+                _record_state(db, item["key"], item["watermark"], item["row_count"], filepath,
+                              timings["fit_seconds"], timings["warm_started"])
+                summary["refitted"] += 1
+                summary["warm_started"] += int(timings["warm_started"])
+                summary["fit_seconds_total"] += timings["fit_seconds"]
+            except Exception as e:
+                print(f"❌ Gagal refit model untuk {commodity}-{market}: {e}")
+                summary["failed"] += 1
+            _advance()
+
+        with ThreadPoolExecutor(max_workers=prophet_service.max_workers, thread_name_prefix="refit") as pool:
+            in_flight = {}
+            loaded = 0
+            for i in range(0, len(keys), PRICE_REFIT_LOAD_CHUNK):
+                # Data seri di-stream; seri berikutnya baru dibaca saat slot fit tersedia
+                for key, df, _ in iter_series(stream_db, keys[i:i + PRICE_REFIT_LOAD_CHUNK]):
+                    item = stale_by_key[key]
+                    loaded += 1
+                    if len(df) < MIN_TRAINING_ROWS:
+                        _record_state(db, key, item["watermark"], item["row_count"], error="Data terlalu sedikit")
+                        summary["skipped_few_rows"] += 1
+                        _advance()
+                        continue
+                    if len(in_flight) >= max_in_flight:
+                        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            _collect(future, in_flight.pop(future))
+                    in_flight[pool.submit(_fit_series, df, item["previous_path"])] = item
+
+            # Seri yang barisnya terhapus sejak query watermark tidak ikut di-stream
+            for _ in range(len(stale) - loaded):
+                _advance()
+
+            for future in as_completed(in_flight):
+                _collect(future, in_flight[future])
+    finally:
+        stream_db.close()
+        db.close()
+
+    summary["fit_seconds_total"] = round(summary["fit_seconds_total"], 3)
+    summary["duration_seconds"] = round(time.perf_counter() - start, 3)
+    print(f"🎯 Refit inkremental selesai: {summary['refitted']}/{summary['series_total']} seri di-refit "
+          f"({summary['warm_started']} warm start) dalam {summary['duration_seconds']}s")
+    return summary
 
 
 def predict_price(commodity_name: str, market_location: str, days_ahead: int = 7):
     """
     Prediksi harga ke depan menggunakan model Prophet.
     """
-    filename = f"{commodity_name}_{market_location}.pkl".replace(" ", "_").lower()
-    filepath = os.path.join(MODEL_DIR, filename)
+    filepath = model_path(commodity_name, market_location)
 
     if not os.path.exists(filepath):
         return {"error": f"Model belum tersedia untuk {commodity_name} di {market_location}."}
 
     try:
-        model: Prophet = joblib.load(filepath)
+        model = joblib.load(filepath)
         future = model.make_future_dataframe(periods=days_ahead)
         forecast = model.predict(future)
 
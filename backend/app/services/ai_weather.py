@@ -1,4 +1,4 @@
-import requests
+import httpx
 import pandas as pd
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
@@ -6,8 +6,29 @@ import logging
 import numpy as np
 import traceback
 import os
+import time
+from sqlalchemy import func, literal_column, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.models.weather_model import WeatherData, WeatherPrediction
+from app.services.fast_forecast import FAST_MODELS, forecast_batch
+from app.services.openweather_client import openweather_fetcher
+from app.services.prophet_service import PROPHET_AVAILABLE, prophet_service
+from app.utils.cache import TTLCache
+
+# Kolom nilai cuaca yang ditulis oleh bulk upsert
+WEATHER_VALUE_COLUMNS = ["temperature", "humidity", "rainfall", "wind_speed"]
+WEATHER_UPSERT_BATCH_SIZE = int(os.getenv("WEATHER_UPSERT_BATCH_SIZE", "500"))
+
+# Cache response OpenWeather per koordinat (grid dalam derajat, TTL = cadence update OpenWeather)
+WEATHER_CACHE_GRID = float(os.getenv("WEATHER_CACHE_GRID", "0.01"))
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_MAXSIZE = int(os.getenv("WEATHER_CACHE_MAXSIZE", "512"))
+weather_cache = TTLCache(maxsize=WEATHER_CACHE_MAXSIZE, ttl=WEATHER_CACHE_TTL)
+
+# Retensi weather_predictions: prediksi untuk tanggal yang sudah lewat lebih dari N hari dihapus
+WEATHER_PREDICTION_RETENTION_DAYS = int(os.getenv("WEATHER_PREDICTION_RETENTION_DAYS", "30"))
+GLOBAL_PREDICTION_KEY = "Global"
 
 # === Helper: Normalisasi base URL OpenWeather ===
 def _get_base_url() -> str:
@@ -19,15 +40,21 @@ def _get_base_url() -> str:
     # Hilangkan trailing slash
     return raw.rstrip('/')
 
-# === Coba import Prophet ===
-try:
-    from prophet import Prophet
-    PROPHET_AVAILABLE = True
-    logging.info("✅ Prophet ML library loaded successfully")
-except Exception:
-    PROPHET_AVAILABLE = False
+# === Cek ketersediaan Prophet ===
+if PROPHET_AVAILABLE:
+    logging.info("✅ Prophet ML library available (fit via prophet_service)")
+else:
     logging.info("ℹ️ Prophet not available. Using Simple Moving Average fallback.")
 
+# Model yang bisa dipilih lewat parameter model= (model cepat tidak disimpan ke weather_predictions)
+WEATHER_MODELS = ("prophet",) + FAST_MODELS
+
+WEATHER_PROPHET_PARAMS = {
+    "daily_seasonality": False,
+    "yearly_seasonality": False,
+    "weekly_seasonality": False,
+}
+
 
 # 🌦 Daftar kecamatan di Wonosobo (koordinat untuk OpenWeather API)
 DISTRICTS = [
@@ -45,8 +72,40 @@ DISTRICTS = [
 ]
 
 
+# === Helper: Parsing response OpenWeather ke record DataFrame ===
+def _parse_current(current_data: dict, location_name: str) -> dict:
+    return {
+        "ds": datetime.now(),
+        "temperature": float(current_data["main"]["temp"]),
+        "humidity": float(current_data["main"]["humidity"]),
+        "rainfall": float(current_data.get("rain", {}).get("1h", 0)),
+        "wind_speed": float(current_data["wind"]["speed"]) * 3.6,  # Convert m/s to km/h
+        "location": location_name
+    }
+
+
+def _parse_forecast(forecast_data: dict, location_name: str) -> list:
+    # Forecast setiap 3 jam untuk 5 hari
+    return [
+        {
+            "ds": datetime.fromtimestamp(fc["dt"]),
+            "temperature": float(fc["main"]["temp"]),
+            "humidity": float(fc["main"]["humidity"]),
+            "rainfall": float(fc.get("rain", {}).get("3h", 0)),
+            "wind_speed": float(fc["wind"]["speed"]) * 3.6,  # Convert m/s to km/h
+            "location": location_name
+        }
+        for fc in forecast_data.get("list", [])
+    ]
+
+
+def _is_unauthorized(result) -> bool:
+    return isinstance(result, httpx.HTTPStatusError) and result.response.status_code == 401
+
+
 # === 1️⃣ Ambil data cuaca dari OpenWeather API ===
 def fetch_weather_data():
+    """Ambil data cuaca semua DISTRICTS secara konkuren (current + 5-day forecast)."""
     all_records = []
     api_key = os.getenv("OPENWEATHER_API_KEY")
     base_url = _get_base_url()
@@ -54,48 +113,22 @@ def fetch_weather_data():
     if not api_key:
         raise ValueError("❌ OPENWEATHER_API_KEY tidak ditemukan di environment variables")
 
-    for d in DISTRICTS:
+    coordinates = [(d["lat"], d["lon"]) for d in DISTRICTS]
+    results = openweather_fetcher.fetch_locations(base_url, api_key, coordinates)
+
+    for d, (current_data, forecast_data) in zip(DISTRICTS, results):
         try:
-            # Current weather
-            current_url = f"{base_url}/weather?lat={d['lat']}&lon={d['lon']}&appid={api_key}&units=metric"
-            logging.debug(f"→ Fetch current: {current_url}")
-            current_res = requests.get(current_url, timeout=10)
-            current_res.raise_for_status()
-            current_data = current_res.json()
-            
-            # Add current weather record
-            current_record = {
-                "ds": datetime.now(),
-                "temperature": float(current_data["main"]["temp"]),
-                "humidity": float(current_data["main"]["humidity"]),
-                "rainfall": float(current_data.get("rain", {}).get("1h", 0)),
-                "wind_speed": float(current_data["wind"]["speed"]) * 3.6,  # Convert m/s to km/h
-                "location": d["name"]
-            }
-            all_records.append(current_record)
-            
-            # 5-day forecast
-            forecast_url = f"{base_url}/forecast?lat={d['lat']}&lon={d['lon']}&appid={api_key}&units=metric"
-            logging.debug(f"→ Fetch forecast: {forecast_url}")
-            forecast_res = requests.get(forecast_url, timeout=10)
-            forecast_res.raise_for_status()
-            forecast_data = forecast_res.json()
-            
-            # Process forecast data (every 3 hours for 5 days)
-            for forecast in forecast_data.get("list", []):
-                forecast_record = {
-                    "ds": datetime.fromtimestamp(forecast["dt"]),
-                    "temperature": float(forecast["main"]["temp"]),
-                    "humidity": float(forecast["main"]["humidity"]),
-                    "rainfall": float(forecast.get("rain", {}).get("3h", 0)),
-                    "wind_speed": float(forecast["wind"]["speed"]) * 3.6,  # Convert m/s to km/h
-                    "location": d["name"]
-                }
-                all_records.append(forecast_record)
+            if isinstance(current_data, Exception):
+                raise current_data
+            all_records.append(_parse_current(current_data, d["name"]))
+
+            if isinstance(forecast_data, Exception):
+                raise forecast_data
+            all_records.extend(_parse_forecast(forecast_data, d["name"]))
 
             logging.info(f"✅ {d['name']}: berhasil ambil data dari OpenWeather")
 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logging.warning(f"⚠️ Gagal ambil {d['name']}: {e}")
         except Exception as e:
             logging.debug(f"⚠️ Gagal parsing {d['name']}: {traceback.format_exc()}")
@@ -123,24 +156,58 @@ def fetch_weather_data():
 
 
 # === 1️⃣A Ambil data cuaca berdasarkan koordinat spesifik ===
-def fetch_weather_by_coordinates(lat: float, lon: float, location_name: str = None):
-    """Ambil data cuaca (current + 5-day forecast) untuk koordinat spesifik dari OpenWeather API"""
+def _weather_cache_key(lat: float, lon: float) -> tuple:
+    """Key cache: koordinat di-snap ke grid + time bucket seukuran TTL."""
+    snapped_lat = round(round(lat / WEATHER_CACHE_GRID) * WEATHER_CACHE_GRID, 6)
+    snapped_lon = round(round(lon / WEATHER_CACHE_GRID) * WEATHER_CACHE_GRID, 6)
+    bucket = int(time.time() // WEATHER_CACHE_TTL)
+    return snapped_lat, snapped_lon, bucket
+
+
+def get_weather_cache_stats() -> dict:
+    return {**weather_cache.stats(), "grid_degrees": WEATHER_CACHE_GRID}
+
+
+def fetch_weather_by_coordinates(lat: float, lon: float, location_name: str = None, use_cache: bool = True):
+    """
+    Ambil data cuaca (current + 5-day forecast) untuk koordinat spesifik dari OpenWeather API.
+    Response di-cache per sel grid dan time bucket, sehingga klik peta yang berdekatan
+    dalam jendela update OpenWeather (10 menit) tidak memanggil API lagi.
+    """
+    location_name = location_name or f"Lat{lat}_Lon{lon}"  # Nama fallback
+    key = _weather_cache_key(lat, lon)
+
+    if use_cache:
+        cached = weather_cache.get(key)
+        if cached is not None:
+            df = cached.copy()
+            df["location"] = location_name
+            return df
+
+    df, cacheable = _fetch_weather_by_coordinates(lat, lon, location_name)
+    if cacheable:
+        weather_cache.set(key, df.copy())
+    return df
+
+
+def _fetch_weather_by_coordinates(lat: float, lon: float, location_name: str):
+    """Fetch tanpa cache. Returns (DataFrame, cacheable) – data mock tidak di-cache."""
     api_key = os.getenv("OPENWEATHER_API_KEY")
     base_url = _get_base_url()
 
     if not api_key:
         raise ValueError("❌ OPENWEATHER_API_KEY tidak ditemukan di environment variables")
 
-    location_name = location_name or f"Lat{lat}_Lon{lon}"  # Nama fallback
     all_records = []
+    cacheable = True
 
     try:
-        # Current weather
-        current_url = f"{base_url}/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-        logging.debug(f"→ Fetch current by coords: {current_url}")
-        current_res = requests.get(current_url, timeout=10)
-        if current_res.status_code == 401:
+        # Current weather + 5-day / 3-hour forecast diambil bersamaan
+        [(current_data, forecast_data)] = openweather_fetcher.fetch_locations(base_url, api_key, [(lat, lon)])
+
+        if _is_unauthorized(current_data):
             logging.warning("ℹ️ OpenWeather 401 untuk current – gunakan mock data.")
+            cacheable = False
             all_records.append({
                 "ds": datetime.now(),
                 "temperature": 23.0,
@@ -149,26 +216,14 @@ def fetch_weather_by_coordinates(lat: float, lon: float, location_name: str = No
                 "wind_speed": 10.0,
                 "location": location_name
             })
+        elif isinstance(current_data, Exception):
+            raise current_data
         else:
-            current_res.raise_for_status()
-            current_data = current_res.json()
-            
-            current_record = {
-                "ds": datetime.now(),
-                "temperature": float(current_data["main"]["temp"]),
-                "humidity": float(current_data["main"]["humidity"]),
-                "rainfall": float(current_data.get("rain", {}).get("1h", 0)),
-                "wind_speed": float(current_data["wind"]["speed"]) * 3.6,
-                "location": location_name
-            }
-            all_records.append(current_record)
-
-        # 5-day / 3-hour forecast
-        forecast_url = f"{base_url}/forecast?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-        logging.debug(f"→ Fetch forecast by coords: {forecast_url}")
-        forecast_res = requests.get(forecast_url, timeout=10)
-        if forecast_res.status_code == 401:
+            all_records.append(_parse_current(current_data, location_name))
+
+        if _is_unauthorized(forecast_data):
             logging.warning("ℹ️ OpenWeather 401 untuk forecast – gunakan mock points.")
+            cacheable = False
             base_time = datetime.now()
             for i in range(1, 6):
                 all_records.append({
@@ -179,26 +234,17 @@ def fetch_weather_by_coordinates(lat: float, lon: float, location_name: str = No
                     "wind_speed": 10.0,
                     "location": location_name
                 })
+        elif isinstance(forecast_data, Exception):
+            raise forecast_data
         else:
-            forecast_res.raise_for_status()
-            forecast_data = forecast_res.json()
-            
-            for fc in forecast_data.get("list", []):
-                fc_record = {
-                    "ds": datetime.fromtimestamp(fc["dt"]),
-                    "temperature": float(fc["main"]["temp"]),
-                    "humidity": float(fc["main"]["humidity"]),
-                    "rainfall": float(fc.get("rain", {}).get("3h", 0)),
-                    "wind_speed": float(fc["wind"]["speed"]) * 3.6,
-                    "location": location_name
-                }
-                all_records.append(fc_record)
+            all_records.extend(_parse_forecast(forecast_data, location_name))
 
         logging.info(f"✅ {location_name} ({lat}, {lon}) berhasil fetch data OpenWeather")
 
         df = pd.DataFrame(all_records)
         if df.empty:
             logging.warning("ℹ️ Tidak ada data – mengembalikan 1 mock record.")
+            cacheable = False
             df = pd.DataFrame([{
                 "ds": datetime.now(),
                 "temperature": 23.0,
@@ -210,9 +256,9 @@ def fetch_weather_by_coordinates(lat: float, lon: float, location_name: str = No
 
         df["ds"] = pd.to_datetime(df["ds"], errors="coerce")
         df = df.dropna(subset=["ds", "temperature"])
-        return df
+        return df, cacheable
 
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logging.warning(f"⚠️ Gagal request OpenWeather untuk {location_name}: {e}")
         raise
     except Exception as e:
@@ -221,25 +267,159 @@ def fetch_weather_by_coordinates(lat: float, lon: float, location_name: str = No
 
 
 # === 2️⃣ Simpan data ke DB ===
-def save_weather_data(db: Session, df: pd.DataFrame):
-    saved = 0
-    for _, row in df.iterrows():
-        try:
-            record = WeatherData(
-                date=row["ds"].date(),
-                location_name=row.get("location", "OpenWeather"),
-                temperature=row.get("temperature"),
-                humidity=row.get("humidity"),
-                rainfall=row.get("rainfall"),
-                wind_speed=row.get("wind_speed"),
-            )
-            db.add(record)
-            saved += 1
-        except Exception as e:
-            logging.warning(f"⚠️ Gagal simpan record: {e}")
+def _to_daily_weather_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Agregasi slot 3-jam menjadi satu baris per (location_name, date) untuk upsert."""
+    frame = df.copy()
+    if "location" not in frame.columns:
+        frame["location"] = "OpenWeather"
+    frame["location"] = frame["location"].fillna("OpenWeather")
+    frame["date"] = pd.to_datetime(frame["ds"], errors="coerce").dt.date
+    frame = frame.dropna(subset=["date"])
+    for col in WEATHER_VALUE_COLUMNS:
+        if col not in frame.columns:
+            frame[col] = np.nan
+
+    daily = (
+        frame.groupby(["location", "date"], as_index=False, sort=False)[WEATHER_VALUE_COLUMNS]
+        .mean()
+        .rename(columns={"location": "location_name"})
+    )
+    # NaN → None supaya tersimpan sebagai NULL
+    return daily.astype(object).where(daily.notna(), None)
+
+
+def save_weather_data(db: Session, df: pd.DataFrame, batch_size: int = WEATHER_UPSERT_BATCH_SIZE):
+    """
+    Simpan data cuaca ke DB dengan bulk upsert per batch.
+
+    Kolom DataFrame langsung diagregasi per (location_name, date) lalu ditulis dengan
+    multi-row INSERT ... ON CONFLICT (location_name, date) DO UPDATE, satu statement
+    dan satu commit per batch. Baris yang nilainya sama tidak di-update.
+
+    Returns:
+        Dictionary berisi jumlah baris inserted, updated, unchanged, dan total rows
+    """
+    if df is None or df.empty:
+        return {"inserted": 0, "updated": 0, "unchanged": 0, "rows": 0}
+
+    records = _to_daily_weather_frame(df).to_dict("records")
+    table = WeatherData.__table__
+    inserted = 0
+    updated = 0
 
+    try:
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            stmt = pg_insert(table).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.location_name, table.c.date],
+                set_={col: stmt.excluded[col] for col in WEATHER_VALUE_COLUMNS},
+                where=or_(*[table.c[col].is_distinct_from(stmt.excluded[col]) for col in WEATHER_VALUE_COLUMNS]),
+            ).returning(literal_column("(xmax = 0)").label("inserted"))
+
+            # xmax = 0 → baris baru; selain itu baris lama yang di-update
+            flags = db.execute(stmt).scalars().all()
+            batch_inserted = sum(1 for flag in flags if flag)
+            inserted += batch_inserted
+            updated += len(flags) - batch_inserted
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    unchanged = len(records) - inserted - updated
+    logging.info(
+        f"✅ Upsert {len(records)} data harian dari {len({r['location_name'] for r in records})} "
+        f"kecamatan (OpenWeather): {inserted} baru, {updated} diperbarui, {unchanged} tidak berubah."
+    )
+    return {"inserted": inserted, "updated": updated, "unchanged": unchanged, "rows": len(records)}
+
+
+# === Cache & dedup hasil prediksi (weather_predictions) ===
+def _weather_max_date(db: Session, location_name: str):
+    """Tanggal weather_data terakhir untuk lokasi (GLOBAL_PREDICTION_KEY = semua lokasi)."""
+    query = db.query(func.max(WeatherData.date))
+    if location_name != GLOBAL_PREDICTION_KEY:
+        query = query.filter(WeatherData.location_name == location_name)
+    return query.scalar()
+
+def _query_predictions(db: Session, location_name: str, days_ahead: int):
+    return db.query(WeatherPrediction).filter(
+        WeatherPrediction.location_name == location_name,
+        WeatherPrediction.horizon_days == days_ahead
+    ).order_by(WeatherPrediction.date).all()
+
+def get_cached_predictions(db: Session, location_name: str, days_ahead: int):
+    """
+    Prediksi tersimpan untuk (lokasi, horizon) jika dibuat dari weather_data yang sama
+    (tanggal data terakhir tidak berubah). None jika harus dihitung ulang.
+    """
+    max_date = _weather_max_date(db, location_name)
+    if max_date is None:
+        return None
+    preds = _query_predictions(db, location_name, days_ahead)
+    if len(preds) == days_ahead and all(p.data_max_date == max_date for p in preds):
+        logging.info(f"♻️ Prediksi {location_name} ({days_ahead} hari) dari cache, data terakhir {max_date}")
+        return preds
+    return None
+
+def store_predictions(db: Session, location_name: str, days_ahead: int, rows: list):
+    """
+    Upsert hasil prediksi pada (location_name, horizon_days, date) dan hapus prediksi lama
+    untuk (lokasi, horizon) yang sama yang sudah tergantikan.
+
+    Args:
+        rows: List dict berisi date, predicted_temp, lower_bound, upper_bound, source
+    """
+    if not rows:
+        # Tanpa hasil baru jangan hapus apa pun (notin_([]) akan menghapus semua prediksi lokasi ini)
+        return _query_predictions(db, location_name, days_ahead)
+    max_date = _weather_max_date(db, location_name)
+    table = WeatherPrediction.__table__
+    values = [
+        {**row, "location_name": location_name, "horizon_days": days_ahead, "data_max_date": max_date}
+        for row in rows
+    ]
+    try:
+        stmt = pg_insert(table).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.location_name, table.c.horizon_days, table.c.date],
+            set_={
+                **{
+                    col: stmt.excluded[col]
+                    for col in ["data_max_date", "predicted_temp", "lower_bound", "upper_bound", "source"]
+                },
+                "created_at": func.now(),
+            },
+        )
+        db.execute(stmt)
+        db.query(WeatherPrediction).filter(
+            WeatherPrediction.location_name == location_name,
+            WeatherPrediction.horizon_days == days_ahead,
+            WeatherPrediction.date.notin_([row["date"] for row in rows])
+        ).delete(synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return _query_predictions(db, location_name, days_ahead)
+
+def prune_weather_predictions(db: Session, retention_days: int = WEATHER_PREDICTION_RETENTION_DAYS) -> int:
+    """
+    Hapus prediksi untuk tanggal yang sudah lewat lebih dari retention_days, termasuk
+    baris lama tanpa kunci lokasi/horizon (sebelum dedup diterapkan).
+    """
+    cutoff = datetime.now().date() - timedelta(days=retention_days)
+    deleted = db.query(WeatherPrediction).filter(
+        or_(
+            WeatherPrediction.date < cutoff,
+            (WeatherPrediction.location_name.is_(None)) & (WeatherPrediction.created_at < cutoff)
+        )
+    ).delete(synchronize_session=False)
     db.commit()
-    logging.info(f"✅ Berhasil simpan {saved} data dari {df['location'].nunique()} kecamatan (OpenWeather).")
+    if deleted:
+        logging.info(f"🧹 {deleted} prediksi cuaca lama dihapus (retensi {retention_days} hari)")
+    return deleted
 
 
 # === 3️⃣ Fallback prediksi sederhana berdasarkan koordinat ===
@@ -271,20 +451,18 @@ def predict_weather_simple_by_coordinates(db: Session, lat: float, lon: float, l
     std_temp = np.std(df.tail(window)["temperature"])
     last_date = df["date"].max()
     
-    preds = []
-    for i in range(1, days_ahead + 1):
-        pred_date = last_date + timedelta(days=i)
-        pred = WeatherPrediction(
-            date=pred_date,
-            predicted_temp=round(avg_temp, 2),
-            lower_bound=round(avg_temp - std_temp, 2),
-            upper_bound=round(avg_temp + std_temp, 2),
-            source=f"SMA (OpenWeather Direct) - {location_name}"
-        )
-        db.add(pred)
-        preds.append(pred)
+    rows = [
+        {
+            "date": last_date + timedelta(days=i),
+            "predicted_temp": round(avg_temp, 2),
+            "lower_bound": round(avg_temp - std_temp, 2),
+            "upper_bound": round(avg_temp + std_temp, 2),
+            "source": f"SMA (OpenWeather Direct) - {location_name}"
+        }
+        for i in range(1, days_ahead + 1)
+    ]
     
-    db.commit()
+    preds = store_predictions(db, location_name, days_ahead, rows)
     logging.info(f"✅ Generated {len(preds)} prediksi SMA untuk {location_name}.")
     return preds
 
@@ -317,34 +495,129 @@ def predict_weather_simple(db: Session, days_ahead: int = 3, location: str = Non
     std_temp = np.std(df.tail(window)["temperature"])
     last_date = df["date"].max()
 
-    preds = []
-    for i in range(1, days_ahead + 1):
-        pred_date = last_date + timedelta(days=i)
-        pred = WeatherPrediction(
-            date=pred_date,
-            predicted_temp=round(avg_temp, 2),
-            lower_bound=round(avg_temp - std_temp, 2),
-            upper_bound=round(avg_temp + std_temp, 2),
-            source=f"SMA - {location or 'Global'}"
-        )
-        db.add(pred)
-        preds.append(pred)
-
-    db.commit()
+    rows = [
+        {
+            "date": last_date + timedelta(days=i),
+            "predicted_temp": round(avg_temp, 2),
+            "lower_bound": round(avg_temp - std_temp, 2),
+            "upper_bound": round(avg_temp + std_temp, 2),
+            "source": f"SMA - {location or 'Global'}"
+        }
+        for i in range(1, days_ahead + 1)
+    ]
+
+    preds = store_predictions(db, location or GLOBAL_PREDICTION_KEY, days_ahead, rows)
     logging.info(f"✅ Generated {len(preds)} prediksi sederhana untuk {location or 'semua lokasi'}.")
     return preds
 
 
+def _prophet_weather_rows(df: pd.DataFrame, days_ahead: int, location_key: str, source: str) -> tuple:
+    """
+    Fit suhu lewat prophet_service (dengan budget waktu) dan bentuk baris prediksi.
+    Model disimpan di registry per lokasi, jadi fit yang melewati budget tetap diselesaikan
+    dan dipakai request berikutnya.
+
+    Returns:
+        Tuple (rows, is_prophet); is_prophet False jika hasilnya dari fallback model cepat
+    """
+    fit = prophet_service.forecast(
+        df, WEATHER_PROPHET_PARAMS, periods=days_ahead, include_history=False,
+        key=f"weather:{location_key.lower()}", metadata={"location": location_key}
+    )
+    is_prophet = fit["model"] == "prophet"
+    model_label = "Prophet ML" if is_prophet else "Fast fallback"
+    if fit["fallback_reason"]:
+        logging.warning(f"⚠️ {fit['fallback_reason']}, prediksi {source} memakai model cepat")
+    logging.info(f"⏱️ Fit {source}: {fit['timings']}")
+    rows = [
+        {
+            "date": row["ds"].date(),
+            "predicted_temp": float(row["yhat"]),
+            "lower_bound": float(row["yhat_lower"]),
+            "upper_bound": float(row["yhat_upper"]),
+            "source": f"{model_label} {source}"
+        }
+        for _, row in fit["forecast"].tail(days_ahead).iterrows()
+    ]
+    return rows, is_prophet
+
+
+def _store_or_transient(db: Session, location_name: str, days_ahead: int, rows: list, is_prophet: bool):
+    """
+    Hanya hasil Prophet yang disimpan ke cache weather_predictions. Hasil fallback dikembalikan
+    sebagai objek yang tidak disimpan, agar request berikutnya mengambil model Prophet dari registry.
+    """
+    if is_prophet:
+        return store_predictions(db, location_name, days_ahead, rows)
+    return [
+        WeatherPrediction(location_name=location_name, horizon_days=days_ahead, **row)
+        for row in rows
+    ]
+
+
+def _fast_weather_predictions(histories: dict, days_ahead: int, model: str, source: str) -> dict:
+    """
+    Prediksi suhu banyak lokasi sekaligus dengan model cepat (satu batch matriks).
+    Hasil berupa objek WeatherPrediction yang tidak disimpan, agar tidak menimpa cache Prophet.
+    """
+    start = time.perf_counter()
+    forecasts = forecast_batch(histories, days_ahead, model)
+    logging.info(f"⏱️ {model} untuk {len(forecasts)} lokasi selesai dalam {(time.perf_counter() - start) * 1000:.1f} ms")
+    return {
+        location: [
+            WeatherPrediction(
+                location_name=location,
+                horizon_days=days_ahead,
+                date=row.ds.date(),
+                predicted_temp=round(float(row.yhat), 2),
+                lower_bound=round(float(row.yhat_lower), 2),
+                upper_bound=round(float(row.yhat_upper), 2),
+                source=f"{model} {source} - {location}"
+            )
+            for row in forecast.itertuples(index=False)
+        ]
+        for location, forecast in forecasts.items()
+    }
+
+
+def predict_weather_districts(db: Session, days_ahead: int = 3, model: str = "holt_winters") -> dict:
+    """
+    Prediksi suhu seluruh kecamatan di DISTRICTS dengan satu query dan satu batch model cepat.
+
+    Returns:
+        Dictionary nama kecamatan -> list WeatherPrediction
+    """
+    if model not in FAST_MODELS:
+        raise ValueError(f"Model '{model}' tidak didukung untuk batch, pilih salah satu: {', '.join(FAST_MODELS)}")
+
+    names = [d["name"] for d in DISTRICTS]
+    rows = db.query(WeatherData.location_name, WeatherData.date, WeatherData.temperature).filter(
+        WeatherData.location_name.in_(names),
+        WeatherData.temperature.isnot(None)
+    ).all()
+    frame = pd.DataFrame(rows, columns=["location_name", "ds", "y"])
+    histories = {name: group[["ds", "y"]] for name, group in frame.groupby("location_name")}
+    return _fast_weather_predictions(histories, days_ahead, model, "(OpenWeather)")
+
+
 # === 4️⃣ Prediksi cuaca berdasarkan koordinat (tanpa interpolasi) ===
-def predict_weather_by_coordinates(db: Session, lat: float, lon: float, location_name: str = None, days_ahead: int = 3):
+def predict_weather_by_coordinates(db: Session, lat: float, lon: float, location_name: str = None, days_ahead: int = 3, model: str = "prophet"):
     """
     Prediksi cuaca berdasarkan koordinat spesifik langsung dari OpenWeather API.
     Tidak menggunakan interpolasi, langsung ambil data dari koordinat yang diminta.
+    Prediksi Prophet yang dibuat dari data yang sama dipakai ulang tanpa fit ulang;
+    model cepat (FAST_MODELS) dihitung langsung tanpa cache.
     """
-    if not PROPHET_AVAILABLE:
-        return predict_weather_simple_by_coordinates(db, lat, lon, location_name, days_ahead)
-    
     location_name = location_name or f"Lat{lat}_Lon{lon}"
+    fast = model in FAST_MODELS
+    if not fast:
+        cached = get_cached_predictions(db, location_name, days_ahead)
+        if cached is not None:
+            return cached
+        
+        if not PROPHET_AVAILABLE:
+            return predict_weather_simple_by_coordinates(db, lat, lon, location_name, days_ahead)
+    
     logging.info(f"🔄 Mulai prediksi untuk koordinat {lat}, {lon} ({location_name})")
     
     # Cek data historis untuk koordinat ini
@@ -381,35 +654,14 @@ def predict_weather_by_coordinates(db: Session, lat: float, lon: float, location
         except Exception as e:
             logging.warning(f"⚠️ Gagal menambah data fresh: {e}")
     
+    if fast:
+        return _fast_weather_predictions({location_name: df}, days_ahead, model, "(OpenWeather Direct)")[location_name]
+    
     try:
-        # Training Prophet model
-        model = Prophet(
-            daily_seasonality=False,
-            yearly_seasonality=False,
-            weekly_seasonality=False,
-        )
-        model.fit(df)
-        
-        # Prediksi untuk beberapa hari ke depan
-        future = model.make_future_dataframe(periods=days_ahead, freq="D")
-        forecast = model.predict(future)
-        
-        # Ambil hasil prediksi
-        results = forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]].tail(days_ahead)
-        preds = []
+        # Fit Prophet di worker prophet_service dan prediksi beberapa hari ke depan
+        rows, is_prophet = _prophet_weather_rows(df, days_ahead, location_name, f"(OpenWeather Direct) - {location_name}")
         
-        for _, row in results.iterrows():
-            pred = WeatherPrediction(
-                date=row["ds"].date(),
-                predicted_temp=float(row["yhat"]),
-                lower_bound=float(row["yhat_lower"]),
-                upper_bound=float(row["yhat_upper"]),
-                source=f"Prophet ML (OpenWeather Direct) - {location_name}"
-            )
-            db.add(pred)
-            preds.append(pred)
-        
-        db.commit()
+        preds = _store_or_transient(db, location_name, days_ahead, rows, is_prophet)
         logging.info(f"✅ Prophet sukses untuk {location_name} dengan {len(df)} data points historis.")
         return preds
         
@@ -420,19 +672,26 @@ def predict_weather_by_coordinates(db: Session, lat: float, lon: float, location
         return predict_weather_simple_by_coordinates(db, lat, lon, location_name, days_ahead)
 
 # === 4️⃣A Prediksi cuaca dengan Prophet (legacy untuk backward compatibility) ===
-def predict_weather(db: Session, days_ahead: int = 3, location: str = None):
+def predict_weather(db: Session, days_ahead: int = 3, location: str = None, model: str = "prophet"):
     """
     Legacy function - tetap ada untuk backward compatibility.
     Untuk prediksi baru, gunakan predict_weather_by_coordinates().
     """
-    if not PROPHET_AVAILABLE:
-        return predict_weather_simple(db, days_ahead, location)
+    fast = model in FAST_MODELS
     
     # Jika ada location yang cocok dengan DISTRICTS, gunakan koordinatnya
     for district in DISTRICTS:
-        if location and district["name"].lower() == location.lower():
+        if (PROPHET_AVAILABLE or fast) and location and district["name"].lower() == location.lower():
             logging.info(f"🔄 Menggunakan koordinat untuk {location}: {district['lat']}, {district['lon']}")
-            return predict_weather_by_coordinates(db, district["lat"], district["lon"], location, days_ahead)
+            return predict_weather_by_coordinates(db, district["lat"], district["lon"], location, days_ahead, model)
+    
+    if not fast:
+        cached = get_cached_predictions(db, location or GLOBAL_PREDICTION_KEY, days_ahead)
+        if cached is not None:
+            return cached
+        
+        if not PROPHET_AVAILABLE:
+            return predict_weather_simple(db, days_ahead, location)
     
     # Fallback ke metode lama jika tidak ada koordinat yang cocok
     query = db.query(WeatherData)
@@ -456,31 +715,15 @@ def predict_weather(db: Session, days_ahead: int = 3, location: str = None):
     if df.empty:
         raise ValueError(f"❌ Tidak ada data historis untuk {location or 'semua lokasi'}.")
     
+    if fast:
+        key = location or GLOBAL_PREDICTION_KEY
+        return _fast_weather_predictions({key: df}, days_ahead, model, "(OpenWeather)")[key]
+    
     try:
-        model = Prophet(
-            daily_seasonality=False,
-            yearly_seasonality=False,
-            weekly_seasonality=False,
-        )
-        model.fit(df)
-        future = model.make_future_dataframe(periods=days_ahead, freq="D")
-        forecast = model.predict(future)
-        
-        results = forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]].tail(days_ahead)
-        preds = []
+        key = location or GLOBAL_PREDICTION_KEY
+        rows, is_prophet = _prophet_weather_rows(df, days_ahead, key, f"(OpenWeather) - {location or 'Global'}")
         
-        for _, row in results.iterrows():
-            pred = WeatherPrediction(
-                date=row["ds"].date(),
-                predicted_temp=float(row["yhat"]),
-                lower_bound=float(row["yhat_lower"]),
-                upper_bound=float(row["yhat_upper"]),
-                source=f"Prophet ML (OpenWeather) - {location or 'Global'}"
-            )
-            db.add(pred)
-            preds.append(pred)
-        
-        db.commit()
+        preds = _store_or_transient(db, key, days_ahead, rows, is_prophet)
         logging.info(f"✅ Prophet sukses untuk {location or 'semua lokasi'}.")
         return preds
         
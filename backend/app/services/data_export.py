@@ -0,0 +1,128 @@
+"""
+Export data historis (market_prices, weather_data) secara streaming.
+
+Baris dibaca lewat server-side cursor (yield_per) dan langsung diserialisasi per
+batch ke NDJSON atau CSV, sehingga memori konstan berapapun jumlah barisnya.
+"""
+
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import or_, select
+
+from app.db import SessionLocal
+from app.models.market_model import MarketPrice
+from app.models.weather_model import WeatherData
+
+logger = logging.getLogger(__name__)
+
+EXPORT_BATCH_SIZE = 2000
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+MARKET_EXPORT_COLUMNS = (
+    MarketPrice.price_id,
+    MarketPrice.commodity_name,
+    MarketPrice.market_location,
+    MarketPrice.unit,
+    MarketPrice.price,
+    MarketPrice.date,
+    MarketPrice.created_at,
+)
+
+WEATHER_EXPORT_COLUMNS = (
+    WeatherData.weather_id,
+    WeatherData.location_name,
+    WeatherData.date,
+    WeatherData.temperature,
+    WeatherData.humidity,
+    WeatherData.rainfall,
+    WeatherData.wind_speed,
+    WeatherData.created_at,
+)
+
+
+def _serialize(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _stream_rows(stmt, fmt: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """
+    Jalankan statement dengan server-side cursor dan yield chunk teks per batch.
+    Session dibuat sendiri karena generator masih berjalan setelah handler selesai.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            # Header langsung dikirim agar time-to-first-byte kecil
+            yield buffer.getvalue()
+
+        for batch in result.partitions():
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows([[_serialize(v) for v in row] for row in batch])
+                yield buffer.getvalue()
+            else:
+                yield "".join(
+                    json.dumps({col: _serialize(v) for col, v in zip(columns, row)}) + "\n"
+                    for row in batch
+                )
+    except Exception as e:
+        logger.error(f"❌ Export gagal di tengah stream: {e}")
+        raise
+    finally:
+        db.close()
+
+
+def stream_market_prices(
+    fmt: str = "ndjson",
+    commodities: Optional[List[str]] = None,
+    location: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> Iterator[str]:
+    """Stream market_prices dengan filter komoditas (ILIKE), lokasi, dan rentang tanggal."""
+    stmt = select(*MARKET_EXPORT_COLUMNS)
+    if commodities:
+        stmt = stmt.where(or_(*[MarketPrice.commodity_name.ilike(f"%{c}%") for c in commodities]))
+    if location:
+        stmt = stmt.where(MarketPrice.market_location.ilike(f"%{location}%"))
+    if start_date:
+        stmt = stmt.where(MarketPrice.date >= start_date)
+    if end_date:
+        stmt = stmt.where(MarketPrice.date <= end_date)
+    stmt = stmt.order_by(MarketPrice.date, MarketPrice.price_id)
+    return _stream_rows(stmt, fmt)
+
+
+def stream_weather_data(
+    fmt: str = "ndjson",
+    locations: Optional[List[str]] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> Iterator[str]:
+    """Stream weather_data dengan filter lokasi dan rentang tanggal."""
+    stmt = select(*WEATHER_EXPORT_COLUMNS)
+    if locations:
+        stmt = stmt.where(WeatherData.location_name.in_(locations))
+    if start_date:
+        stmt = stmt.where(WeatherData.date >= start_date)
+    if end_date:
+        stmt = stmt.where(WeatherData.date <= end_date)
+    stmt = stmt.order_by(WeatherData.date, WeatherData.weather_id)
+    return _stream_rows(stmt, fmt)
@@ -0,0 +1,137 @@
+"""
+HTTP client dengan conditional GET untuk API Disdagkopukm Wonosobo.
+
+Per URL disimpan validator (ETag / Last-Modified), hash konten, dan payload yang
+sudah di-parse. Request berikutnya mengirim If-None-Match / If-Modified-Since;
+jika server membalas 304 payload lama langsung dipakai. Jika server tidak memberi
+validator, hash body dibandingkan agar JSON yang sama tidak di-parse ulang.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DISDAGKOPUKM_TIMEOUT = float(os.getenv("DISDAGKOPUKM_TIMEOUT", "10"))
+
+
+@dataclass
+class CachedResponse:
+    payload: Any
+    content_hash: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: Optional[datetime] = None
+
+
+class ConditionalFetcher:
+    """
+    Session requests per thread (keep-alive) + cache validator per URL bersama.
+    requests.Session tidak dijamin thread-safe, sedangkan fetcher dipakai bersamaan oleh
+    scheduler, job background, dan request; tiap thread memakai session-nya sendiri.
+    """
+
+    def __init__(self, timeout: float = DISDAGKOPUKM_TIMEOUT):
+        self.timeout = timeout
+        self._local = threading.local()
+        self._sessions = weakref.WeakSet()  # Session thread yang sudah selesai ikut dilepas
+        self._entries: Dict[str, CachedResponse] = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "not_modified": 0, "same_hash": 0, "changed": 0}
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+            with self._lock:
+                self._sessions.add(session)
+        return session
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_json(self, url: str) -> Any:
+        """
+        GET JSON dengan conditional request. Payload yang dikembalikan bisa berupa
+        objek yang sama dengan request sebelumnya, jadi jangan dimodifikasi in-place.
+        """
+        with self._lock:
+            cached = self._entries.get(url)
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        self._count("requests")
+        response = self._session().get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304 and cached is not None:
+            self._count("not_modified")
+            logger.debug(f"[HTTP] 304 Not Modified: {url}")
+            with self._lock:
+                cached.fetched_at = datetime.now()
+            return cached.payload
+
+        response.raise_for_status()
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        if cached is not None and cached.content_hash == content_hash:
+            # Server tidak mendukung validator (atau mengabaikannya): skip parse JSON
+            self._count("same_hash")
+            payload = cached.payload
+        else:
+            self._count("changed")
+            payload = response.json()
+
+        with self._lock:
+            self._entries[url] = CachedResponse(
+                payload=payload,
+                content_hash=content_hash,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                fetched_at=datetime.now(),
+            )
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._stats,
+                "urls": {
+                    url: {
+                        "etag": entry.etag,
+                        "last_modified": entry.last_modified,
+                        "content_hash": entry.content_hash[:16],
+                        "fetched_at": entry.fetched_at.isoformat() if entry.fetched_at else None,
+                    }
+                    for url, entry in self._entries.items()
+                },
+            }
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions), weakref.WeakSet()
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
+
+
+# Instance bersama untuk seluruh aplikasi
+disdagkopukm_fetcher = ConditionalFetcher()
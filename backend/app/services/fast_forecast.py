@@ -0,0 +1,256 @@
+"""
+Engine forecasting cepat (closed-form NumPy) sebagai alternatif Prophet.
+
+Model yang tersedia:
+- holt_winters: ETS aditif (level, tren, musiman mingguan), parameter smoothing dipilih
+  per seri dari grid kecil yang dievaluasi sekaligus
+- seasonal_naive: nilai minggu terakhir diulang (baseline)
+- ridge_weekly: regresi ridge tren linear + dummy hari dalam seminggu
+
+Semua seri (komoditas / kecamatan) disusun menjadi satu matriks (seri x hari) sehingga
+satu panggilan menghitung forecast seluruh seri sekaligus dalam hitungan milidetik.
+Output disamakan dengan Prophet: DataFrame kolom ds, yhat, yhat_lower, yhat_upper.
+"""
+
+from itertools import product
+from statistics import NormalDist
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+FAST_MODELS = ("holt_winters", "seasonal_naive", "ridge_weekly")
+DEFAULT_INTERVAL_WIDTH = 0.8  # Sama dengan default interval_width Prophet
+SEASON_LENGTH = 7  # Musiman mingguan pada data harian
+RIDGE_ALPHA = 1e-3
+
+# Grid parameter smoothing Holt-Winters (bentuk error-correction, beta <= alpha, gamma <= 1 - alpha)
+HW_ALPHAS = (0.1, 0.3, 0.5, 0.7)
+HW_BETAS = (0.0, 0.02, 0.08)
+HW_GAMMAS = (0.05, 0.2)
+
+
+# === Susun seri menjadi matriks ===
+def _build_matrix(histories: Dict[str, pd.DataFrame]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, List[pd.Timestamp]]:
+    """
+    Ubah {nama: DataFrame(ds, y)} menjadi matriks harian rata kanan (hari terakhir tiap seri
+    di kolom terakhir). Hari kosong di tengah diisi forward-fill, padding di kiri diisi nilai
+    pertama seri.
+
+    Returns:
+        names, Y (N, T) terisi, observed (N, T) bool, lengths (N,), last_dates
+    """
+    names, series = [], []
+    for name, df in histories.items():
+        if df is None or df.empty:
+            continue
+        # Langsung ke array NumPy + rata-rata harian via bincount (tanpa groupby per seri)
+        days = np.asarray(df["ds"].to_numpy(), dtype="datetime64[D]")
+        y = df["y"].to_numpy(dtype=float)
+        valid = ~np.isnan(y) & ~np.isnat(days)
+        if not valid.any():
+            continue
+        days, y = days[valid].astype(np.int64), y[valid]
+        offset = days - days.min()
+        sums = np.bincount(offset, weights=y)
+        counts = np.bincount(offset)
+        values = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+        names.append(name)
+        series.append((values, pd.Timestamp(np.datetime64(int(days.max()), "D"))))
+
+    width = max((len(values) for values, _ in series), default=0)
+    Y = np.full((len(series), width), np.nan)
+    observed = np.zeros((len(series), width), dtype=bool)
+    lengths = np.zeros(len(series), dtype=int)
+    last_dates = []
+    for i, (values, last_date) in enumerate(series):
+        Y[i, width - len(values):] = values
+        observed[i, width - len(values):] = ~np.isnan(values)
+        lengths[i] = len(values)
+        last_dates.append(last_date)
+
+    # Forward-fill hari kosong, lalu isi padding kiri dengan nilai pertama
+    if width:
+        idx = np.where(~np.isnan(Y), np.arange(width)[None, :], 0)
+        np.maximum.accumulate(idx, axis=1, out=idx)
+        Y = Y[np.arange(len(series))[:, None], idx]
+        first = Y[np.arange(len(series)), width - lengths]
+        Y = np.where(np.isnan(Y), first[:, None], Y)
+    return names, Y, observed, lengths, last_dates
+
+
+# === Model ===
+# Kolom sebelum width - lengths[i] adalah padding, bukan data: setiap model memulai seri
+# di kolom pertamanya sendiri sehingga hasil satu seri tidak bergantung pada isi batch.
+def _holt_winters(Y: np.ndarray, lengths: np.ndarray, periods: int, m: int = SEASON_LENGTH):
+    """ETS(A,A,A) untuk semua seri x semua kombinasi parameter sekaligus, ambil SSE terkecil per seri."""
+    n, width = Y.shape
+    grid = np.array([p for p in product(HW_ALPHAS, HW_BETAS, HW_GAMMAS)])
+    g = len(grid)
+    Yg = np.repeat(Y, g, axis=0)
+    alpha, beta, gamma = (np.tile(grid, (n, 1))[:, j] for j in range(3))
+    rows = np.arange(n * g)
+
+    start = np.repeat(width - lengths, g)
+    length = np.repeat(lengths, g)
+    first = np.minimum(start[:, None] + np.arange(m)[None, :], width - 1)
+    second = np.minimum(first + m, width - 1)
+    first_mean = Yg[rows[:, None], first].mean(axis=1)
+    trend = (Yg[rows[:, None], second].mean(axis=1) - first_mean) / m
+    # Musiman awal dari minggu pertama yang sudah di-detrend; level diposisikan satu hari
+    # sebelum titik pertama agar prediksi pertama = level + tren + musiman[0]
+    offsets = np.arange(m) - (m - 1) / 2
+    season = Yg[rows[:, None], first] - (first_mean[:, None] + offsets[None, :] * trend[:, None])
+    level = first_mean - (m + 1) / 2 * trend
+
+    # Seri < 2 musim tidak cukup untuk memisahkan tren dan musiman: pakai Holt non-musiman
+    # (tren dari selisih titik awal, komponen musiman nol dan tidak di-update)
+    seasonal = length >= 2 * m
+    step = np.clip(length - 1, 1, m)
+    y0 = Yg[rows, start]
+    holt_trend = np.where(length > 1, (Yg[rows, np.minimum(start + step, width - 1)] - y0) / step, 0.0)
+    trend = np.where(seasonal, trend, holt_trend)
+    level = np.where(seasonal, level, y0 - holt_trend)  # Prediksi pertama = titik pertama
+    season = np.where(seasonal[:, None], season, 0.0)
+    gamma = np.where(seasonal, gamma, 0.0)
+
+    fitted = np.empty_like(Yg)
+    for t in range(width):
+        active = t >= start
+        slot = (t - start) % m
+        pred = level + trend + season[rows, slot]
+        error = np.where(active, Yg[:, t] - pred, 0.0)
+        fitted[:, t] = pred
+        level = np.where(active, level + trend + alpha * error, level)
+        trend = trend + beta * error
+        season[rows, slot] = season[rows, slot] + gamma * error
+
+    burn_in = np.where(seasonal, m, 0)
+    scored = np.arange(width)[None, :] >= (start + burn_in)[:, None]
+    sse = (((Yg - fitted) ** 2) * scored).sum(axis=1).reshape(n, g)
+    best = np.arange(n) * g + sse.argmin(axis=1)
+
+    h = np.arange(1, periods + 1)
+    slots = (width + h[None, :] - 1 - start[best, None]) % m
+    forecast = level[best, None] + h[None, :] * trend[best, None] + season[best[:, None], slots]
+
+    # Varians horizon h: sigma^2 * (1 + sum_{j<h} c_j^2), c_j = alpha + beta*j + gamma*[j mod m == 0]
+    dof = np.maximum(lengths - burn_in[best] - 3, 1)
+    sigma = np.sqrt(sse.min(axis=1) / dof)
+    j = np.arange(1, periods)
+    c = alpha[best, None] + beta[best, None] * j[None, :] + gamma[best, None] * (j % m == 0)[None, :]
+    spread = np.sqrt(1 + np.concatenate([np.zeros((n, 1)), np.cumsum(c ** 2, axis=1)], axis=1))
+    return fitted[best], forecast, sigma[:, None] * spread
+
+
+def _seasonal_naive(Y: np.ndarray, lengths: np.ndarray, periods: int, m: int = SEASON_LENGTH):
+    n, width = Y.shape
+    rows = np.arange(n)[:, None]
+    start = width - lengths
+    m = np.minimum(m, lengths)
+    h = np.arange(periods)
+    forecast = Y[rows, width - m[:, None] + h[None, :] % m[:, None]]
+
+    # Fitted = nilai satu musim sebelumnya; musim pertama tiap seri memakai nilainya sendiri
+    cols = np.arange(width)[None, :]
+    has_lag = cols - start[:, None] >= m[:, None]
+    lagged = Y[rows, np.maximum(cols - m[:, None], 0)]
+    fitted = np.where(has_lag, lagged, Y)
+
+    diffs = np.where(has_lag, Y - lagged, 0.0)
+    count = has_lag.sum(axis=1)
+    sigma = np.sqrt((diffs ** 2).sum(axis=1) / np.maximum(count, 1))
+    spread = np.sqrt(h[None, :] // m[:, None] + 1)
+    return fitted, forecast, sigma[:, None] * spread
+
+
+def _ridge_weekly(Y: np.ndarray, observed: np.ndarray, lengths: np.ndarray, last_dates: List[pd.Timestamp], periods: int):
+    """Ridge tren + dummy hari, desain per seri (fase hari berbeda), diselesaikan dengan batched solve."""
+    n, width = Y.shape
+    steps = np.arange(width + periods)
+    # Tren diskalakan ke rentang seri sendiri (0..1 di data historisnya), bukan lebar batch
+    start = (width - lengths)[:, None]
+    t = (steps[None, :] - start) / np.maximum(lengths - 1, 1)[:, None]
+    last_dow = np.array([d.dayofweek for d in last_dates])
+    dow = (last_dow[:, None] + steps[None, :] - (width - 1)) % 7
+    dummies = (dow[..., None] == np.arange(1, 7)).astype(float)
+    X = np.concatenate([np.ones((n, width + periods, 1)), t[..., None], dummies], axis=2)
+
+    Xh, W = X[:, :width], observed.astype(float)
+    penalty = RIDGE_ALPHA * np.eye(X.shape[2])
+    penalty[0, 0] = 0.0  # Intercept tidak di-regularisasi
+    gram = np.einsum("ntp,nt,ntq->npq", Xh, W, Xh) + penalty
+    coef = np.linalg.solve(gram, np.einsum("ntp,nt,nt->np", Xh, W, Y)[..., None])[..., 0]
+    yhat = np.einsum("ntp,np->nt", X, coef)
+
+    residual = (Y - yhat[:, :width]) * W
+    dof = np.maximum(W.sum(axis=1) - X.shape[2], 1)
+    sigma = np.sqrt((residual ** 2).sum(axis=1) / dof)
+    return yhat[:, :width], yhat[:, width:], np.repeat(sigma[:, None], periods, axis=1)
+
+
+# === API ===
+def forecast_batch(
+    histories: Dict[str, pd.DataFrame],
+    periods: int,
+    model: str = "holt_winters",
+    include_history: bool = False,
+    interval_width: float = DEFAULT_INTERVAL_WIDTH,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Forecast banyak seri harian sekaligus dalam satu operasi matriks.
+
+    Args:
+        histories: Dictionary nama seri -> DataFrame historis (ds, y)
+        periods: Jumlah hari ke depan
+        model: Salah satu FAST_MODELS
+        include_history: Sertakan fitted value untuk tanggal historis (seperti Prophet)
+        interval_width: Lebar interval prediksi (0-1)
+
+    Returns:
+        Dictionary nama seri -> DataFrame (ds, yhat, yhat_lower, yhat_upper).
+        Seri kosong tidak disertakan.
+    """
+    if model not in FAST_MODELS:
+        raise ValueError(f"Model '{model}' tidak dikenal, pilih salah satu: {', '.join(FAST_MODELS)}")
+
+    names, Y, observed, lengths, last_dates = _build_matrix(histories)
+    if not names:
+        return {}
+
+    if model == "holt_winters":
+        fitted, forecast, scale = _holt_winters(Y, lengths, periods)
+    elif model == "seasonal_naive":
+        fitted, forecast, scale = _seasonal_naive(Y, lengths, periods)
+    else:
+        fitted, forecast, scale = _ridge_weekly(Y, observed, lengths, last_dates, periods)
+
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    width = Y.shape[1]
+    results = {}
+    for i, name in enumerate(names):
+        future_ds = pd.date_range(last_dates[i] + pd.Timedelta(days=1), periods=periods, freq="D")
+        yhat, margin = forecast[i], z * scale[i]
+        frame = pd.DataFrame({"ds": future_ds, "yhat": yhat, "yhat_lower": yhat - margin, "yhat_upper": yhat + margin})
+        if include_history:
+            history_ds = pd.date_range(end=last_dates[i], periods=lengths[i], freq="D")
+            fit = fitted[i, width - lengths[i]:]
+            margin = z * scale[i, 0]
+            history = pd.DataFrame({"ds": history_ds, "yhat": fit, "yhat_lower": fit - margin, "yhat_upper": fit + margin})
+            frame = pd.concat([history, frame], ignore_index=True)
+        results[name] = frame
+    return results
+
+
+def fast_forecast(
+    df: pd.DataFrame,
+    periods: int,
+    model: str = "holt_winters",
+    include_history: bool = False,
+    interval_width: float = DEFAULT_INTERVAL_WIDTH,
+) -> pd.DataFrame:
+    """Forecast satu seri (wrapper forecast_batch)."""
+    results = forecast_batch({"series": df}, periods, model, include_history, interval_width)
+    if "series" not in results:
+        raise ValueError("Data historis kosong")
+    return results["series"]
@@ -0,0 +1,275 @@
+"""
+Subsistem job background untuk pekerjaan panjang (sync, training, forecasting).
+
+Endpoint cukup mendaftarkan job dan langsung mengembalikan job_id; pekerjaan
+dijalankan di thread pool berukuran tetap. Status, progres, durasi, dan hasil
+disimpan di tabel background_jobs sehingga client bisa polling dari worker mana
+pun, atau menyambung lagi setelah koneksi putus.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import or_
+
+from app.db import SessionLocal, engine
+from app.models.job_model import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "20"))
+# Job queued/running yang lebih tua dari ini dianggap yatim (runner-nya mati tanpa shutdown bersih)
+JOB_STALE_TIMEOUT_SECONDS = int(os.getenv("JOB_STALE_TIMEOUT_SECONDS", "21600"))  # 6 jam
+RUNNER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+ACTIVE_STATUSES = ("queued", "running")
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+class JobQueueFull(Exception):
+    """Antrian job penuh; client sebaiknya mencoba lagi nanti."""
+
+
+class JobContext:
+    """Handle yang diterima fungsi job untuk melaporkan progres."""
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self._manager = manager
+        self.job_id = job_id
+
+    def progress(self, fraction: float, message: Optional[str] = None):
+        self._manager._update(
+            self.job_id, progress=round(min(max(fraction, 0.0), 1.0), 4), message=message
+        )
+
+
+def _to_json(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, default=str)
+
+
+def job_to_dict(job: BackgroundJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "params": json.loads(job.params) if job.params else None,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "runner": job.runner,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "duration_seconds": job.duration_seconds,
+    }
+
+
+class JobManager:
+    """
+    Thread pool berukuran tetap + persistence status job ke database.
+    """
+
+    def __init__(self, max_workers: int = JOB_MAX_WORKERS, max_pending: int = JOB_MAX_PENDING):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(1, max_pending)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._active: set = set()
+        self._table_ready = False
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="background-job"
+                )
+            return self._executor
+
+    def _ensure_table(self):
+        if not self._table_ready:
+            BackgroundJob.__table__.create(bind=engine, checkfirst=True)
+            self._fail_stale_jobs()
+            self._table_ready = True
+
+    def _fail_stale_jobs(self):
+        """
+        Tandai gagal job queued/running yang tidak mungkin selesai lagi: milik RUNNER_ID ini
+        (proses sebelumnya dengan host:pid sama mati tanpa shutdown bersih, misal di container)
+        atau yang sudah melewati JOB_STALE_TIMEOUT_SECONDS.
+        """
+        cutoff = datetime.now() - timedelta(seconds=JOB_STALE_TIMEOUT_SECONDS)
+        db = SessionLocal()
+        try:
+            count = db.query(BackgroundJob).filter(
+                BackgroundJob.status.in_(ACTIVE_STATUSES),
+                or_(BackgroundJob.runner == RUNNER_ID, BackgroundJob.created_at < cutoff)
+            ).update({
+                "status": "failed",
+                "error": "Runner berhenti sebelum job selesai",
+                "finished_at": datetime.now(),
+            }, synchronize_session=False)
+            db.commit()
+            if count:
+                logger.warning(f"⚠️ {count} job yatim ditandai gagal")
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Gagal membersihkan job yatim: {e}")
+        finally:
+            db.close()
+
+    def _update(self, job_id: str, **fields) -> bool:
+        """
+        Update baris job selama masih queued/running. Job yang sudah final (misal ditandai
+        gagal oleh shutdown) tidak ditimpa lagi oleh thread yang masih berjalan.
+
+        Returns:
+            True jika baris ter-update
+        """
+        db = SessionLocal()
+        try:
+            count = db.query(BackgroundJob).filter(
+                BackgroundJob.job_id == job_id,
+                BackgroundJob.status.in_(ACTIVE_STATUSES)
+            ).update(fields, synchronize_session=False)
+            db.commit()
+            return count > 0
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Gagal update job {job_id}: {e}")
+            return False
+        finally:
+            db.close()
+
+    def submit(self, kind: str, fn: Callable[[JobContext], Any], params: Optional[Dict] = None) -> str:
+        """
+        Daftarkan job baru dan jalankan di background.
+
+        Args:
+            kind: Jenis job (misal "weather_sync", "forecast_batch")
+            fn: Fungsi job, menerima JobContext dan mengembalikan hasil yang bisa di-JSON-kan
+            params: Parameter job untuk ditampilkan di status
+
+        Returns:
+            job_id
+        """
+        self._ensure_table()
+        job_id = str(uuid.uuid4())
+        # Cek kapasitas dan reservasi slot dalam satu critical section
+        with self._lock:
+            if len(self._active) >= self.max_pending:
+                raise JobQueueFull(f"Antrian job penuh ({self.max_pending} job aktif)")
+            self._active.add(job_id)
+
+        try:
+            db = SessionLocal()
+            try:
+                db.add(BackgroundJob(
+                    job_id=job_id,
+                    kind=kind,
+                    status="queued",
+                    progress=0.0,
+                    params=_to_json(params),
+                    runner=RUNNER_ID,
+                    created_at=datetime.now(),
+                ))
+                db.commit()
+            finally:
+                db.close()
+            self._get_executor().submit(self._run, job_id, kind, fn)
+        except Exception:
+            with self._lock:
+                self._active.discard(job_id)
+            raise
+        logger.info(f"📥 Job {kind} {job_id} masuk antrian")
+        return job_id
+
+    def _run(self, job_id: str, kind: str, fn: Callable[[JobContext], Any]):
+        started_at = datetime.now()
+        start = time.perf_counter()
+        self._update(job_id, status="running", started_at=started_at)
+        try:
+            result = fn(JobContext(self, job_id))
+            duration = time.perf_counter() - start
+            if self._update(
+                job_id,
+                status="succeeded",
+                progress=1.0,
+                result=_to_json(result),
+                finished_at=datetime.now(),
+                duration_seconds=round(duration, 3),
+            ):
+                logger.info(f"✅ Job {kind} {job_id} selesai dalam {duration:.1f}s")
+            else:
+                logger.warning(f"⚠️ Job {kind} {job_id} selesai setelah ditandai gagal; hasil dibuang")
+        except Exception as e:
+            duration = time.perf_counter() - start
+            self._update(
+                job_id,
+                status="failed",
+                error=str(e),
+                finished_at=datetime.now(),
+                duration_seconds=round(duration, 3),
+            )
+            logger.error(f"❌ Job {kind} {job_id} gagal: {e}")
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._ensure_table()
+        db = SessionLocal()
+        try:
+            job = db.get(BackgroundJob, job_id)
+            return job_to_dict(job) if job else None
+        finally:
+            db.close()
+
+    def list(self, kind: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        self._ensure_table()
+        db = SessionLocal()
+        try:
+            query = db.query(BackgroundJob)
+            if kind:
+                query = query.filter(BackgroundJob.kind == kind)
+            jobs = query.order_by(BackgroundJob.created_at.desc()).limit(limit).all()
+            return [job_to_dict(job) for job in jobs]
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runner": RUNNER_ID,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "active": len(self._active),
+            }
+
+    def shutdown(self):
+        """Hentikan executor; job yang belum selesai di worker ini ditandai gagal."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            unfinished = list(self._active)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        for job_id in unfinished:
+            self._update(
+                job_id,
+                status="failed",
+                error="Dihentikan karena server shutdown",
+                finished_at=datetime.now(),
+            )
+
+
+# Instance bersama untuk seluruh aplikasi
+job_manager = JobManager()
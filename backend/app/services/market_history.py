@@ -0,0 +1,132 @@
+"""
+Loader data historis harga pasar.
+
+Semua agregasi (rata-rata harian per komoditas) dilakukan di SQL dalam satu
+round-trip, lalu hasilnya dibaca langsung ke DataFrame kolumnar dengan pd.read_sql.
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import String, column, func, select, text, values
+from sqlalchemy.orm import Session
+
+from app.models.market_model import MarketPrice
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COLUMNS = ["commodity", "ds", "y", "n"]
+
+
+def load_price_history(
+    db: Session,
+    commodity_names: List[str],
+    days_back: Optional[int] = 90,
+) -> pd.DataFrame:
+    """
+    Ambil rata-rata harga harian untuk banyak komoditas dalam satu query.
+
+    Nama komoditas dicocokkan seperti ILIKE '%nama%' lewat join ke daftar VALUES,
+    lalu di-GROUP BY (nama yang diminta, tanggal) di database.
+
+    Args:
+        db: Database session
+        commodity_names: List nama komoditas yang diminta
+        days_back: Jumlah hari kebelakang (None = semua data)
+
+    Returns:
+        DataFrame kolom commodity (nama yang diminta), ds, y (rata-rata harga), n (jumlah baris)
+    """
+    names = list(dict.fromkeys(commodity_names))
+    if not names:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    requested = values(column("commodity", String), name="requested").data([(n,) for n in names])
+
+    stmt = (
+        select(
+            requested.c.commodity,
+            MarketPrice.date.label("ds"),
+            func.avg(MarketPrice.price).label("y"),
+            func.count().label("n"),
+        )
+        .select_from(requested)
+        .join(
+            MarketPrice,
+            MarketPrice.commodity_name.ilike(func.concat("%", requested.c.commodity, "%")),
+        )
+        .where(MarketPrice.price.isnot(None), MarketPrice.date.isnot(None))
+        .group_by(requested.c.commodity, MarketPrice.date)
+        .order_by(requested.c.commodity, MarketPrice.date)
+    )
+    if days_back is not None:
+        stmt = stmt.where(MarketPrice.date >= date.today() - timedelta(days=days_back))
+
+    df = pd.read_sql(stmt, db.connection(), parse_dates=["ds"])
+    df["y"] = df["y"].astype(float)
+    return df
+
+
+def load_price_history_by_commodity(
+    db: Session,
+    commodity_names: List[str],
+    days_back: Optional[int] = 90,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Sama seperti load_price_history, dipecah per komoditas dalam format Prophet (ds, y).
+    Komoditas tanpa data tetap ada di hasil dengan DataFrame kosong.
+    """
+    names = list(dict.fromkeys(commodity_names))
+    histories = {name: pd.DataFrame(columns=["ds", "y"]) for name in names}
+
+    df = load_price_history(db, names, days_back)
+    for name, group in df.groupby("commodity", sort=False):
+        histories[name] = group[["ds", "y"]].reset_index(drop=True)
+
+    logger.info(f"Loaded price history for {len(names)} commodities ({len(df)} daily rows) in one query")
+    return histories
+
+
+COMMODITY_SUMMARY_SQL = text("""
+    WITH daily AS (
+        SELECT commodity_name, date, AVG(price) AS price, COUNT(*) AS n
+        FROM market_prices
+        WHERE commodity_name IS NOT NULL AND price IS NOT NULL AND date IS NOT NULL
+        GROUP BY commodity_name, date
+    )
+    SELECT
+        commodity_name,
+        SUM(n) AS records,
+        COUNT(*) AS days,
+        MIN(date) AS first_date,
+        MAX(date) AS last_date,
+        (ARRAY_AGG(price ORDER BY date DESC))[1] AS latest_price,
+        AVG(price) AS average_price,
+        MIN(price) AS min_price,
+        MAX(price) AS max_price
+    FROM daily
+    GROUP BY commodity_name
+    ORDER BY commodity_name
+""")
+
+
+def load_commodity_summary(db: Session) -> pd.DataFrame:
+    """
+    Ringkasan per komoditas (jumlah data, rentang tanggal, harga terakhir/rata-rata/min/max)
+    dihitung seluruhnya di SQL dalam satu query.
+    """
+    return pd.read_sql(COMMODITY_SUMMARY_SQL, db.connection())
+
+
+def get_commodity_summary(db: Session) -> List[Dict]:
+    """Ringkasan per komoditas dalam bentuk list of dict yang siap di-serialize ke JSON."""
+    summary = load_commodity_summary(db)
+    for col in ["first_date", "last_date"]:
+        summary[col] = pd.to_datetime(summary[col]).dt.strftime("%Y-%m-%d")
+    for col in ["latest_price", "average_price", "min_price", "max_price"]:
+        summary[col] = summary[col].astype(float).round(2)
+    for col in ["records", "days"]:
+        summary[col] = summary[col].astype(int)
+    return summary.to_dict(orient="records")
@@ -1,9 +1,15 @@
-﻿import requests
+﻿import os
+import time
+import requests
+from sqlalchemy import literal_column, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from datetime import datetime, date
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from app.db import SessionLocal
 from app.models.market_model import MarketPrice
+from app.services.disdagkopukm_client import disdagkopukm_fetcher
+from app.utils.cache import StaleWhileRevalidateCache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,9 +22,7 @@ def fetch_realtime_komoditas() -> List[Dict]:
     Mengambil data komoditas real-time dari API.
     """
     try:
-        response = requests.get(f"{BASE_URL}/komoditas", timeout=10)
-        response.raise_for_status()
-        return response.json()
+        return disdagkopukm_fetcher.get_json(f"{BASE_URL}/komoditas")
     except Exception as e:
         logger.error(f"[ERROR] Error fetching komoditas: {e}")
         return []
@@ -29,9 +33,7 @@ def fetch_realtime_produk_komoditas() -> List[Dict]:
     Handle nested structure: {data: {data: [...]}}
     """
     try:
-        response = requests.get(f"{BASE_URL}/produk-komoditas", timeout=10)
-        response.raise_for_status()
-        data = response.json()
+        data = disdagkopukm_fetcher.get_json(f"{BASE_URL}/produk-komoditas")
         
         # Extract nested data structure
         if isinstance(data, dict) and "data" in data:
@@ -52,13 +54,44 @@ def fetch_realtime_produk() -> List[Dict]:
     Mengambil data produk real-time dari API.
     """
     try:
-        response = requests.get(f"{BASE_URL}/produk", timeout=10)
-        response.raise_for_status()
-        return response.json()
+        return disdagkopukm_fetcher.get_json(f"{BASE_URL}/produk")
     except Exception as e:
         logger.error(f"[ERROR] Error fetching produk: {e}")
         return []
 
+def normalize_produk_komoditas(item: Dict) -> Dict:
+    """
+    Ubah satu item mentah /produk-komoditas menjadi format harga pasar.
+    """
+    # Extract nama dari nested object produk.name
+    nama = "Tidak diketahui"
+    if isinstance(item.get("produk"), dict) and item["produk"].get("name"):
+        nama = item["produk"]["name"]
+    elif item.get("name"):
+        nama = item["name"]
+    elif item.get("nama"):
+        nama = item["nama"]
+    
+    # Extract harga dari harga_pasar
+    harga = parse_price(item.get("harga_pasar") or item.get("harga") or 0)
+    
+    # Extract kategori dari nested object
+    kategori = "-"
+    if isinstance(item.get("kategori_komoditas"), dict):
+        kategori = item["kategori_komoditas"].get("name", "-")
+    elif item.get("kategori"):
+        kategori = item["kategori"]
+    
+    return {
+        "commodity_name": nama,
+        "category": kategori,
+        "unit": item.get("unit") or item.get("satuan") or "kg",
+        "price": harga,
+        "market_location": "Wonosobo",  # Default
+        "date": parse_date(item.get("tgl") or item.get("tanggal") or item.get("updated_at")),
+        "source": "produk-komoditas"
+    }
+
 def get_realtime_market_prices() -> Dict:
     """
     Mengambil data harga pasar real-time dari semua endpoint.
@@ -72,36 +105,9 @@ def get_realtime_market_prices() -> Dict:
         logger.info(f"[MARKET] Fetched {len(produk_komoditas)} items from produk-komoditas")
         
         for item in produk_komoditas:
-            # Extract nama dari nested object produk.name
-            nama = "Tidak diketahui"
-            if isinstance(item.get("produk"), dict) and item["produk"].get("name"):
-                nama = item["produk"]["name"]
-            elif item.get("name"):
-                nama = item["name"]
-            elif item.get("nama"):
-                nama = item["nama"]
-            
-            # Extract harga dari harga_pasar
-            harga = parse_price(item.get("harga_pasar") or item.get("harga") or 0)
-            
-            # Extract kategori dari nested object
-            kategori = "-"
-            if isinstance(item.get("kategori_komoditas"), dict):
-                kategori = item["kategori_komoditas"].get("name", "-")
-            elif item.get("kategori"):
-                kategori = item["kategori"]
-            
-            price_data = {
-                "commodity_name": nama,
-                "category": kategori,
-                "unit": item.get("unit") or item.get("satuan") or "kg",
-                "price": harga,
-                "market_location": "Wonosobo",  # Default
-                "date": parse_date(item.get("tgl") or item.get("tanggal") or item.get("updated_at")),
-                "source": "produk-komoditas"
-            }
+            price_data = normalize_produk_komoditas(item)
             all_prices.append(price_data)
-            logger.info(f"  [MARKET] Added: {nama} - Rp {harga}")
+            logger.info(f"  [MARKET] Added: {price_data['commodity_name']} - Rp {price_data['price']}")
         
         return {
             "success": True,
@@ -118,6 +124,52 @@ def get_realtime_market_prices() -> Dict:
             "data": []
         }
 
+# === Snapshot realtime (stale-while-revalidate) ===
+REALTIME_FRESH_TTL = float(os.getenv("MARKET_REALTIME_FRESH_TTL", "300"))    # 5 menit
+REALTIME_STALE_TTL = float(os.getenv("MARKET_REALTIME_STALE_TTL", "3600"))   # 1 jam
+
+realtime_cache = StaleWhileRevalidateCache(
+    fresh_ttl=REALTIME_FRESH_TTL,
+    stale_ttl=REALTIME_STALE_TTL
+)
+
+def _load_realtime_prices() -> Dict:
+    result = get_realtime_market_prices()
+    if not result.get("success"):
+        raise RuntimeError(result.get("error") or "Gagal mengambil data real-time")
+    # Fetcher menelan error dan mengembalikan [] → success=True dengan data kosong;
+    # anggap gagal agar snapshot lama tetap dilayani
+    if not result.get("data"):
+        raise RuntimeError("Tidak ada data harga dari endpoint produk-komoditas")
+    return result
+
+def _require_items(fetch_fn, name: str):
+    def loader() -> List[Dict]:
+        data = fetch_fn()
+        # Fetcher mengembalikan [] saat gagal; jangan timpa snapshot lama dengan data kosong
+        if not data:
+            raise RuntimeError(f"Tidak ada data dari endpoint {name}")
+        return data
+    return loader
+
+REALTIME_LOADERS = {
+    "prices": _load_realtime_prices,
+    "komoditas": _require_items(fetch_realtime_komoditas, "komoditas"),
+    "produk-komoditas": _require_items(fetch_realtime_produk_komoditas, "produk-komoditas"),
+    "produk": _require_items(fetch_realtime_produk, "produk"),
+}
+
+def get_realtime_snapshot(name: str) -> Tuple[object, str, float]:
+    """
+    Ambil snapshot data realtime dari cache. Request hanya menunggu upstream saat
+    snapshot belum ada atau sudah melewati stale TTL; selebihnya refresh berjalan
+    di background dan hanya satu fetch per endpoint yang berjalan sekaligus.
+    
+    Returns:
+        Tuple (data, status cache "HIT"/"STALE"/"MISS", umur snapshot dalam detik)
+    """
+    return realtime_cache.get(name, REALTIME_LOADERS[name])
+
 def parse_price(value) -> float:
     """
     Parse harga dari berbagai format ke float.
@@ -149,54 +201,126 @@ def parse_date(value) -> date:
     except Exception:
         return date.today()
 
+# === Sync inkremental ke database ===
+def _price_key(price_data: Dict) -> Tuple[str, str, date]:
+    return (price_data["commodity_name"], price_data["market_location"], price_data["date"])
+
+def _prefetch_existing(db: Session, keys: List[Tuple[str, str, date]]) -> Dict[Tuple[str, str, date], Tuple]:
+    """Ambil (price, unit) baris yang sudah ada untuk semua key dalam satu query."""
+    if not keys:
+        return {}
+    rows = db.query(
+        MarketPrice.commodity_name,
+        MarketPrice.market_location,
+        MarketPrice.date,
+        MarketPrice.price,
+        MarketPrice.unit
+    ).filter(
+        tuple_(MarketPrice.commodity_name, MarketPrice.market_location, MarketPrice.date).in_(keys)
+    ).all()
+    return {(r[0], r[1], r[2]): (r[3], r[4]) for r in rows}
+
+def sync_market_prices(db: Session, items: List[Dict]) -> Dict:
+    """
+    Sinkronisasi item mentah /produk-komoditas ke market_prices secara inkremental.
+    
+    1. Normalisasi tiap item; key yang sama dalam satu payload: item terakhir menang
+    2. Semua key di-prefetch dalam satu query; harga & unit yang sama dengan DB dilewati
+       (selalu dibandingkan dengan DB, jadi perubahan dari worker lain / edit manual /
+       baris yang dihapus tetap dikoreksi)
+    3. Perubahan ditulis dengan satu INSERT ... ON CONFLICT (commodity, location, date)
+    
+    Returns:
+        Dictionary berisi inserted, updated, unchanged, total_fetched, dan timings_ms per fase
+    """
+    timings = {}
+    t0 = time.perf_counter()
+    
+    # Item dengan key sama dalam satu payload: yang terakhir menang (seperti update berurutan)
+    pending: Dict[Tuple[str, str, date], Dict] = {}
+    for item in items:
+        price_data = normalize_produk_komoditas(item)
+        pending[_price_key(price_data)] = price_data
+    unchanged = 0
+    timings["normalize"] = round((time.perf_counter() - t0) * 1000, 1)
+    
+    t1 = time.perf_counter()
+    existing = _prefetch_existing(db, list(pending.keys()))
+    timings["prefetch"] = round((time.perf_counter() - t1) * 1000, 1)
+    
+    t2 = time.perf_counter()
+    now = datetime.now()
+    changes = []
+    for key, price_data in pending.items():
+        current = existing.get(key)
+        if current is not None and current == (price_data["price"], price_data["unit"]):
+            unchanged += 1
+            continue
+        changes.append({
+            "user_id": None,  # Biarkan NULL untuk data dari API
+            "commodity_name": price_data["commodity_name"],
+            "market_location": price_data["market_location"],
+            "unit": price_data["unit"],
+            "price": price_data["price"],
+            "date": price_data["date"],
+            "created_at": now
+        })
+    
+    inserted = 0
+    updated = 0
+    if changes:
+        table = MarketPrice.__table__
+        stmt = pg_insert(table).values(changes)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.commodity_name, table.c.market_location, table.c.date],
+            # updated_at diisi agar watermark refit model (ai_market) melihat harga yang berubah
+            set_={"price": stmt.excluded.price, "unit": stmt.excluded.unit, "updated_at": stmt.excluded.created_at}
+        ).returning(literal_column("(xmax = 0)").label("inserted"))
+        try:
+            flags = db.execute(stmt).scalars().all()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        inserted = sum(1 for flag in flags if flag)
+        updated = len(flags) - inserted
+    timings["write"] = round((time.perf_counter() - t2) * 1000, 1)
+    
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": unchanged,
+        "total_fetched": len(items),
+        "timings_ms": timings
+    }
+
 def fetch_and_save_market_data():
     """
-    Mengambil data harga komoditas dari API dan menyimpannya ke database.
+    Mengambil data harga komoditas dari API dan menyimpannya ke database (inkremental).
     """
     try:
-        realtime_data = get_realtime_market_prices()
+        t0 = time.perf_counter()
+        items = fetch_realtime_produk_komoditas()
+        fetch_ms = round((time.perf_counter() - t0) * 1000, 1)
         
-        if not realtime_data.get("success") or not realtime_data.get("data"):
+        if not items:
             logger.warning("[WARNING] Tidak ada data dari API Disdagkopukm.")
             return {"message": "Tidak ada data yang diterima."}
 
         db: Session = SessionLocal()
-        count = 0
-
-        for price_data in realtime_data["data"]:
-            # Cek duplikat supaya tidak double insert
-            existing = db.query(MarketPrice).filter(
-                MarketPrice.commodity_name == price_data["commodity_name"],
-                MarketPrice.market_location == price_data["market_location"],
-                MarketPrice.date == price_data["date"]
-            ).first()
-
-            if existing:
-                # Update harga jika sudah ada
-                existing.price = price_data["price"]
-                existing.unit = price_data["unit"]
-                continue
-
-            new_price = MarketPrice(
-                user_id=None,  # Biarkan NULL untuk data dari API
-                commodity_name=price_data["commodity_name"],
-                market_location=price_data["market_location"],
-                unit=price_data["unit"],
-                price=price_data["price"],
-                date=price_data["date"],
-                created_at=datetime.now()
-            )
-
-            db.add(new_price)
-            count += 1
-
-        db.commit()
-        db.close()
-
-        logger.info(f"[MARKET] {count} data baru berhasil disimpan dari API Disdagkopukm.")
+        try:
+            result = sync_market_prices(db, items)
+        finally:
+            db.close()
+        result["timings_ms"] = {"fetch": fetch_ms, **result["timings_ms"]}
+
+        logger.info(
+            f"[MARKET] Sync Disdagkopukm: {result['inserted']} baru, {result['updated']} diperbarui, "
+            f"{result['unchanged']} tidak berubah ({result['timings_ms']} ms)."
+        )
         return {
-            "message": f"{count} data berhasil disimpan ke database.",
-            "total_fetched": realtime_data["total"]
+            "message": f"{result['inserted'] + result['updated']} data berhasil disimpan ke database.",
+            **result
         }
 
     except requests.exceptions.RequestException as e:
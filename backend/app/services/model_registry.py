@@ -0,0 +1,171 @@
+"""
+Registry model terlatih (Prophet, dll) yang dipersist ke disk dengan joblib
+dan disimpan di memori dengan LRU.
+
+Model diberi versi berdasarkan fingerprint data training (jumlah baris, tanggal
+terakhir, checksum nilai + parameter model). Selama data di database tidak
+berubah, model yang sudah di-fit dipakai ulang dan cukup menjalankan predict.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import joblib
+import pandas as pd
+
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+MODEL_REGISTRY_DIR = os.getenv(
+    "MODEL_REGISTRY_DIR", os.path.join("app", "services", "models_storage", "registry")
+)
+MODEL_REGISTRY_MEMORY_SIZE = int(os.getenv("MODEL_REGISTRY_MEMORY_SIZE", "32"))
+MODEL_REGISTRY_KEEP_VERSIONS = int(os.getenv("MODEL_REGISTRY_KEEP_VERSIONS", "2"))
+
+
+def _slugify(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", value.strip().lower()).strip("_") or "model"
+
+
+class ModelRegistry:
+    """
+    Menyimpan model per key (misal "price:bawang merah") dan fingerprint data.
+    """
+
+    def __init__(
+        self,
+        directory: str = MODEL_REGISTRY_DIR,
+        memory_size: int = MODEL_REGISTRY_MEMORY_SIZE,
+        keep_versions: int = MODEL_REGISTRY_KEEP_VERSIONS,
+    ):
+        self.directory = directory
+        self.keep_versions = max(1, keep_versions)
+        self._memory = TTLCache(maxsize=memory_size, ttl=None)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    # === Fingerprint ===
+    @staticmethod
+    def fingerprint(df: pd.DataFrame, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Fingerprint data training: jumlah baris, tanggal maksimum, dan checksum
+        kolom ds/y (ditambah parameter model agar perubahan konfigurasi memicu refit).
+        """
+        if df is None or df.empty:
+            return "empty"
+
+        frame = df[["ds", "y"]].copy()
+        frame["ds"] = pd.to_datetime(frame["ds"])
+        digest = hashlib.sha256(
+            pd.util.hash_pandas_object(frame, index=False).values.tobytes()
+        )
+        if params:
+            digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+
+        max_date = frame["ds"].max().strftime("%Y%m%d")
+        return f"{len(frame)}-{max_date}-{digest.hexdigest()[:16]}"
+
+    # === Storage ===
+    def _path(self, key: str, fingerprint: str) -> str:
+        return os.path.join(self.directory, f"{_slugify(key)}__{fingerprint}.joblib")
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key: str, fingerprint: str) -> Optional[Any]:
+        """Ambil model dari memori atau disk, None jika versi ini belum ada."""
+        model = self._memory.get((key, fingerprint))
+        if model is not None:
+            return model
+
+        path = self._path(key, fingerprint)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            entry = joblib.load(path)
+            model = entry["model"]
+        except Exception as e:
+            logger.warning(f"Gagal load model {path}: {e}")
+            return None
+
+        self._memory.set((key, fingerprint), model)
+        return model
+
+    def put(self, key: str, fingerprint: str, model: Any, metadata: Optional[Dict] = None):
+        """Simpan model ke memori dan disk (atomic), lalu pangkas versi lama."""
+        self._memory.set((key, fingerprint), model)
+
+        path = self._path(key, fingerprint)
+        tmp_path = f"{path}.tmp"
+        entry = {
+            "key": key,
+            "fingerprint": fingerprint,
+            "trained_at": datetime.now().isoformat(),
+            "metadata": metadata or {},
+            "model": model,
+        }
+        try:
+            joblib.dump(entry, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Gagal menyimpan model {path}: {e}")
+            return
+
+        self._prune(key)
+
+    def _prune(self, key: str):
+        versions = sorted(
+            glob.glob(os.path.join(self.directory, f"{_slugify(key)}__*.joblib")),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        for old_path in versions[self.keep_versions:]:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    def get_or_fit(
+        self, key: str, fingerprint: str, fit_fn: Callable[[], Any], metadata: Optional[Dict] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Ambil model untuk (key, fingerprint) atau fit baru jika belum ada.
+        Fit untuk key yang sama diserialisasi agar request paralel tidak fit dua kali.
+
+        Returns:
+            Tuple (model, reused)
+        """
+        model = self.get(key, fingerprint)
+        if model is not None:
+            return model, True
+
+        with self._lock_for(key):
+            model = self.get(key, fingerprint)
+            if model is not None:
+                return model, True
+
+            model = fit_fn()
+            self.put(key, fingerprint, model, metadata)
+            return model, False
+
+    def stats(self) -> Dict:
+        return {
+            "directory": self.directory,
+            "files": len(glob.glob(os.path.join(self.directory, "*.joblib"))),
+            "memory": self._memory.stats(),
+        }
+
+
+# Instance bersama untuk seluruh aplikasi
+model_registry = ModelRegistry()
@@ -0,0 +1,313 @@
+"""
+Pemilihan model forecasting otomatis per seri dengan rolling-origin backtest.
+
+Setiap kandidat model di-backtest pada beberapa titik potong (fold) di akhir data
+historis: fit pada data sampai titik potong, forecast BACKTEST_HORIZON_DAYS ke depan,
+bandingkan dengan data aktual. Dicatat MAPE, RMSE, dan biaya fit per seri, lalu dipilih
+model termurah yang MAPE-nya memenuhi threshold (jika tidak ada, MAPE terkecil).
+Antar model cepat "termurah" memakai urutan biaya tetap (waktu batch per seri hanya
+mikrodetik dan berubah-ubah tiap run); biaya terukur hanya dipakai melawan Prophet.
+
+- Model cepat di-backtest untuk semua seri sekaligus (satu batch matriks per fold)
+- Prophet hanya di-backtest untuk seri yang belum punya model cepat yang memenuhi
+  threshold (kecuali evaluate_all), fit-nya paralel di worker pool prophet_service
+- Hasil disimpan per seri sampai data yang di-backtest berubah (rentang hari, jumlah baris,
+  atau isi harga, misal harga lama dikoreksi)
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.fast_forecast import FAST_MODELS, forecast_batch
+from app.services.model_registry import model_registry
+from app.services.prophet_service import prophet_service
+
+logger = logging.getLogger(__name__)
+
+BACKTEST_FOLDS = int(os.getenv("BACKTEST_FOLDS", "3"))
+BACKTEST_HORIZON_DAYS = int(os.getenv("BACKTEST_HORIZON_DAYS", "7"))
+BACKTEST_MIN_TRAIN_DAYS = int(os.getenv("BACKTEST_MIN_TRAIN_DAYS", "28"))
+MODEL_SELECTION_MAPE_THRESHOLD = float(os.getenv("MODEL_SELECTION_MAPE_THRESHOLD", "10.0"))  # persen
+MODEL_SELECTION_CANDIDATES = tuple(
+    m.strip() for m in os.getenv(
+        "MODEL_SELECTION_CANDIDATES", "seasonal_naive,ridge_weekly,holt_winters,prophet"
+    ).split(",") if m.strip()
+)
+MODEL_SELECTION_PATH = os.getenv(
+    "MODEL_SELECTION_PATH",
+    os.path.join(os.path.dirname(__file__), "models_storage", "model_selection.json"),
+)
+DEFAULT_MODEL = "prophet"  # Dipakai jika data terlalu pendek untuk backtest
+# Urutan biaya model cepat: closed-form → satu batched solve → grid parameter + rekursi
+FAST_MODEL_COST_ORDER = ("seasonal_naive", "ridge_weekly", "holt_winters")
+
+
+def _rolling_folds(df: pd.DataFrame, folds: int, horizon: int, min_train: int) -> List[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """Bagi seri menjadi pasangan (train, test) dengan titik potong mundur tiap `horizon` hari."""
+    frame = df[["ds", "y"]].dropna().assign(ds=lambda d: pd.to_datetime(d["ds"]))
+    if frame.empty:
+        return []
+    last = frame["ds"].max()
+    pairs = []
+    for k in range(folds, 0, -1):
+        cutoff = last - pd.Timedelta(days=k * horizon)
+        train = frame[frame["ds"] <= cutoff]
+        test = frame[(frame["ds"] > cutoff) & (frame["ds"] <= cutoff + pd.Timedelta(days=horizon))]
+        if train["ds"].nunique() >= min_train and not test.empty:
+            pairs.append((train, test))
+    return pairs
+
+
+def _errors(forecast: pd.DataFrame, test: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Absolute percentage error dan squared error pada tanggal yang ada di data test."""
+    actual = test.groupby(test["ds"].dt.normalize())["y"].mean()
+    predicted = forecast.set_index(pd.to_datetime(forecast["ds"]).dt.normalize())["yhat"]
+    joined = pd.concat([actual.rename("y"), predicted.rename("yhat")], axis=1, join="inner")
+    diff = (joined["yhat"] - joined["y"]).to_numpy()
+    y = joined["y"].to_numpy()
+    nonzero = y != 0
+    return np.abs(diff[nonzero] / y[nonzero]), diff ** 2
+
+
+class _Accumulator:
+    def __init__(self):
+        self.ape: List[np.ndarray] = []
+        self.se: List[np.ndarray] = []
+        self.cost = 0.0
+        self.fits = 0
+
+    def add(self, forecast: pd.DataFrame, test: pd.DataFrame, cost: float):
+        ape, se = _errors(forecast, test)
+        self.ape.append(ape)
+        self.se.append(se)
+        self.cost += cost
+        self.fits += 1
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        ape = np.concatenate(self.ape) if self.ape else np.array([])
+        se = np.concatenate(self.se) if self.se else np.array([])
+        if not len(se):
+            return None
+        return {
+            "mape": round(float(ape.mean() * 100), 3) if len(ape) else None,
+            "rmse": round(float(math.sqrt(se.mean())), 3),
+            "fit_seconds": round(self.cost / self.fits, 5),
+            "folds": self.fits,
+        }
+
+
+class ModelSelector:
+    """
+    Cache + backtest pemilihan model per seri (key misal "price:bawang merah").
+    """
+
+    def __init__(
+        self,
+        path: str = MODEL_SELECTION_PATH,
+        candidates: Tuple[str, ...] = MODEL_SELECTION_CANDIDATES,
+        threshold: float = MODEL_SELECTION_MAPE_THRESHOLD,
+        folds: int = BACKTEST_FOLDS,
+        horizon: int = BACKTEST_HORIZON_DAYS,
+        min_train: int = BACKTEST_MIN_TRAIN_DAYS,
+    ):
+        self.path = path
+        self.candidates = tuple(m for m in candidates if m in FAST_MODELS or m == "prophet")
+        self.threshold = threshold
+        self.folds = folds
+        self.horizon = horizon
+        self.min_train = min_train
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._lock = threading.Lock()
+
+    # === Penyimpanan ===
+    def _config(self) -> Dict[str, Any]:
+        return {
+            "candidates": list(self.candidates),
+            "threshold": self.threshold,
+            "folds": self.folds,
+            "horizon": self.horizon,
+        }
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except FileNotFoundError:
+                self._entries = {}
+            except Exception as e:
+                logger.warning(f"Gagal membaca {self.path}: {e}")
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Gagal menyimpan {self.path}: {e}")
+
+    @staticmethod
+    def data_version(df: pd.DataFrame) -> Optional[str]:
+        """
+        Versi data = rentang hari (days_back) + fingerprint isi (jumlah baris, tanggal terakhir,
+        checksum ds/y). Berubah saat data baru masuk, harga lama dikoreksi, atau jendela historis
+        berbeda (backtest 730 hari tidak dipakai ulang untuk forecast 90 hari).
+        """
+        if df is None or df.empty:
+            return None
+        ds = pd.to_datetime(df["ds"])
+        span_days = (ds.max() - ds.min()).days + 1
+        return f"{span_days}d-{model_registry.fingerprint(df)}"
+
+    def get(self, key: str, df: pd.DataFrame) -> Optional[Dict]:
+        """Pilihan tersimpan untuk seri ini jika datanya belum berubah."""
+        with self._lock:
+            entry = self._load().get(key)
+        if entry and entry.get("data_version") == self.data_version(df) and entry.get("config") == self._config():
+            return entry
+        return None
+
+    # === Pemilihan ===
+    def select(
+        self,
+        histories: Dict[str, pd.DataFrame],
+        prophet_params: Callable[[pd.DataFrame], Dict[str, Any]],
+        refresh: bool = False,
+        evaluate_all: bool = False,
+    ) -> Dict[str, Dict]:
+        """
+        Ambil (atau hitung) model terpilih untuk banyak seri.
+
+        Args:
+            histories: Dictionary key seri -> DataFrame historis (ds, y)
+            prophet_params: Fungsi df -> parameter Prophet (sama dengan yang dipakai saat forecast)
+            refresh: Abaikan cache dan backtest ulang
+            evaluate_all: Backtest Prophet juga untuk seri yang sudah punya model cepat memenuhi threshold
+
+        Returns:
+            Dictionary key seri -> entry (model, metrics, reason, data_version, selected_at, cached)
+        """
+        results, pending = {}, {}
+        for key, df in histories.items():
+            entry = None if refresh else self.get(key, df)
+            if entry:
+                results[key] = {**entry, "cached": True}
+            else:
+                pending[key] = df
+
+        if pending:
+            start = time.perf_counter()
+            fresh = self._backtest(pending, prophet_params, evaluate_all)
+            with self._lock:
+                entries = self._load()
+                entries.update(fresh)
+                self._save()
+            results.update({key: {**entry, "cached": False} for key, entry in fresh.items()})
+            logger.info(f"📊 Backtest {len(pending)} seri selesai dalam {time.perf_counter() - start:.2f}s")
+        return results
+
+    def _backtest(self, histories, prophet_params, evaluate_all) -> Dict[str, Dict]:
+        fold_sets = {key: _rolling_folds(df, self.folds, self.horizon, self.min_train) for key, df in histories.items()}
+        scores = {key: {model: _Accumulator() for model in self.candidates} for key in histories}
+
+        # 1. Model cepat: satu batch per (fold, model) untuk semua seri
+        fast_models = [m for m in self.candidates if m in FAST_MODELS]
+        for fold in range(self.folds):
+            batch = {key: pairs[fold] for key, pairs in fold_sets.items() if fold < len(pairs)}
+            if not batch:
+                continue
+            trains = {key: train for key, (train, _) in batch.items()}
+            for model in fast_models:
+                start = time.perf_counter()
+                forecasts = forecast_batch(trains, self.horizon, model)
+                cost = (time.perf_counter() - start) / len(trains)
+                for key, forecast in forecasts.items():
+                    scores[key][model].add(forecast, batch[key][1], cost)
+
+        # 2. Prophet: hanya seri yang belum terpenuhi model cepat, paralel di worker pool
+        if "prophet" in self.candidates:
+            need_prophet = [
+                key for key, pairs in fold_sets.items()
+                if pairs and (evaluate_all or not self._eligible(scores[key], fast_models))
+            ]
+            jobs = [(key, train, test) for key in need_prophet for train, test in fold_sets[key]]
+            with ThreadPoolExecutor(max_workers=prophet_service.max_workers, thread_name_prefix="backtest") as pool:
+                fits = pool.map(
+                    lambda job: prophet_service.forecast(
+                        job[1], prophet_params(job[1]), periods=self.horizon, include_history=False, budget=None
+                    ),
+                    jobs,
+                )
+                for (key, _, test), fit in zip(jobs, fits):
+                    if fit["model"] == "prophet":
+                        scores[key]["prophet"].add(fit["forecast"], test, fit["timings"]["total_seconds"])
+
+        now = datetime.now().isoformat()
+        entries = {}
+        for key, df in histories.items():
+            metrics = {model: acc.summary() for model, acc in scores[key].items()}
+            metrics = {model: m for model, m in metrics.items() if m is not None}
+            model, reason = self._choose(metrics)
+            entries[key] = {
+                "model": model,
+                "reason": reason,
+                "metrics": metrics,
+                "data_version": self.data_version(df),
+                "config": self._config(),
+                "selected_at": now,
+            }
+        return entries
+
+    def _eligible(self, scores: Dict[str, _Accumulator], models: List[str]) -> List[str]:
+        summaries = {m: scores[m].summary() for m in models}
+        return [m for m, s in summaries.items() if s and s["mape"] is not None and s["mape"] <= self.threshold]
+
+    def _choose(self, metrics: Dict[str, Dict]) -> Tuple[str, str]:
+        if not metrics:
+            return DEFAULT_MODEL, "Data terlalu pendek untuk backtest"
+        eligible = [m for m, s in metrics.items() if s["mape"] is not None and s["mape"] <= self.threshold]
+        if eligible:
+            fast = [m for m in FAST_MODEL_COST_ORDER if m in eligible]
+            model = fast[0] if fast else eligible[0]
+            # Biaya terukur hanya untuk membandingkan model cepat dengan Prophet
+            if fast and "prophet" in eligible and metrics["prophet"]["fit_seconds"] < metrics[model]["fit_seconds"]:
+                model = "prophet"
+            return model, f"Model termurah dengan MAPE <= {self.threshold:g}%"
+        scored = [m for m, s in metrics.items() if s["mape"] is not None]
+        model = min(scored or metrics, key=lambda m: metrics[m]["mape"] if scored else metrics[m]["rmse"])
+        return model, f"Tidak ada model dengan MAPE <= {self.threshold:g}%, dipilih error terkecil"
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = dict(self._load())
+        chosen: Dict[str, int] = {}
+        for entry in entries.values():
+            chosen[entry["model"]] = chosen.get(entry["model"], 0) + 1
+        return {
+            "path": self.path,
+            "config": self._config(),
+            "series": len(entries),
+            "selected_models": chosen,
+        }
+
+    def entries(self) -> Dict[str, Dict]:
+        with self._lock:
+            return dict(self._load())
+
+
+# Instance bersama untuk seluruh aplikasi
+model_selector = ModelSelector()
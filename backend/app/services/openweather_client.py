@@ -0,0 +1,163 @@
+"""
+Async fetch engine untuk OpenWeather API.
+
+Satu httpx.AsyncClient (keep-alive) hidup di event loop background milik engine,
+sehingga kode sync (router, scheduler) bisa menjalankan banyak request secara
+konkuren tanpa membuka koneksi baru per request.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+OPENWEATHER_CONCURRENCY = int(os.getenv("OPENWEATHER_CONCURRENCY", "8"))
+OPENWEATHER_TIMEOUT = float(os.getenv("OPENWEATHER_TIMEOUT", "10"))
+OPENWEATHER_MAX_RETRIES = int(os.getenv("OPENWEATHER_MAX_RETRIES", "2"))
+OPENWEATHER_BACKOFF_BASE = float(os.getenv("OPENWEATHER_BACKOFF_BASE", "0.5"))
+
+# Status yang layak dicoba ulang (rate limit & error sementara di sisi server)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Hasil per endpoint: JSON dict, atau exception jika gagal setelah retry
+FetchResult = Union[Dict[str, Any], Exception]
+
+
+class OpenWeatherFetcher:
+    """
+    Engine fetch konkuren dengan client bersama, batas konkurensi, dan retry
+    jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = OPENWEATHER_CONCURRENCY,
+        timeout: float = OPENWEATHER_TIMEOUT,
+        max_retries: int = OPENWEATHER_MAX_RETRIES,
+        backoff_base: float = OPENWEATHER_BACKOFF_BASE,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._semaphore = None
+
+    # === Event loop & client ===
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="openweather-fetcher",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Dipanggil hanya dari dalam loop engine, jadi tidak perlu lock
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    def run(self, coro):
+        """Jalankan coroutine di loop engine dan tunggu hasilnya (blocking)."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def close(self):
+        """Tutup client dan hentikan loop background."""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None or loop.is_closed():
+            return
+
+        async def _aclose():
+            if self._client is not None:
+                await self._client.aclose()
+                self._client = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(_aclose(), loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"⚠️ Gagal menutup OpenWeather client: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+    # === Request dengan retry ===
+    def _backoff_delay(self, attempt: int) -> float:
+        # Full jitter: acak antara 0 dan base * 2^attempt
+        return random.uniform(0, self.backoff_base * (2 ** attempt))
+
+    async def get_json(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        client = self._get_client()
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await client.get(url, params=params)
+                if response.status_code in RETRYABLE_STATUS and attempt < self.max_retries:
+                    logger.debug(f"→ {url} status {response.status_code}, retry #{attempt + 1}")
+                else:
+                    response.raise_for_status()
+                    return response.json()
+            except httpx.TransportError as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.debug(f"→ {url} gagal ({e}), retry #{attempt + 1}")
+
+            await asyncio.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    async def _fetch_location(
+        self, base_url: str, api_key: str, lat: float, lon: float
+    ) -> Tuple[FetchResult, FetchResult]:
+        params = {"lat": lat, "lon": lon, "appid": api_key, "units": "metric"}
+        current, forecast = await asyncio.gather(
+            self.get_json(f"{base_url}/weather", params),
+            self.get_json(f"{base_url}/forecast", params),
+            return_exceptions=True,
+        )
+        return current, forecast
+
+    async def _fetch_locations(
+        self, base_url: str, api_key: str, coordinates: Sequence[Tuple[float, float]]
+    ) -> List[Tuple[FetchResult, FetchResult]]:
+        return await asyncio.gather(
+            *(self._fetch_location(base_url, api_key, lat, lon) for lat, lon in coordinates)
+        )
+
+    def fetch_locations(
+        self, base_url: str, api_key: str, coordinates: Sequence[Tuple[float, float]]
+    ) -> List[Tuple[FetchResult, FetchResult]]:
+        """
+        Ambil current weather + 5-day forecast untuk banyak koordinat secara konkuren.
+
+        Returns:
+            List (current, forecast) sesuai urutan coordinates. Setiap elemen berisi
+            JSON response atau exception jika request tersebut gagal.
+        """
+        return self.run(self._fetch_locations(base_url, api_key, coordinates))
+
+
+# Instance bersama untuk seluruh aplikasi
+openweather_fetcher = OpenWeatherFetcher()
@@ -0,0 +1,323 @@
+"""
+Layanan fitting Prophet bersama untuk seluruh aplikasi.
+
+Fit Prophet dijalankan di process pool yang worker-nya sudah mengimpor Prophet dan
+melakukan satu fit kecil saat start (backend Stan sudah hangat), sehingga request
+tidak lagi menanggung overhead import/startup cmdstanpy. Setiap request forecast
+punya budget waktu fit; jika habis, request langsung dijawab dengan model cepat
+(ridge + musiman mingguan) sementara fit Prophet yang sudah berjalan tetap
+diselesaikan dan disimpan ke model registry untuk request berikutnya.
+
+Pool dibuat per proses web. Dengan N worker uvicorn/gunicorn (WEB_CONCURRENCY) total
+ada N x PROPHET_WORKERS proses Prophet, jadi default PROPHET_WORKERS membagi CPU ke
+semua web worker. Jika paket prophet tidak terinstal, pool tidak pernah dibuat dan
+forecast langsung memakai model cepat.
+"""
+
+import importlib.util
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.fast_forecast import fast_forecast
+from app.services.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))  # Jumlah worker uvicorn/gunicorn
+PROPHET_WORKERS = int(os.getenv(
+    "PROPHET_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+))
+PROPHET_FIT_BUDGET_SECONDS = float(os.getenv("PROPHET_FIT_BUDGET_SECONDS", "20"))
+
+FORECAST_COLUMNS = ["ds", "yhat", "yhat_lower", "yhat_upper"]
+FAST_FALLBACK_MODEL = "fast_fallback"
+
+_UNSET = object()
+
+# Prophet hanya diimpor di worker pool, proses web cukup cek paketnya ada
+PROPHET_AVAILABLE = importlib.util.find_spec("prophet") is not None
+
+
+# === Fungsi yang dijalankan di worker process ===
+def _init_worker():
+    """Import Prophet dan fit kecil sekali agar backend Stan sudah siap."""
+    import warnings
+    warnings.filterwarnings("ignore")
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+    logging.getLogger("prophet").setLevel(logging.WARNING)
+    try:
+        from prophet import Prophet
+        warm = pd.DataFrame({"ds": pd.date_range("2024-01-01", periods=10), "y": range(10)})
+        Prophet(daily_seasonality=False, weekly_seasonality=False, yearly_seasonality=False).fit(warm)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Warm-up Prophet worker gagal: {e}")
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _fit_in_worker(df: pd.DataFrame, params: Dict[str, Any], init: Optional[Dict] = None) -> Tuple[Any, float, bool]:
+    from prophet import Prophet
+    start = time.perf_counter()
+    if init:
+        # Warm start dari parameter model sebelumnya; jika gagal, fit dari awal
+        try:
+            model = Prophet(**params)
+            model.fit(df[["ds", "y"]], init=init)
+            return model, time.perf_counter() - start, _init_applied(model, init)
+        except Exception as e:
+            logger.warning(f"⚠️ Warm start Prophet gagal ({e}), fit ulang dari awal")
+    model = Prophet(**params)
+    model.fit(df[["ds", "y"]])
+    return model, time.perf_counter() - start, False
+
+
+def _init_applied(model: Any, init: Dict[str, Any]) -> bool:
+    """
+    Prophet diam-diam memakai init default jika shape delta/beta tidak cocok (jumlah changepoint
+    atau komponen musiman berubah), jadi warm start hanya dianggap terpakai jika shape-nya sama.
+    """
+    if model.history["y"].min() == model.history["y"].max():
+        return False  # Seri konstan tidak melewati Stan, init tidak dipakai
+    return all(
+        np.shape(model.params[name][0]) == np.shape(init[name])
+        for name in ("delta", "beta")
+    )
+
+
+def _fit_predict_in_worker(
+    df: pd.DataFrame, params: Dict[str, Any], periods: int, freq: str, include_history: bool
+) -> Tuple[Any, pd.DataFrame, float, float]:
+    model, fit_seconds, _ = _fit_in_worker(df, params)
+    start = time.perf_counter()
+    future = model.make_future_dataframe(periods=periods, freq=freq, include_history=include_history)
+    forecast = model.predict(future)[FORECAST_COLUMNS]
+    return model, forecast, fit_seconds, time.perf_counter() - start
+
+
+def warm_start_params(model: Any) -> Dict[str, Any]:
+    """Parameter hasil fit model Prophet sebagai init untuk fit berikutnya (warm start Stan)."""
+    params = {name: model.params[name][0][0] for name in ("k", "m", "sigma_obs")}
+    params.update({name: model.params[name][0] for name in ("delta", "beta")})
+    return params
+
+
+class ProphetService:
+    """
+    Process pool Prophet yang hangat + budget waktu fit + fallback model cepat.
+    """
+
+    def __init__(self, max_workers: int = PROPHET_WORKERS, fit_budget: float = PROPHET_FIT_BUDGET_SECONDS):
+        self.max_workers = max(1, max_workers)
+        self.fit_budget = fit_budget
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            "fits": 0,
+            "fit_seconds_total": 0.0,
+            "registry_hits": 0,
+            "fallbacks": 0,
+            "late_fits_saved": 0,
+        }
+
+    # === Pool ===
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: worker tidak mewarisi thread/koneksi DB dari proses utama
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def _reset_executor(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _count(self, name: str, value: float = 1):
+        with self._lock:
+            self._stats[name] += value
+
+    def warm_up(self) -> Dict[str, Any]:
+        """Start semua worker (import Prophet + fit kecil) sebelum request pertama."""
+        if not PROPHET_AVAILABLE:
+            return {"workers": 0, "skipped": "Prophet tidak terinstal"}
+        start = time.perf_counter()
+        executor = self._get_executor()
+        pids = {f.result() for f in [executor.submit(_worker_ready) for _ in range(self.max_workers)]}
+        return {"workers": len(pids), "seconds": round(time.perf_counter() - start, 2)}
+
+    # === API ===
+    def fit(
+        self,
+        df: pd.DataFrame,
+        params: Dict[str, Any],
+        timeout: Optional[float] = None,
+        init: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Any, Dict]:
+        """
+        Fit model Prophet di worker pool (tanpa fallback, untuk training offline).
+
+        Args:
+            init: Parameter awal dari warm_start_params(model_lama) untuk warm start
+
+        Returns:
+            Tuple (model, timings); timings["warm_started"] True jika warm start berhasil dipakai
+        """
+        if not PROPHET_AVAILABLE:
+            raise RuntimeError("Prophet tidak terinstal")
+        start = time.perf_counter()
+        try:
+            model, fit_seconds, warm = self._get_executor().submit(_fit_in_worker, df, params, init).result(timeout=timeout)
+        except BrokenProcessPool:
+            self._reset_executor()
+            raise
+        self._count("fits")
+        self._count("fit_seconds_total", fit_seconds)
+        return model, {
+            "fit_seconds": round(fit_seconds, 3),
+            "total_seconds": round(time.perf_counter() - start, 3),
+            "warm_started": warm,
+        }
+
+    def forecast(
+        self,
+        df: pd.DataFrame,
+        params: Dict[str, Any],
+        periods: int,
+        freq: str = "D",
+        include_history: bool = True,
+        key: Optional[str] = None,
+        budget: Any = _UNSET,
+        metadata: Optional[Dict] = None,
+    ) -> Dict[str, Any]:
+        """
+        Forecast dengan Prophet dalam batas budget waktu, fallback ke model cepat jika habis.
+
+        Args:
+            df: DataFrame historis (ds, y)
+            params: Parameter konstruktor Prophet
+            periods: Jumlah periode ke depan
+            key: Key model registry (opsional); model yang sudah di-fit untuk data yang sama dipakai ulang
+            budget: Batas waktu fit dalam detik (default PROPHET_FIT_BUDGET_SECONDS, None = tanpa batas)
+
+        Returns:
+            Dictionary berisi forecast (DataFrame ds/yhat/yhat_lower/yhat_upper), model
+            ("prophet" / "fast_fallback"), model_reused, model_version, fallback_reason, dan timings
+        """
+        budget = self.fit_budget if budget is _UNSET else budget
+        start = time.perf_counter()
+        fingerprint = model_registry.fingerprint(df, params) if key else None
+
+        if not PROPHET_AVAILABLE:
+            return self._fallback(df, periods, freq, include_history, fingerprint, start,
+                                  "Prophet tidak terinstal")
+
+        # 1. Model untuk data yang sama sudah ada → cukup predict
+        if key:
+            model = model_registry.get(key, fingerprint)
+            if model is not None:
+                self._count("registry_hits")
+                predict_start = time.perf_counter()
+                future = model.make_future_dataframe(periods=periods, freq=freq, include_history=include_history)
+                forecast = model.predict(future)[FORECAST_COLUMNS]
+                return self._result(forecast, "prophet", True, fingerprint, None, start, 0.0,
+                                    time.perf_counter() - predict_start)
+
+        # 2. Fit di worker pool dengan budget waktu
+        try:
+            future = self._get_executor().submit(
+                _fit_predict_in_worker, df, params, periods, freq, include_history
+            )
+            model, forecast, fit_seconds, predict_seconds = future.result(timeout=budget)
+        except FutureTimeoutError:
+            self._keep_late_fit(future, key, fingerprint, metadata)
+            return self._fallback(df, periods, freq, include_history, fingerprint, start,
+                                  f"Fit Prophet melebihi budget {budget:g}s")
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._reset_executor()
+            logger.warning(f"⚠️ Fit Prophet gagal ({e}), fallback ke model cepat")
+            return self._fallback(df, periods, freq, include_history, fingerprint, start,
+                                  f"Fit Prophet gagal: {e}")
+
+        self._count("fits")
+        self._count("fit_seconds_total", fit_seconds)
+        if key:
+            model_registry.put(key, fingerprint, model, metadata)
+        return self._result(forecast, "prophet", False, fingerprint, None, start, fit_seconds, predict_seconds)
+
+    def _keep_late_fit(self, future: Future, key: Optional[str], fingerprint: Optional[str], metadata: Optional[Dict]):
+        """Fit yang belum mulai dibatalkan; yang sudah berjalan disimpan ke registry saat selesai."""
+        if future.cancel() or not key:
+            return
+
+        def _save(done: Future):
+            try:
+                model, _, fit_seconds, _ = done.result()
+            except Exception:
+                return
+            model_registry.put(key, fingerprint, model, metadata)
+            self._count("fits")
+            self._count("fit_seconds_total", fit_seconds)
+            self._count("late_fits_saved")
+            logger.info(f"💾 Fit Prophet {key} selesai terlambat ({fit_seconds:.1f}s), disimpan ke registry")
+
+        future.add_done_callback(_save)
+
+    def _fallback(self, df, periods, freq, include_history, fingerprint, start, reason) -> Dict[str, Any]:
+        self._count("fallbacks")
+        fit_start = time.perf_counter()
+        forecast = fast_forecast(df, periods, model="ridge_weekly", include_history=include_history)
+        elapsed = time.perf_counter() - fit_start
+        return self._result(forecast, FAST_FALLBACK_MODEL, False, fingerprint, reason, start, elapsed, 0.0)
+
+    @staticmethod
+    def _result(forecast, model_name, reused, fingerprint, reason, start, fit_seconds, predict_seconds) -> Dict[str, Any]:
+        return {
+            "forecast": forecast,
+            "model": model_name,
+            "model_reused": reused,
+            "model_version": fingerprint,
+            "fallback_reason": reason,
+            "timings": {
+                "fit_seconds": round(fit_seconds, 3),
+                "predict_seconds": round(predict_seconds, 3),
+                "total_seconds": round(time.perf_counter() - start, 3),
+            },
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            running = self._executor is not None
+        stats["avg_fit_seconds"] = round(stats["fit_seconds_total"] / stats["fits"], 3) if stats["fits"] else None
+        stats["fit_seconds_total"] = round(stats["fit_seconds_total"], 3)
+        return {
+            **stats,
+            "workers": self.max_workers,
+            "prophet_available": PROPHET_AVAILABLE,
+            "pool_running": running,
+            "fit_budget_seconds": self.fit_budget,
+        }
+
+    def shutdown(self):
+        self._reset_executor()
+
+
+# Instance bersama untuk seluruh aplikasi
+prophet_service = ProphetService()
@@ -0,0 +1,99 @@
+"""
+Warm-up data saat startup yang dijalankan di background.
+
+Sync awal ke API eksternal (Disdagkopukm, OpenWeather) tidak lagi menahan startup:
+worker langsung menerima request, sementara langkah-langkah warm-up berjalan di
+thread terpisah dan progresnya bisa dilihat di /health.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupTracker:
+    """
+    Menjalankan daftar langkah warm-up secara berurutan di daemon thread dan
+    mencatat status tiap langkah (pending → running → done/failed).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._steps: List[Dict[str, Any]] = []
+        self._thread: Optional[threading.Thread] = None
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+
+    def start(self, steps: List[Tuple[str, Callable[[], Any]]]):
+        """Mulai warm-up di background. Dipanggil sekali saat startup."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._steps = [
+                {"name": name, "status": "pending", "duration_seconds": None, "result": None}
+                for name, _ in steps
+            ]
+            self.started_at = datetime.now().isoformat()
+            self.finished_at = None
+
+        self._thread = threading.Thread(
+            target=self._run, args=([fn for _, fn in steps],), name="startup-warmup", daemon=True
+        )
+        self._thread.start()
+
+    def _update(self, index: int, **fields):
+        with self._lock:
+            self._steps[index].update(fields)
+
+    def _run(self, functions: List[Callable[[], Any]]):
+        for index, fn in enumerate(functions):
+            name = self._steps[index]["name"]
+            self._update(index, status="running")
+            start = time.perf_counter()
+            try:
+                result = fn()
+                self._update(
+                    index,
+                    status="done",
+                    duration_seconds=round(time.perf_counter() - start, 2),
+                    result=result if isinstance(result, (dict, list, str, int, float)) else None,
+                )
+                logger.info(f"✅ Warm-up '{name}' selesai dalam {time.perf_counter() - start:.1f}s")
+            except Exception as e:
+                # Satu langkah gagal tidak menghentikan langkah berikutnya
+                self._update(
+                    index,
+                    status="failed",
+                    duration_seconds=round(time.perf_counter() - start, 2),
+                    result=str(e),
+                )
+                logger.warning(f"⚠️ Warm-up '{name}' gagal: {e}")
+
+        with self._lock:
+            self.finished_at = datetime.now().isoformat()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = [dict(step) for step in self._steps]
+            finished = sum(1 for step in steps if step["status"] in ("done", "failed"))
+            if not steps:
+                state = "idle"
+            elif finished == len(steps):
+                state = "completed"
+            else:
+                state = "running"
+            return {
+                "state": state,
+                "progress": f"{finished}/{len(steps)}",
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "steps": steps,
+            }
+
+
+# Instance bersama untuk seluruh aplikasi
+warmup_tracker = WarmupTracker()
@@ -2,12 +2,13 @@
 # Untuk generate data cuaca estimasi untuk kecamatan yang tidak punya data OpenWeather
 
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import date, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.models.weather_model import WeatherData
 import math
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -75,6 +76,135 @@ def find_nearest_locations(target_location: str, available_locations: List[str],
     distances.sort(key=lambda x: x[1])
     return distances[:k]
 
+def _haversine_matrix(coords_deg: np.ndarray) -> np.ndarray:
+    """Matriks jarak Haversine pairwise (km) untuk array koordinat (N, 2) dalam derajat."""
+    lat = np.radians(coords_deg[:, 0])[:, None]
+    lon = np.radians(coords_deg[:, 1])[:, None]
+    delta_lat = lat.T - lat
+    delta_lon = lon.T - lon
+    a = np.sin(delta_lat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(delta_lon / 2) ** 2
+    return 2 * 6371 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+# === Precompute: indeks & matriks jarak semua kecamatan (dihitung sekali saat import) ===
+KECAMATAN_NAMES = list(KECAMATAN_COORDINATES.keys())
+KECAMATAN_INDEX = {name: i for i, name in enumerate(KECAMATAN_NAMES)}
+DISTANCE_MATRIX = _haversine_matrix(np.array([KECAMATAN_COORDINATES[n] for n in KECAMATAN_NAMES]))
+
+WEATHER_VARIABLES = ["temperature", "humidity", "rainfall", "wind_speed"]
+
+def load_day_observations(db: Session, target_date: date) -> Dict[str, np.ndarray]:
+    """
+    Ambil observasi semua lokasi untuk satu tanggal dalam satu query.
+    Returns: Dictionary location_name -> array [temperature, humidity, rainfall, wind_speed] (NaN jika NULL)
+    """
+    rows = db.query(
+        WeatherData.location_name,
+        *[func.avg(getattr(WeatherData, var)) for var in WEATHER_VARIABLES]
+    ).filter(
+        WeatherData.date == target_date
+    ).group_by(WeatherData.location_name).all()
+    
+    return {
+        row[0]: np.array([np.nan if v is None else float(v) for v in row[1:]])
+        for row in rows
+        if row[0]
+    }
+
+def idw_interpolate(
+    observations: Dict[str, np.ndarray],
+    targets: List[str],
+    k: int = 3
+) -> Tuple[np.ndarray, List[List[str]]]:
+    """
+    IDW untuk banyak target sekaligus dengan operasi matriks NumPy.
+    
+    Args:
+        observations: location_name -> array nilai 4 variabel cuaca
+        targets: Nama kecamatan yang ingin diinterpolasi
+        k: Jumlah sumber terdekat per target
+    
+    Returns:
+        Tuple (values, sources): values shape (len(targets), 4) berisi NaN untuk target yang
+        tidak bisa diinterpolasi; sources berisi nama lokasi sumber per target (urut terdekat)
+    """
+    values = np.full((len(targets), len(WEATHER_VARIABLES)), np.nan)
+    sources: List[List[str]] = [[] for _ in targets]
+    
+    source_names = [name for name in observations if name.upper() in KECAMATAN_INDEX]
+    target_rows = [i for i, name in enumerate(targets) if name.upper() in KECAMATAN_INDEX]
+    if not source_names or not target_rows:
+        return values, sources
+    
+    src_idx = np.array([KECAMATAN_INDEX[name.upper()] for name in source_names])
+    tgt_idx = np.array([KECAMATAN_INDEX[targets[i].upper()] for i in target_rows])
+    # Nilai NULL diperlakukan 0, sama seperti implementasi sebelumnya
+    src_values = np.nan_to_num(np.vstack([observations[name] for name in source_names]))
+    
+    # Jarak target × sumber, lokasi itu sendiri dikecualikan
+    distances = DISTANCE_MATRIX[np.ix_(tgt_idx, src_idx)].copy()
+    distances[tgt_idx[:, None] == src_idx[None, :]] = np.inf
+    
+    k_eff = min(k, len(source_names))
+    nearest = np.argpartition(distances, k_eff - 1, axis=1)[:, :k_eff]
+    nearest_dist = np.take_along_axis(distances, nearest, axis=1)
+    order = np.argsort(nearest_dist, axis=1)
+    nearest = np.take_along_axis(nearest, order, axis=1)
+    nearest_dist = np.take_along_axis(nearest_dist, order, axis=1)
+    
+    # IDW: bobot = 1/(distance + 0.1)^2, sumber tak valid (inf) berbobot 0
+    finite = np.isfinite(nearest_dist)
+    weights = np.where(finite, 1 / (np.where(finite, nearest_dist, 0) + 0.1) ** 2, 0.0)
+    total_weight = weights.sum(axis=1)
+    weighted = np.einsum("tk,tkv->tv", weights, src_values[nearest])
+    
+    valid = total_weight > 0
+    rows = np.array(target_rows)
+    values[rows[valid]] = weighted[valid] / total_weight[valid, None]
+    for row, idx, ok in zip(target_rows, nearest, finite):
+        sources[row] = [source_names[j] for j, keep in zip(idx, ok) if keep]
+    
+    return values, sources
+
+def _weather_record(
+    location: str,
+    target_date: date,
+    values: np.ndarray,
+    is_interpolated: bool
+) -> Dict:
+    temp, humidity, rainfall, wind = (float(np.nan_to_num(v)) for v in values)
+    return {
+        "date": target_date.isoformat(),
+        "location_name": location,
+        "temperature": round(temp, 1),
+        "humidity": round(humidity, 1),
+        "rainfall": round(rainfall, 1),
+        "wind_speed": round(wind, 1),
+        "condition": (
+            "Hujan Lebat" if rainfall > 15
+            else "Hujan Ringan" if rainfall > 5
+            else "Cerah" if temp > 20
+            else "Dingin"
+        ),
+        "risk": (
+            "Tinggi" if rainfall > 15
+            else "Sedang" if rainfall > 5
+            else "Rendah"
+        ),
+        "is_interpolated": is_interpolated
+    }
+
+def _interpolated_record(
+    location: str,
+    target_date: date,
+    values: np.ndarray,
+    sources: List[str],
+    k: int
+) -> Dict:
+    result = _weather_record(location, target_date, values, is_interpolated=True)
+    result["interpolation_sources"] = sources
+    result["interpolation_method"] = f"IDW (k={k})"
+    return result
+
 def interpolate_weather_data(
     db: Session,
     target_location: str,
@@ -95,98 +225,27 @@ def interpolate_weather_data(
         Dictionary dengan data cuaca terinteprolasi atau None jika gagal
     """
     try:
-        # Cek apakah target location sudah punya data real
-        existing_data = db.query(WeatherData).filter(
-            WeatherData.location_name == target_location,
-            WeatherData.date == target_date
-        ).first()
+        observations = load_day_observations(db, target_date)
         
-        if existing_data:
+        if target_location in observations:
             # Sudah ada data real, tidak perlu interpolasi
             return None
         
-        # Ambil semua lokasi yang punya data untuk tanggal tersebut
-        available_data = db.query(WeatherData).filter(
-            WeatherData.date == target_date
-        ).all()
-        
-        if not available_data:
+        if not observations:
             logger.warning(f"No weather data available for date {target_date}")
             return None
         
-        available_locations = list(set([d.location_name for d in available_data]))
-        
-        # Cari lokasi terdekat
-        nearest = find_nearest_locations(target_location, available_locations, k)
-        
-        if not nearest:
-            logger.warning(f"Cannot find nearest locations for {target_location}")
+        if target_location.upper() not in KECAMATAN_INDEX:
+            logger.warning(f"Location {target_location} not found in coordinates database")
             return None
         
-        # Hitung bobot berdasarkan inverse distance
-        total_weight = 0
-        weighted_temp = 0
-        weighted_humidity = 0
-        weighted_rainfall = 0
-        weighted_wind = 0
-        
-        for loc_name, distance in nearest:
-            # Ambil data cuaca dari lokasi terdekat
-            loc_data = db.query(WeatherData).filter(
-                WeatherData.location_name == loc_name,
-                WeatherData.date == target_date
-            ).first()
-            
-            if loc_data:
-                # IDW: bobot = 1/distance^2 (semakin dekat semakin besar bobotnya)
-                # Tambah small constant untuk avoid division by zero
-                weight = 1 / ((distance + 0.1) ** 2)
-                total_weight += weight
-                
-                weighted_temp += (loc_data.temperature or 0) * weight
-                weighted_humidity += (loc_data.humidity or 0) * weight
-                weighted_rainfall += (loc_data.rainfall or 0) * weight
-                weighted_wind += (loc_data.wind_speed or 0) * weight
-        
-        if total_weight == 0:
+        values, sources = idw_interpolate(observations, [target_location], k)
+        if not sources[0]:
+            logger.warning(f"Cannot find nearest locations for {target_location}")
             return None
         
-        # Hitung nilai interpolasi
-        interpolated_temp = weighted_temp / total_weight
-        interpolated_humidity = weighted_humidity / total_weight
-        interpolated_rainfall = weighted_rainfall / total_weight
-        interpolated_wind = weighted_wind / total_weight
-        
-        # Tentukan kondisi cuaca
-        condition = (
-            "Hujan Lebat" if interpolated_rainfall > 15
-            else "Hujan Ringan" if interpolated_rainfall > 5
-            else "Cerah" if interpolated_temp > 20
-            else "Dingin"
-        )
-        
-        risk = (
-            "Tinggi" if interpolated_rainfall > 15
-            else "Sedang" if interpolated_rainfall > 5
-            else "Rendah"
-        )
-        
-        result = {
-            "date": target_date.isoformat(),
-            "location_name": target_location,
-            "temperature": round(interpolated_temp, 1),
-            "humidity": round(interpolated_humidity, 1),
-            "rainfall": round(interpolated_rainfall, 1),
-            "wind_speed": round(interpolated_wind, 1),
-            "condition": condition,
-            "risk": risk,
-            "is_interpolated": True,
-            "interpolation_sources": [loc for loc, _ in nearest],
-            "interpolation_method": f"IDW (k={k})"
-        }
-        
-        logger.info(f"✅ Interpolated weather for {target_location} on {target_date} using {len(nearest)} sources")
-        return result
+        logger.info(f"✅ Interpolated weather for {target_location} on {target_date} using {len(sources[0])} sources")
+        return _interpolated_record(target_location, target_date, values[0], sources[0], k)
         
     except Exception as e:
         logger.error(f"❌ Error interpolating weather data: {e}")
@@ -200,50 +259,162 @@ def get_or_interpolate_weather(
     """
     Get weather data - gunakan data real jika ada, interpolasi jika tidak ada
     """
-    # Coba ambil data real dulu
-    real_data = db.query(WeatherData).filter(
-        WeatherData.location_name == location,
-        WeatherData.date == target_date
-    ).first()
-    
-    if real_data:
-        return {
-            "date": real_data.date.isoformat(),
-            "location_name": real_data.location_name,
-            "temperature": round(float(real_data.temperature or 0), 1),
-            "humidity": round(float(real_data.humidity or 0), 1),
-            "rainfall": round(float(real_data.rainfall or 0), 1),
-            "wind_speed": round(float(real_data.wind_speed or 0), 1),
-            "condition": (
-                "Hujan Lebat" if (real_data.rainfall or 0) > 15
-                else "Hujan Ringan" if (real_data.rainfall or 0) > 5
-                else "Cerah" if (real_data.temperature or 0) > 20
-                else "Dingin"
-            ),
-            "risk": (
-                "Tinggi" if (real_data.rainfall or 0) > 15
-                else "Sedang" if (real_data.rainfall or 0) > 5
-                else "Rendah"
-            ),
-            "is_interpolated": False
-        }
-    
-    # Jika tidak ada data real, lakukan interpolasi
-    return interpolate_weather_data(db, location, target_date)
+    results = bulk_interpolate_missing_locations(db, target_date, [location])
+    return results[0] if results else None
 
 def bulk_interpolate_missing_locations(
     db: Session,
     target_date: date,
-    all_locations: List[str]
+    all_locations: List[str],
+    k: int = 3
 ) -> List[Dict]:
     """
-    Interpolasi cuaca untuk semua lokasi yang tidak punya data pada tanggal tertentu
+    Data cuaca untuk semua lokasi pada satu tanggal: data real jika ada, IDW jika tidak.
+    Observasi dimuat dengan satu query, interpolasi semua target dihitung sekaligus.
     """
-    results = []
+    try:
+        observations = load_day_observations(db, target_date)
+    except Exception as e:
+        logger.error(f"❌ Error loading weather observations: {e}")
+        return []
+    
+    missing = [loc for loc in all_locations if loc not in observations]
+    values, sources = idw_interpolate(observations, missing, k)
+    interpolated = {
+        loc: _interpolated_record(loc, target_date, values[i], sources[i], k)
+        for i, loc in enumerate(missing)
+        if sources[i]
+    }
     
+    results = []
     for location in all_locations:
-        weather_data = get_or_interpolate_weather(db, location, target_date)
-        if weather_data:
-            results.append(weather_data)
+        if location in observations:
+            results.append(_weather_record(location, target_date, observations[location], is_interpolated=False))
+        elif location in interpolated:
+            results.append(interpolated[location])
+    
+    return results
+
+# === Kubus cuaca (kecamatan × tanggal × variabel) untuk rentang tanggal ===
+PROVENANCE_MISSING = 0
+PROVENANCE_OBSERVED = 1
+PROVENANCE_INTERPOLATED = 2
+
+def load_range_observations(
+    db: Session,
+    start_date: date,
+    end_date: date
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ambil observasi semua kecamatan untuk rentang tanggal dalam satu query.
+    
+    Returns:
+        Tuple (values, present): values shape (kecamatan, hari, 4) dengan NULL → 0,
+        present shape (kecamatan, hari) bernilai True jika ada observasi
+    """
+    n_days = (end_date - start_date).days + 1
+    values = np.zeros((len(KECAMATAN_NAMES), n_days, len(WEATHER_VARIABLES)))
+    present = np.zeros((len(KECAMATAN_NAMES), n_days), dtype=bool)
+    
+    location_key = func.upper(WeatherData.location_name)
+    rows = db.query(
+        location_key,
+        WeatherData.date,
+        *[func.avg(getattr(WeatherData, var)) for var in WEATHER_VARIABLES]
+    ).filter(
+        WeatherData.date >= start_date,
+        WeatherData.date <= end_date,
+        location_key.in_(KECAMATAN_NAMES)
+    ).group_by(location_key, WeatherData.date).all()
+    
+    for row in rows:
+        i = KECAMATAN_INDEX[row[0]]
+        d = (row[1] - start_date).days
+        values[i, d] = [0.0 if v is None else float(v) for v in row[2:]]
+        present[i, d] = True
     
-    return results
\ No newline at end of file
+    return values, present
+
+def build_weather_cube(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    locations: Optional[List[str]] = None,
+    k: int = 3
+) -> Dict:
+    """
+    Bangun kubus cuaca padat (lokasi × tanggal × variabel) yang menggabungkan observasi
+    real dan estimasi IDW, beserta mask provenance per sel.
+    
+    Semua dihitung dari satu query; IDW untuk seluruh sel dihitung sekaligus:
+    tiap target memakai k kecamatan terdekat yang punya observasi pada hari tersebut.
+    
+    Args:
+        db: Database session
+        start_date: Tanggal awal (inklusif)
+        end_date: Tanggal akhir (inklusif)
+        locations: Nama kecamatan (default: semua di KECAMATAN_COORDINATES)
+        k: Jumlah sumber terdekat untuk IDW
+    
+    Returns:
+        Dictionary berisi locations, dates, variables, values (L×D×V, None jika kosong),
+        dan provenance (L×D: 0=missing, 1=observed, 2=interpolated)
+    """
+    locations = locations or KECAMATAN_NAMES
+    unknown = [loc for loc in locations if loc.upper() not in KECAMATAN_INDEX]
+    if unknown:
+        raise ValueError(f"Kecamatan tidak dikenal: {unknown}")
+    
+    obs_values, obs_present = load_range_observations(db, start_date, end_date)
+    n_days = obs_present.shape[1]
+    tgt_idx = np.array([KECAMATAN_INDEX[loc.upper()] for loc in locations])
+    
+    # Urutan sumber per target dari terdekat, target sendiri ditaruh paling akhir dan diabaikan
+    distances = DISTANCE_MATRIX[tgt_idx].copy()
+    distances[np.arange(len(tgt_idx)), tgt_idx] = np.inf
+    order = np.argsort(distances, axis=1)                                   # (T, K)
+    sorted_dist = np.take_along_axis(distances, order, axis=1)              # (T, K)
+    idw_weights = 1 / (sorted_dist + 0.1) ** 2                              # inf → bobot 0
+    
+    # Pilih k sumber terdekat yang punya observasi di tiap hari
+    sorted_present = obs_present[order] & np.isfinite(sorted_dist)[:, :, None]   # (T, K, D)
+    selected = sorted_present & (np.cumsum(sorted_present, axis=1) <= k)
+    weights = selected * idw_weights[:, :, None]                            # (T, K, D)
+    total_weight = weights.sum(axis=1)                                      # (T, D)
+    weighted = np.einsum("tkd,tkdv->tdv", weights, obs_values[order])       # (T, D, V)
+    
+    with np.errstate(invalid="ignore", divide="ignore"):
+        interpolated = weighted / total_weight[:, :, None]
+    
+    observed_mask = obs_present[tgt_idx]                                    # (T, D)
+    interpolated_mask = ~observed_mask & (total_weight > 0)
+    
+    cube = np.full((len(locations), n_days, len(WEATHER_VARIABLES)), np.nan)
+    cube[observed_mask] = obs_values[tgt_idx][observed_mask]
+    cube[interpolated_mask] = interpolated[interpolated_mask]
+    
+    provenance = np.full((len(locations), n_days), PROVENANCE_MISSING, dtype=np.int8)
+    provenance[observed_mask] = PROVENANCE_OBSERVED
+    provenance[interpolated_mask] = PROVENANCE_INTERPOLATED
+    
+    rounded = np.round(cube, 1).astype(object)
+    rounded[np.isnan(cube)] = None
+    
+    return {
+        "locations": list(locations),
+        "dates": [(start_date + timedelta(days=d)).isoformat() for d in range(n_days)],
+        "variables": WEATHER_VARIABLES,
+        "values": rounded.tolist(),
+        "provenance": provenance.tolist(),
+        "provenance_legend": {
+            PROVENANCE_MISSING: "missing",
+            PROVENANCE_OBSERVED: "observed",
+            PROVENANCE_INTERPOLATED: "interpolated"
+        },
+        "interpolation_method": f"IDW (k={k})",
+        "summary": {
+            "observed": int(observed_mask.sum()),
+            "interpolated": int(interpolated_mask.sum()),
+            "missing": int((provenance == PROVENANCE_MISSING).sum())
+        }
+    }
@@ -0,0 +1,177 @@
+"""
+Cache data wilayah dari API Disdukcapil Wonosobo.
+
+Batas administrasi hampir tidak pernah berubah, jadi daftar wilayah disimpan di
+memori (plus snapshot di disk) dengan TTL panjang dan index dict berdasarkan nama
+yang dinormalisasi. Lookup & count cukup membaca memori; refresh ke upstream
+dijalankan sekali untuk banyak request sekaligus (single-flight) dan di background
+saat data sudah kedaluwarsa.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DISDUKCAPIL_API = "https://disdukcapil.wonosobokab.go.id/api/wilayah"
+WILAYAH_TIMEOUT = float(os.getenv("WILAYAH_TIMEOUT", "10"))
+WILAYAH_CACHE_TTL = float(os.getenv("WILAYAH_CACHE_TTL", str(7 * 24 * 3600)))  # 7 hari
+WILAYAH_SNAPSHOT_PATH = os.getenv(
+    "WILAYAH_SNAPSHOT_PATH", os.path.join("app", "services", "models_storage", "wilayah_snapshot.json")
+)
+
+
+def normalize_name(name: str) -> str:
+    """Nama wilayah untuk key index: huruf kecil dan spasi dirapikan."""
+    return " ".join(str(name).split()).casefold()
+
+
+class WilayahDirectory:
+    """
+    Daftar wilayah + index nama → wilayah, dengan client httpx yang hidup selama aplikasi.
+    """
+
+    def __init__(
+        self,
+        url: str = DISDUKCAPIL_API,
+        ttl: float = WILAYAH_CACHE_TTL,
+        snapshot_path: Optional[str] = WILAYAH_SNAPSHOT_PATH,
+        timeout: float = WILAYAH_TIMEOUT,
+    ):
+        self.url = url
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.timeout = timeout
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._items: List[Dict[str, Any]] = []
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._loaded_at: Optional[float] = None
+        self._fetched_at: Optional[str] = None
+        self._source: Optional[str] = None
+        self._last_error: Optional[str] = None
+
+        self._load_snapshot()
+
+    # === Snapshot disk ===
+    def _set_items(self, items: List[Dict[str, Any]], fetched_at: str, source: str, loaded_at: float):
+        self._items = items
+        self._index = {normalize_name(w["nama"]): w for w in items if w.get("nama")}
+        self._fetched_at = fetched_at
+        self._source = source
+        self._loaded_at = loaded_at
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            fetched_at = snapshot["fetched_at"]
+            age = (datetime.now() - datetime.fromisoformat(fetched_at)).total_seconds()
+            # Umur snapshot dihitung dari waktu fetch aslinya agar TTL tetap berlaku
+            self._set_items(snapshot["data"], fetched_at, "snapshot", time.monotonic() - max(age, 0))
+            logger.info(f"📦 Snapshot wilayah dimuat: {len(self._items)} wilayah ({fetched_at})")
+        except Exception as e:
+            logger.warning(f"⚠️ Gagal memuat snapshot wilayah {self.snapshot_path}: {e}")
+
+    def _save_snapshot(self):
+        if not self.snapshot_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fetched_at": self._fetched_at, "data": self._items}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Gagal menyimpan snapshot wilayah: {e}")
+
+    # === Fetch upstream ===
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+
+    async def _fetch(self):
+        try:
+            response = await self._get_client().get(self.url)
+            response.raise_for_status()
+            data = response.json()
+            if data.get("status") != "success" or "data" not in data:
+                raise ValueError("Format response API tidak sesuai")
+
+            self._set_items(data["data"], datetime.now().isoformat(), "upstream", time.monotonic())
+            self._last_error = None
+            self._save_snapshot()
+            logger.info(f"✅ Data wilayah diperbarui: {len(self._items)} wilayah")
+        except Exception as e:
+            self._last_error = str(e)
+            raise
+
+    def _refresh(self) -> asyncio.Task:
+        """Jalankan fetch upstream; request bersamaan berbagi task yang sama."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._fetch())
+            self._refresh_task.add_done_callback(self._log_background_error)
+        return self._refresh_task
+
+    @staticmethod
+    def _log_background_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"⚠️ Refresh data wilayah gagal: {task.exception()}")
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def ensure_loaded(self):
+        """
+        Pastikan data tersedia. Data kedaluwarsa tetap dipakai sambil refresh di
+        background; hanya saat belum ada data sama sekali request menunggu upstream.
+        """
+        if self._items:
+            if not self._is_fresh():
+                self._refresh()
+            return
+        await asyncio.shield(self._refresh())
+
+    # === Query ===
+    async def list(self) -> List[Dict[str, Any]]:
+        await self.ensure_loaded()
+        return self._items
+
+    async def get(self, nama: str) -> Optional[Dict[str, Any]]:
+        await self.ensure_loaded()
+        return self._index.get(normalize_name(nama))
+
+    async def count(self) -> int:
+        await self.ensure_loaded()
+        return len(self._items)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": len(self._items),
+            "source": self._source,
+            "fetched_at": self._fetched_at,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            "ttl_seconds": self.ttl,
+            "refreshing": self._refresh_task is not None and not self._refresh_task.done(),
+            "last_error": self._last_error,
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Instance bersama untuk seluruh aplikasi
+wilayah_directory = WilayahDirectory()
@@ -0,0 +1,166 @@
+"""
+Cache in-process sederhana: LRU + TTL per entry, thread-safe, dengan counter hit/miss,
+serta cache snapshot stale-while-revalidate untuk data upstream yang lambat.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU cache dengan TTL. Entry yang kedaluwarsa dianggap miss dan dibuang,
+    entry paling lama tidak dipakai dibuang saat ukuran melebihi maxsize.
+    ttl=None berarti entry tidak pernah kedaluwarsa (LRU murni).
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = 600.0):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = float("inf") if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class StaleWhileRevalidateCache:
+    """
+    Cache snapshot per key dengan dua batas umur:
+    - umur < fresh_ttl  → HIT, langsung dipakai
+    - umur < stale_ttl  → STALE, tetap dipakai sambil refresh di background
+    - selain itu / belum ada → MISS, caller menunggu load
+
+    Load untuk key yang sama digabung (single-flight): berapapun caller yang datang
+    bersamaan, loader hanya dijalankan sekali. Refresh yang gagal tidak menghapus
+    snapshot lama.
+    """
+
+    def __init__(self, fresh_ttl: float, stale_ttl: float, max_workers: int = 2):
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = max(stale_ttl, fresh_ttl)
+        self._entries: dict = {}
+        self._inflight: dict = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="swr-refresh")
+        self._stats = {"hits": 0, "stale": 0, "misses": 0, "coalesced": 0, "refresh_errors": 0}
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+            raise
+        else:
+            with self._lock:
+                self._entries[key] = (value, time.monotonic())
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh_locked(self, key: Hashable, loader: Callable[[], Any]) -> Future:
+        # Harus dipanggil dengan self._lock terpegang
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._executor.submit(self._load, key, loader)
+            self._inflight[key] = future
+        return future
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Tuple[Any, str, float]:
+        """
+        Returns:
+            Tuple (value, status "HIT"/"STALE"/"MISS", umur snapshot dalam detik)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = time.monotonic() - stored_at
+                if age < self.fresh_ttl:
+                    self._stats["hits"] += 1
+                    return value, "HIT", age
+                if age < self.stale_ttl:
+                    self._stats["stale"] += 1
+                    self._refresh_locked(key, loader)
+                    return value, "STALE", age
+
+            if key in self._inflight:
+                self._stats["coalesced"] += 1
+            else:
+                self._stats["misses"] += 1
+            future = self._refresh_locked(key, loader)
+
+        return future.result(), "MISS", 0.0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                **self._stats,
+                "fresh_ttl_seconds": self.fresh_ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "refreshing": [str(key) for key in self._inflight],
+                "entries": {
+                    str(key): round(now - stored_at, 1)
+                    for key, (_, stored_at) in self._entries.items()
+                },
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,139 @@
+"""
+Benchmark query plan sebelum & sesudah index dari migrate_indexes.py.
+
+Script membuat schema sementara (bench_idx) berisi salinan struktur weather_data dan
+market_prices tanpa index, mengisinya dengan data sintetis, lalu menjalankan
+EXPLAIN ANALYZE untuk query-query panas sebelum dan sesudah index dibuat.
+Schema dihapus lagi di akhir; tabel asli tidak disentuh.
+
+Run: python benchmark_indexes.py [--days 1000] [--keep]
+"""
+
+import argparse
+import os
+import sys
+import time
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from migrate_indexes import apply_indexes
+
+SCHEMA = "bench_idx"
+
+COMMODITIES = [
+    "Kentang", "Bawang Merah", "Cabai Merah", "Cabai Rawit", "Wortel",
+    "Kubis", "Tomat", "Bawang Daun", "Strawberry", "Kopi Arabika",
+] + [f"Komoditas {i}" for i in range(1, 31)]
+MARKETS = ["Wonosobo Kota", "Kejajar", "Kalibawang", "Kertek", "Sapuran"]
+KECAMATAN = [
+    "WADASLINTANG", "KALIBAWANG", "KEJAJAR", "GARUNG", "LEKSONO", "KALIWIRO",
+    "SAPURAN", "KEPIL", "KALIKAJAR", "KERTEK", "WONOSOBO", "MOJOTENGAH",
+    "SELOMERTO", "SUKOHARJO", "WATUMALANG",
+]
+
+# Query panas dari router/service (nama, SQL)
+HOT_QUERIES = [
+    (
+        "weather: get_current_weather (location_name, date)",
+        "SELECT * FROM weather_data WHERE location_name = 'KERTEK' AND date = CURRENT_DATE - 10 LIMIT 1",
+    ),
+    (
+        "weather: interpolasi (semua lokasi satu hari)",
+        "SELECT * FROM weather_data WHERE date = CURRENT_DATE - 10",
+    ),
+    (
+        "market: cek duplikat sync (commodity, location, date)",
+        "SELECT * FROM market_prices WHERE commodity_name = 'Kentang' "
+        "AND market_location = 'Wonosobo Kota' AND date = CURRENT_DATE - 10 LIMIT 1",
+    ),
+    (
+        "market: /market/list ILIKE + ORDER BY date DESC",
+        "SELECT * FROM market_prices WHERE commodity_name ILIKE '%bawang%' ORDER BY date DESC LIMIT 100",
+    ),
+    (
+        "market: /market/list tanpa filter (halaman pertama)",
+        "SELECT * FROM market_prices ORDER BY date DESC, price_id DESC LIMIT 50",
+    ),
+]
+
+
+def seed(conn, days: int):
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    # Extension dibuat di schema default agar tidak ikut terhapus bersama schema benchmark
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    conn.execute(text(f"SET search_path TO {SCHEMA}, public"))
+
+    # Salin struktur kolom saja (tanpa index/constraint)
+    conn.execute(text("CREATE TABLE weather_data (LIKE public.weather_data)"))
+    conn.execute(text("CREATE TABLE market_prices (LIKE public.market_prices)"))
+
+    conn.execute(
+        text("""
+            INSERT INTO market_prices (price_id, commodity_name, unit, price, market_location, date, created_at)
+            SELECT row_number() OVER (), c, 'kg', round((5000 + random() * 50000)::numeric, 2), m,
+                   CURRENT_DATE - d, now()
+            FROM generate_series(0, :days - 1) AS d,
+                 unnest(CAST(:commodities AS text[])) AS c,
+                 unnest(CAST(:markets AS text[])) AS m
+        """),
+        {"days": days, "commodities": COMMODITIES, "markets": MARKETS},
+    )
+    conn.execute(
+        text("""
+            INSERT INTO weather_data (weather_id, location_name, date, temperature, humidity, rainfall, wind_speed)
+            SELECT row_number() OVER (), k, CURRENT_DATE - d,
+                   18 + random() * 10, 60 + random() * 35, random() * 20, random() * 15
+            FROM generate_series(0, :days - 1) AS d,
+                 unnest(CAST(:kecamatan AS text[])) AS k
+        """),
+        {"days": days, "kecamatan": KECAMATAN},
+    )
+    conn.execute(text("ANALYZE weather_data"))
+    conn.execute(text("ANALYZE market_prices"))
+
+    market_rows = conn.execute(text("SELECT COUNT(*) FROM market_prices")).scalar()
+    weather_rows = conn.execute(text("SELECT COUNT(*) FROM weather_data")).scalar()
+    print(f"🌱 Seeded {market_rows:,} market_prices & {weather_rows:,} weather_data rows in schema {SCHEMA}")
+
+
+def explain_all(conn, label: str):
+    print(f"\n{'=' * 20} {label} {'=' * 20}")
+    for name, sql in HOT_QUERIES:
+        rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).fetchall()
+        print(f"\n▶ {name}")
+        for (line,) in rows:
+            print(f"    {line}")
+
+
+def run_benchmark(days: int, keep: bool):
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("❌ DATABASE_URL not found in environment variables")
+        sys.exit(1)
+
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        seed(conn, days)
+        explain_all(conn, "BEFORE (tanpa index)")
+
+        start = time.perf_counter()
+        apply_indexes(conn, dedup=False)
+        conn.execute(text("ANALYZE weather_data"))
+        conn.execute(text("ANALYZE market_prices"))
+        print(f"\n🔧 Index dibuat dalam {time.perf_counter() - start:.2f}s")
+
+        explain_all(conn, "AFTER (dengan index)")
+
+        if not keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            print(f"\n🧹 Schema {SCHEMA} dihapus")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark index weather_data & market_prices")
+    parser.add_argument("--days", type=int, default=1000, help="Jumlah hari data sintetis (default: 1000)")
+    parser.add_argument("--keep", action="store_true", help="Jangan hapus schema benchmark setelah selesai")
+    args = parser.parse_args()
+    run_benchmark(args.days, args.keep)
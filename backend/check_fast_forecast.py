@@ -0,0 +1,68 @@
+"""
+Regression check engine forecasting cepat (app/services/fast_forecast.py):
+- Seri tren linear (termasuk seri pendek < 2 minggu) harus diteruskan, bukan diulang/dipotong
+- Seri sinus mingguan + tren harus diprediksi dengan tepat oleh holt_winters
+- Hasil satu seri tidak boleh berubah karena ada seri lain (lebih panjang) dalam batch
+
+Run: python check_fast_forecast.py
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from app.services.fast_forecast import FAST_MODELS, fast_forecast, forecast_batch
+
+PERIODS = 7
+
+
+def _series(values) -> pd.DataFrame:
+    return pd.DataFrame({"ds": pd.date_range("2026-01-01", periods=len(values)), "y": values})
+
+
+def check_linear_ramp() -> list:
+    failures = []
+    for n in (1, 2, 5, 6, 8, 13, 14, 20, 60):
+        y = 20.0 + np.arange(n)
+        expected = 20.0 + np.arange(n, n + PERIODS) if n > 1 else np.full(PERIODS, 20.0)
+        yhat = fast_forecast(_series(y), PERIODS, "holt_winters")["yhat"].to_numpy()
+        if not np.allclose(yhat, expected, atol=1e-6):
+            failures.append(f"holt_winters ramp {n} hari: {np.round(yhat, 2).tolist()}")
+    return failures
+
+
+def check_weekly_season() -> list:
+    t = np.arange(60)
+    signal = lambda x: 100 + 0.5 * x + 10 * np.sin(2 * np.pi * x / 7)
+    yhat = fast_forecast(_series(signal(t)), PERIODS, "holt_winters")["yhat"].to_numpy()
+    expected = signal(np.arange(60, 60 + PERIODS))
+    if not np.allclose(yhat, expected, atol=1e-6):
+        return [f"holt_winters musiman mingguan: selisih maks {np.abs(yhat - expected).max():.3f}"]
+    return []
+
+
+def check_batch_invariance() -> list:
+    rng = np.random.default_rng(0)
+    short = _series(1000 + rng.normal(0, 10, 20))
+    tiny = _series(700 + rng.normal(0, 5, 5))
+    long = _series(5000 + rng.normal(0, 50, 300))
+    failures = []
+    for model in FAST_MODELS:
+        alone = forecast_batch({"short": short, "tiny": tiny}, PERIODS, model, include_history=True)
+        batched = forecast_batch({"short": short, "tiny": tiny, "long": long}, PERIODS, model, include_history=True)
+        for name in ("short", "tiny"):
+            cols = ["yhat", "yhat_lower", "yhat_upper"]
+            diff = (alone[name][cols] - batched[name][cols]).abs().to_numpy().max()
+            if diff > 1e-6:
+                failures.append(f"{model} {name}: hasil berubah {diff:.3f} saat di-batch")
+    return failures
+
+
+if __name__ == "__main__":
+    failures = check_linear_ramp() + check_weekly_season() + check_batch_invariance()
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✅ Semua regression check fast_forecast lolos")
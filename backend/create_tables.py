@@ -4,7 +4,7 @@ Jalankan script ini jika tables belum ada atau perlu di-recreate
 """
 
 from app.db import engine, Base
-from app.models import user_model, market_model, weather_model, gis_model, log_model, notification_model
+from app.models import user_model, market_model, weather_model, gis_model, log_model, notification_model, scheduler_model, job_model, training_model
 
 def create_all_tables():
     """Create all tables defined in models"""
@@ -26,6 +26,9 @@ def create_all_tables():
         print("📋 gis_layers")
         print("📋 log_activity")
         print("📋 notifications")
+        print("📋 scheduler_job_state")
+        print("📋 background_jobs")
+        print("📋 price_model_state")
         
         return True
         
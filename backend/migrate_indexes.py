@@ -0,0 +1,132 @@
+"""
+Migration script untuk index & unique constraint pada kolom lookup yang sering dipakai:
+- weather_data  (location_name, date)                 → unique, target upsert cuaca
+- weather_data  (date)                                → query satu hari (interpolasi)
+- market_prices (commodity_name, market_location, date) → unique, target upsert sync pasar
+- market_prices (date DESC, price_id DESC)            → urutan /market/list
+- market_prices commodity_name gin_trgm_ops           → pencarian ILIKE '%x%'
+
+Duplikat lama digabung/dibuang dulu supaya constraint bisa dibuat.
+Aman dijalankan berulang kali.
+
+Run: python migrate_indexes.py
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+# Gabungkan duplikat sebelum unique constraint dibuat
+DEDUP_SQL = [
+    # weather_data: rata-rata nilai disimpan di baris tertua
+    """
+    WITH agg AS (
+        SELECT location_name, date,
+               MIN(weather_id) AS keep_id,
+               AVG(temperature) AS temperature,
+               AVG(humidity) AS humidity,
+               AVG(rainfall) AS rainfall,
+               AVG(wind_speed) AS wind_speed
+        FROM weather_data
+        GROUP BY location_name, date
+        HAVING COUNT(*) > 1
+    )
+    UPDATE weather_data w
+    SET temperature = agg.temperature,
+        humidity = agg.humidity,
+        rainfall = agg.rainfall,
+        wind_speed = agg.wind_speed
+    FROM agg
+    WHERE w.weather_id = agg.keep_id
+    """,
+    """
+    DELETE FROM weather_data w
+    USING weather_data keep
+    WHERE w.location_name = keep.location_name
+      AND w.date = keep.date
+      AND w.weather_id > keep.weather_id
+    """,
+    # market_prices: simpan entry terbaru (price_id terbesar)
+    """
+    DELETE FROM market_prices m
+    USING market_prices newer
+    WHERE m.commodity_name = newer.commodity_name
+      AND m.market_location = newer.market_location
+      AND m.date = newer.date
+      AND m.price_id < newer.price_id
+    """,
+]
+
+# (nama constraint, tabel, definisi)
+UNIQUE_CONSTRAINTS = [
+    ("uq_weather_data_location_date", "weather_data", "UNIQUE (location_name, date)"),
+    (
+        "uq_market_prices_commodity_location_date",
+        "market_prices",
+        "UNIQUE (commodity_name, market_location, date)",
+    ),
+]
+
+INDEX_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_weather_data_date ON weather_data (date)",
+    "CREATE INDEX IF NOT EXISTS ix_market_prices_date_price_id ON market_prices (date DESC, price_id DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_market_prices_commodity_name_trgm "
+    "ON market_prices USING gin (commodity_name gin_trgm_ops)",
+]
+
+
+def unique_constraint_sql(name: str, table: str, definition: str) -> str:
+    """ALTER TABLE ... ADD CONSTRAINT yang idempotent (skip jika sudah ada)."""
+    return f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conname = '{name}' AND conrelid = '{table}'::regclass
+        ) THEN
+            ALTER TABLE {table} ADD CONSTRAINT {name} {definition};
+        END IF;
+    END $$;
+    """
+
+
+def apply_indexes(conn, dedup: bool = True):
+    """Jalankan dedup, unique constraint, dan index di koneksi yang diberikan."""
+    if dedup:
+        for sql in DEDUP_SQL:
+            conn.execute(text(sql))
+    for name, table, definition in UNIQUE_CONSTRAINTS:
+        conn.execute(text(unique_constraint_sql(name, table, definition)))
+    for sql in INDEX_SQL:
+        conn.execute(text(sql))
+
+
+def migrate_indexes():
+    """Tambah unique constraint & index untuk weather_data dan market_prices"""
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("❌ DATABASE_URL not found in environment variables")
+        sys.exit(1)
+
+    try:
+        engine = create_engine(database_url)
+        with engine.begin() as conn:
+            apply_indexes(conn)
+            conn.execute(text("ANALYZE weather_data"))
+            conn.execute(text("ANALYZE market_prices"))
+        print("✅ Unique constraints:")
+        for name, table, definition in UNIQUE_CONSTRAINTS:
+            print(f"   📋 {table}.{name} {definition}")
+        print("✅ Indexes created (IF NOT EXISTS)")
+        print("🎉 Migration completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    migrate_indexes()
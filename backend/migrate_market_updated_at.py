@@ -0,0 +1,43 @@
+"""
+Migration script untuk watermark refit model harga:
+- Tambah kolom market_prices.updated_at (diisi saat harga diubah lewat sync atau edit manual)
+
+Refit inkremental (ai_market.refit_price_models) memakai COALESCE(updated_at, created_at)
+sebagai waktu perubahan terakhir tiap seri. Aman dijalankan berulang kali.
+
+Run: python migrate_market_updated_at.py
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+COLUMNS_SQL = [
+    "ALTER TABLE market_prices ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP",
+]
+
+
+def migrate_market_updated_at():
+    """Tambah kolom updated_at pada market_prices"""
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("❌ DATABASE_URL not found in environment variables")
+        sys.exit(1)
+
+    try:
+        engine = create_engine(database_url)
+        with engine.begin() as conn:
+            for sql in COLUMNS_SQL:
+                conn.execute(text(sql))
+            print("✅ Kolom market_prices.updated_at tersedia")
+        print("🎉 Migration completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    migrate_market_updated_at()
@@ -0,0 +1,64 @@
+"""
+Migration script untuk cache & dedup weather_predictions:
+- Tambah kolom location_name, horizon_days, data_max_date
+- Hapus baris lama tanpa kunci (duplikat append dari setiap request prediksi)
+- Unique constraint (location_name, horizon_days, date) sebagai target upsert
+
+Aman dijalankan berulang kali.
+
+Run: python migrate_weather_predictions.py [--keep-legacy]
+"""
+
+import os
+import sys
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from migrate_indexes import unique_constraint_sql
+
+COLUMNS_SQL = [
+    "ALTER TABLE weather_predictions ADD COLUMN IF NOT EXISTS location_name VARCHAR(100)",
+    "ALTER TABLE weather_predictions ADD COLUMN IF NOT EXISTS horizon_days INTEGER",
+    "ALTER TABLE weather_predictions ADD COLUMN IF NOT EXISTS data_max_date DATE",
+]
+
+# Baris lama tidak punya lokasi/horizon sehingga tidak bisa dipakai sebagai cache
+DELETE_LEGACY_SQL = "DELETE FROM weather_predictions WHERE location_name IS NULL"
+
+UNIQUE_CONSTRAINT = (
+    "uq_weather_predictions_location_horizon_date",
+    "weather_predictions",
+    "UNIQUE (location_name, horizon_days, date)",
+)
+
+
+def migrate_weather_predictions(keep_legacy: bool = False):
+    """Tambah kolom kunci cache dan unique constraint pada weather_predictions"""
+    load_dotenv()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("❌ DATABASE_URL not found in environment variables")
+        sys.exit(1)
+
+    try:
+        engine = create_engine(database_url)
+        with engine.begin() as conn:
+            for sql in COLUMNS_SQL:
+                conn.execute(text(sql))
+            print("✅ Kolom location_name, horizon_days, data_max_date tersedia")
+
+            if not keep_legacy:
+                deleted = conn.execute(text(DELETE_LEGACY_SQL)).rowcount
+                print(f"🧹 {deleted} baris prediksi lama (tanpa lokasi) dihapus")
+
+            conn.execute(text(unique_constraint_sql(*UNIQUE_CONSTRAINT)))
+            print(f"✅ Unique constraint {UNIQUE_CONSTRAINT[0]} {UNIQUE_CONSTRAINT[2]}")
+        print("🎉 Migration completed successfully!")
+
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    migrate_weather_predictions(keep_legacy="--keep-legacy" in sys.argv)
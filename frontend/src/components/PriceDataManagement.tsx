@@ -19,7 +19,7 @@ import {
 } from 'lucide-react';
 import { toast } from 'sonner';
 import { 
-  fetchPriceData, 
+  fetchPriceDataPage, 
   addPriceData, 
   updatePriceData, 
   deletePriceData
@@ -34,6 +34,8 @@ const wonosoboLocations = [
   'Kaliwiro', 'Watumalang'
 ];
 
+const PAGE_SIZE = 200;
+
 const commonCommodities = [
   'Kentang', 'Wortel', 'Kubis', 'Kopi', 'Strawberry', 'Bawang Daun',
   'Jagung', 'Tembakau', 'Carica', 'Padi', 'Tomat', 'Lettuce'
@@ -42,6 +44,8 @@ const commonCommodities = [
 export function PriceDataManagement() {
   const [priceData, setPriceData] = useState(initialPriceData);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [isAddDialogOpen, setIsAddDialogOpen] = useState(false);
   const [editingItem, setEditingItem] = useState<any>(null);
   const [formData, setFormData] = useState({
@@ -52,36 +56,54 @@ export function PriceDataManagement() {
     date: new Date().toISOString().split('T')[0]
   });
 
-  // Fetch data dari database lokal
+  // Convert ke format yang digunakan PriceDataManagement
+  const convertItems = (data: any[]) => data.map((item) => ({
+    id: item.price_id,
+    commodity: item.commodity_name,
+    location: item.market_location,
+    currentPrice: item.price,
+    previousPrice: item.price, // Tidak ada data previous
+    unit: item.unit,
+    date: item.date,
+    trend: 'stable' as const
+  }));
+
+  // Fetch halaman pertama dari database lokal
   const loadData = async () => {
     try {
       setLoading(true);
-      const data = await fetchPriceData(undefined, undefined, undefined, undefined, 500);
-      console.log("a‰¡Æ’A¶A¬ [PriceDataManagement] Data dari database:", data);
-      
-      // Convert ke format yang digunakan PriceDataManagement
-      const converted = data.map((item) => ({
-        id: item.price_id,
-        commodity: item.commodity_name,
-        location: item.market_location,
-        currentPrice: item.price,
-        previousPrice: item.price, // Tidak ada data previous
-        unit: item.unit,
-        date: item.date,
-        trend: 'stable' as const
-      }));
+      const page = await fetchPriceDataPage(null, PAGE_SIZE);
+      const converted = convertItems(page.data);
       
       setPriceData(converted);
-      console.log("I“A£A  [PriceDataManagement] Data loaded:", converted.length, "records");
+      setNextCursor(page.hasMore ? page.nextCursor : null);
+      console.log("[PriceDataManagement] Data loaded:", converted.length, "records");
     } catch (error) {
       console.error("Error fetching price data:", error);
       toast.error("Gagal memuat data harga");
       setPriceData([]);
+      setNextCursor(null);
     } finally {
       setLoading(false);
     }
   };
 
+  // Fetch halaman berikutnya (keyset cursor)
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const page = await fetchPriceDataPage(nextCursor, PAGE_SIZE);
+      setPriceData((prev) => [...prev, ...convertItems(page.data)]);
+      setNextCursor(page.hasMore ? page.nextCursor : null);
+    } catch (error) {
+      console.error("Error fetching more price data:", error);
+      toast.error("Gagal memuat data berikutnya");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     loadData();
   }, []);
@@ -455,6 +477,14 @@ export function PriceDataManagement() {
             </Table>
           </div>
 
+          {nextCursor && !loading && (
+            <div className="flex justify-center pt-4">
+              <Button variant="outline" onClick={loadMore} disabled={loadingMore}>
+                {loadingMore ? 'Memuat...' : 'Muat lebih banyak'}
+              </Button>
+            </div>
+          )}
+
           {priceData.length === 0 && (
             <div className="text-center py-8">
               <DollarSign className="w-12 h-12 mx-auto text-gray-400 mb-4" />
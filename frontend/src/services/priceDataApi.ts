@@ -59,6 +59,45 @@ export const fetchPriceData = async (
   }
 };
 
+export interface PriceDataPage {
+  data: PriceData[];
+  nextCursor: string | null;
+  hasMore: boolean;
+}
+
+/**
+ * Fetch one page of price data (keyset pagination via cursor)
+ */
+export const fetchPriceDataPage = async (
+  cursor?: string | null,
+  limit: number = 100
+): Promise<PriceDataPage> => {
+  try {
+    const params = new URLSearchParams();
+    params.append("limit", limit.toString());
+    if (cursor) params.append("cursor", cursor);
+
+    const url = `${BACKEND_API}/list?${params.toString()}`;
+    console.log(`📊 Fetching price data page: ${url}`);
+
+    const response = await fetch(url);
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const result = await response.json();
+    return {
+      data: result.data || [],
+      nextCursor: result.next_cursor || null,
+      hasMore: Boolean(result.has_more),
+    };
+  } catch (error) {
+    console.error("❌ Error fetching price data page:", error);
+    throw error;
+  }
+};
+
 /**
  * Add new price data (admin input)
  */